@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15\x61pi/v1/timeline.proto\x12\x06\x61pi.v1\"\x1c\n\x0cHelloRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\" \n\rHelloResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\"$\n\x16SubjectCollectResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"%\n\x17SubjectProgressResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"$\n\x16\x45pisodeCollectResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"\x88\x01\n\x07Subject\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04type\x18\x02 \x01(\r\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0f\n\x07name_cn\x18\x04 \x01(\t\x12\r\n\x05image\x18\x05 \x01(\t\x12\x0e\n\x06series\x18\x06 \x01(\x08\x12\x12\n\nvols_total\x18\x07 \x01(\r\x12\x11\n\teps_total\x18\x08 \x01(\r\"P\n\x07\x45pisode\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04type\x18\x02 \x01(\r\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0f\n\x07name_cn\x18\x04 \x01(\t\x12\x0c\n\x04sort\x18\x05 \x01(\x01\"}\n\x15SubjectCollectRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12 \n\x07subject\x18\x02 \x01(\x0b\x32\x0f.api.v1.Subject\x12\x12\n\ncollection\x18\x03 \x01(\r\x12\x0f\n\x07\x63omment\x18\x04 \x01(\t\x12\x0c\n\x04rate\x18\x05 \x01(\r\"i\n\x15\x45pisodeCollectRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12\x1d\n\x04last\x18\x02 \x01(\x0b\x32\x0f.api.v1.Episode\x12 \n\x07subject\x18\x03 \x01(\x0b\x32\x0f.api.v1.Subject\"t\n\x16SubjectProgressRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12 \n\x07subject\x18\x02 \x01(\x0b\x32\x0f.api.v1.Subject\x12\x12\n\neps_update\x18\x03 \x01(\r\x12\x13\n\x0bvols_update\x18\x04 \x01(\r2\xc5\x02\n\x0fTimeLineService\x12\x36\n\x05Hello\x12\x14.api.v1.HelloRequest\x1a\x15.api.v1.HelloResponse\"\x00\x12Q\n\x0eSubjectCollect\x12\x1d.api.v1.SubjectCollectRequest\x1a\x1e.api.v1.SubjectCollectResponse\"\x00\x12T\n\x0fSubjectProgress\x12\x1e.api.v1.SubjectProgressRequest\x1a\x1f.api.v1.SubjectProgressResponse\"\x00\x12Q\n\x0e\x45pisodeCollect\x12\x1d.api.v1.EpisodeCollectRequest\x1a\x1e.api.v1.EpisodeCollectResponse\"\x00\x42\x1fZ\x1dgithub.com/bangumi/server/apib\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15\x61pi/v1/timeline.proto\x12\x06\x61pi.v1\"\x1c\n\x0cHelloRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\" \n\rHelloResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\"$\n\x16SubjectCollectResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"%\n\x17SubjectProgressResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"$\n\x16\x45pisodeCollectResponse\x12\n\n\x02ok\x18\x01 \x01(\x08\"\x88\x01\n\x07Subject\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04type\x18\x02 \x01(\r\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0f\n\x07name_cn\x18\x04 \x01(\t\x12\r\n\x05image\x18\x05 \x01(\t\x12\x0e\n\x06series\x18\x06 \x01(\x08\x12\x12\n\nvols_total\x18\x07 \x01(\r\x12\x11\n\teps_total\x18\x08 \x01(\r\"P\n\x07\x45pisode\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04type\x18\x02 \x01(\r\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\x0f\n\x07name_cn\x18\x04 \x01(\t\x12\x0c\n\x04sort\x18\x05 \x01(\x01\"}\n\x15SubjectCollectRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12 \n\x07subject\x18\x02 \x01(\x0b\x32\x0f.api.v1.Subject\x12\x12\n\ncollection\x18\x03 \x01(\r\x12\x0f\n\x07\x63omment\x18\x04 \x01(\t\x12\x0c\n\x04rate\x18\x05 \x01(\r\"i\n\x15\x45pisodeCollectRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12\x1d\n\x04last\x18\x02 \x01(\x0b\x32\x0f.api.v1.Episode\x12 \n\x07subject\x18\x03 \x01(\x0b\x32\x0f.api.v1.Subject\"t\n\x16SubjectProgressRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12 \n\x07subject\x18\x02 \x01(\x0b\x32\x0f.api.v1.Subject\x12\x12\n\neps_update\x18\x03 \x01(\r\x12\x13\n\x0bvols_update\x18\x04 \x01(\r\"(\n\x0b\x42\x61tchResult\x12\n\n\x02ok\x18\x01 \x01(\x08\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"J\n\x1aSubjectCollectBatchRequest\x12,\n\x05items\x18\x01 \x03(\x0b\x32\x1d.api.v1.SubjectCollectRequest\"C\n\x1bSubjectCollectBatchResponse\x12$\n\x07results\x18\x01 \x03(\x0b\x32\x13.api.v1.BatchResult\"J\n\x1a\x45pisodeCollectBatchRequest\x12,\n\x05items\x18\x01 \x03(\x0b\x32\x1d.api.v1.EpisodeCollectRequest\"C\n\x1b\x45pisodeCollectBatchResponse\x12$\n\x07results\x18\x01 \x03(\x0b\x32\x13.api.v1.BatchResult\"\xb0\x01\n\x08Timeline\x12\n\n\x02id\x18\x01 \x01(\x04\x12\x0f\n\x07user_id\x18\x02 \x01(\x04\x12\x0b\n\x03\x63\x61t\x18\x03 \x01(\r\x12\x0c\n\x04type\x18\x04 \x01(\r\x12\r\n\x05\x62\x61tch\x18\x05 \x01(\x08\x12\x0f\n\x07related\x18\x06 \x01(\t\x12\x0c\n\x04memo\x18\x07 \x01(\t\x12\x0b\n\x03img\x18\x08 \x01(\t\x12\x0e\n\x06source\x18\t \x01(\r\x12\x0f\n\x07replies\x18\n \x01(\r\x12\x10\n\x08\x64\x61teline\x18\x0b \x01(\r\"W\n\x16GetUserTimelineRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12\x0b\n\x03\x63\x61t\x18\x02 \x01(\r\x12\x10\n\x08until_id\x18\x03 \x01(\x04\x12\r\n\x05limit\x18\x04 \x01(\r\"Z\n\x19GetFriendsTimelineRequest\x12\x0f\n\x07user_id\x18\x01 \x01(\x04\x12\x0b\n\x03\x63\x61t\x18\x02 \x01(\r\x12\x10\n\x08until_id\x18\x03 \x01(\x04\x12\r\n\x05limit\x18\x04 \x01(\r\"M\n\x13GetTimelineResponse\x12\x1f\n\x05items\x18\x01 \x03(\x0b\x32\x10.api.v1.Timeline\x12\x15\n\rnext_until_id\x18\x02 \x01(\x04\x32\xb3\x05\n\x0fTimeLineService\x12\x36\n\x05Hello\x12\x14.api.v1.HelloRequest\x1a\x15.api.v1.HelloResponse\"\x00\x12Q\n\x0eSubjectCollect\x12\x1d.api.v1.SubjectCollectRequest\x1a\x1e.api.v1.SubjectCollectResponse\"\x00\x12T\n\x0fSubjectProgress\x12\x1e.api.v1.SubjectProgressRequest\x1a\x1f.api.v1.SubjectProgressResponse\"\x00\x12Q\n\x0e\x45pisodeCollect\x12\x1d.api.v1.EpisodeCollectRequest\x1a\x1e.api.v1.EpisodeCollectResponse\"\x00\x12`\n\x13SubjectCollectBatch\x12\".api.v1.SubjectCollectBatchRequest\x1a#.api.v1.SubjectCollectBatchResponse\"\x00\x12`\n\x13\x45pisodeCollectBatch\x12\".api.v1.EpisodeCollectBatchRequest\x1a#.api.v1.EpisodeCollectBatchResponse\"\x00\x12P\n\x0fGetUserTimeline\x12\x1e.api.v1.GetUserTimelineRequest\x1a\x1b.api.v1.GetTimelineResponse\"\x00\x12V\n\x12GetFriendsTimeline\x12!.api.v1.GetFriendsTimelineRequest\x1a\x1b.api.v1.GetTimelineResponse\"\x00\x42\x1fZ\x1dgithub.com/bangumi/server/apib\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'api.v1.timeline_pb2', globals())
@@ -41,6 +41,24 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _EPISODECOLLECTREQUEST._serialized_end=665
   _SUBJECTPROGRESSREQUEST._serialized_start=667
   _SUBJECTPROGRESSREQUEST._serialized_end=783
-  _TIMELINESERVICE._serialized_start=786
-  _TIMELINESERVICE._serialized_end=1111
+  _BATCHRESULT._serialized_start=785
+  _BATCHRESULT._serialized_end=825
+  _SUBJECTCOLLECTBATCHREQUEST._serialized_start=827
+  _SUBJECTCOLLECTBATCHREQUEST._serialized_end=901
+  _SUBJECTCOLLECTBATCHRESPONSE._serialized_start=903
+  _SUBJECTCOLLECTBATCHRESPONSE._serialized_end=970
+  _EPISODECOLLECTBATCHREQUEST._serialized_start=972
+  _EPISODECOLLECTBATCHREQUEST._serialized_end=1046
+  _EPISODECOLLECTBATCHRESPONSE._serialized_start=1048
+  _EPISODECOLLECTBATCHRESPONSE._serialized_end=1115
+  _TIMELINE._serialized_start=1118
+  _TIMELINE._serialized_end=1294
+  _GETUSERTIMELINEREQUEST._serialized_start=1296
+  _GETUSERTIMELINEREQUEST._serialized_end=1383
+  _GETFRIENDSTIMELINEREQUEST._serialized_start=1385
+  _GETFRIENDSTIMELINEREQUEST._serialized_end=1475
+  _GETTIMELINERESPONSE._serialized_start=1477
+  _GETTIMELINERESPONSE._serialized_end=1554
+  _TIMELINESERVICE._serialized_start=1557
+  _TIMELINESERVICE._serialized_end=2248
 # @@protoc_insertion_point(module_scope)
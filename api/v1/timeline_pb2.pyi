@@ -1,9 +1,18 @@
+from google.protobuf.internal import containers as _containers
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import message as _message
-from typing import ClassVar as _ClassVar, Mapping as _Mapping, Optional as _Optional, Union as _Union
+from typing import ClassVar as _ClassVar, Iterable as _Iterable, Mapping as _Mapping, Optional as _Optional, Union as _Union
 
 DESCRIPTOR: _descriptor.FileDescriptor
 
+class BatchResult(_message.Message):
+    __slots__ = ["error", "ok"]
+    ERROR_FIELD_NUMBER: _ClassVar[int]
+    OK_FIELD_NUMBER: _ClassVar[int]
+    error: str
+    ok: bool
+    def __init__(self, ok: bool = ..., error: _Optional[str] = ...) -> None: ...
+
 class Episode(_message.Message):
     __slots__ = ["id", "name", "name_cn", "sort", "type"]
     ID_FIELD_NUMBER: _ClassVar[int]
@@ -18,6 +27,18 @@ class Episode(_message.Message):
     type: int
     def __init__(self, id: _Optional[int] = ..., type: _Optional[int] = ..., name: _Optional[str] = ..., name_cn: _Optional[str] = ..., sort: _Optional[float] = ...) -> None: ...
 
+class EpisodeCollectBatchRequest(_message.Message):
+    __slots__ = ["items"]
+    ITEMS_FIELD_NUMBER: _ClassVar[int]
+    items: _containers.RepeatedCompositeFieldContainer[EpisodeCollectRequest]
+    def __init__(self, items: _Optional[_Iterable[_Union[EpisodeCollectRequest, _Mapping]]] = ...) -> None: ...
+
+class EpisodeCollectBatchResponse(_message.Message):
+    __slots__ = ["results"]
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[BatchResult]
+    def __init__(self, results: _Optional[_Iterable[_Union[BatchResult, _Mapping]]] = ...) -> None: ...
+
 class EpisodeCollectRequest(_message.Message):
     __slots__ = ["last", "subject", "user_id"]
     LAST_FIELD_NUMBER: _ClassVar[int]
@@ -34,6 +55,38 @@ class EpisodeCollectResponse(_message.Message):
     ok: bool
     def __init__(self, ok: bool = ...) -> None: ...
 
+class GetFriendsTimelineRequest(_message.Message):
+    __slots__ = ["cat", "limit", "until_id", "user_id"]
+    CAT_FIELD_NUMBER: _ClassVar[int]
+    LIMIT_FIELD_NUMBER: _ClassVar[int]
+    UNTIL_ID_FIELD_NUMBER: _ClassVar[int]
+    USER_ID_FIELD_NUMBER: _ClassVar[int]
+    cat: int
+    limit: int
+    until_id: int
+    user_id: int
+    def __init__(self, user_id: _Optional[int] = ..., cat: _Optional[int] = ..., until_id: _Optional[int] = ..., limit: _Optional[int] = ...) -> None: ...
+
+class GetTimelineResponse(_message.Message):
+    __slots__ = ["items", "next_until_id"]
+    ITEMS_FIELD_NUMBER: _ClassVar[int]
+    NEXT_UNTIL_ID_FIELD_NUMBER: _ClassVar[int]
+    items: _containers.RepeatedCompositeFieldContainer[Timeline]
+    next_until_id: int
+    def __init__(self, items: _Optional[_Iterable[_Union[Timeline, _Mapping]]] = ..., next_until_id: _Optional[int] = ...) -> None: ...
+
+class GetUserTimelineRequest(_message.Message):
+    __slots__ = ["cat", "limit", "until_id", "user_id"]
+    CAT_FIELD_NUMBER: _ClassVar[int]
+    LIMIT_FIELD_NUMBER: _ClassVar[int]
+    UNTIL_ID_FIELD_NUMBER: _ClassVar[int]
+    USER_ID_FIELD_NUMBER: _ClassVar[int]
+    cat: int
+    limit: int
+    until_id: int
+    user_id: int
+    def __init__(self, user_id: _Optional[int] = ..., cat: _Optional[int] = ..., until_id: _Optional[int] = ..., limit: _Optional[int] = ...) -> None: ...
+
 class HelloRequest(_message.Message):
     __slots__ = ["name"]
     NAME_FIELD_NUMBER: _ClassVar[int]
@@ -66,6 +119,18 @@ class Subject(_message.Message):
     vols_total: int
     def __init__(self, id: _Optional[int] = ..., type: _Optional[int] = ..., name: _Optional[str] = ..., name_cn: _Optional[str] = ..., image: _Optional[str] = ..., series: bool = ..., vols_total: _Optional[int] = ..., eps_total: _Optional[int] = ...) -> None: ...
 
+class SubjectCollectBatchRequest(_message.Message):
+    __slots__ = ["items"]
+    ITEMS_FIELD_NUMBER: _ClassVar[int]
+    items: _containers.RepeatedCompositeFieldContainer[SubjectCollectRequest]
+    def __init__(self, items: _Optional[_Iterable[_Union[SubjectCollectRequest, _Mapping]]] = ...) -> None: ...
+
+class SubjectCollectBatchResponse(_message.Message):
+    __slots__ = ["results"]
+    RESULTS_FIELD_NUMBER: _ClassVar[int]
+    results: _containers.RepeatedCompositeFieldContainer[BatchResult]
+    def __init__(self, results: _Optional[_Iterable[_Union[BatchResult, _Mapping]]] = ...) -> None: ...
+
 class SubjectCollectRequest(_message.Message):
     __slots__ = ["collection", "comment", "rate", "subject", "user_id"]
     COLLECTION_FIELD_NUMBER: _ClassVar[int]
@@ -103,3 +168,29 @@ class SubjectProgressResponse(_message.Message):
     OK_FIELD_NUMBER: _ClassVar[int]
     ok: bool
     def __init__(self, ok: bool = ...) -> None: ...
+
+class Timeline(_message.Message):
+    __slots__ = ["batch", "cat", "dateline", "id", "img", "memo", "related", "replies", "source", "type", "user_id"]
+    BATCH_FIELD_NUMBER: _ClassVar[int]
+    CAT_FIELD_NUMBER: _ClassVar[int]
+    DATELINE_FIELD_NUMBER: _ClassVar[int]
+    ID_FIELD_NUMBER: _ClassVar[int]
+    IMG_FIELD_NUMBER: _ClassVar[int]
+    MEMO_FIELD_NUMBER: _ClassVar[int]
+    RELATED_FIELD_NUMBER: _ClassVar[int]
+    REPLIES_FIELD_NUMBER: _ClassVar[int]
+    SOURCE_FIELD_NUMBER: _ClassVar[int]
+    TYPE_FIELD_NUMBER: _ClassVar[int]
+    USER_ID_FIELD_NUMBER: _ClassVar[int]
+    batch: bool
+    cat: int
+    dateline: int
+    id: int
+    img: str
+    memo: str
+    related: str
+    replies: int
+    source: int
+    type: int
+    user_id: int
+    def __init__(self, id: _Optional[int] = ..., user_id: _Optional[int] = ..., cat: _Optional[int] = ..., type: _Optional[int] = ..., batch: bool = ..., related: _Optional[str] = ..., memo: _Optional[str] = ..., img: _Optional[str] = ..., source: _Optional[int] = ..., replies: _Optional[int] = ..., dateline: _Optional[int] = ...) -> None: ...
@@ -34,6 +34,26 @@ class TimeLineServiceStub(object):
                 request_serializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectRequest.SerializeToString,
                 response_deserializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectResponse.FromString,
                 )
+        self.SubjectCollectBatch = channel.unary_unary(
+                '/api.v1.TimeLineService/SubjectCollectBatch',
+                request_serializer=api_dot_v1_dot_timeline__pb2.SubjectCollectBatchRequest.SerializeToString,
+                response_deserializer=api_dot_v1_dot_timeline__pb2.SubjectCollectBatchResponse.FromString,
+                )
+        self.EpisodeCollectBatch = channel.unary_unary(
+                '/api.v1.TimeLineService/EpisodeCollectBatch',
+                request_serializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchRequest.SerializeToString,
+                response_deserializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchResponse.FromString,
+                )
+        self.GetUserTimeline = channel.unary_unary(
+                '/api.v1.TimeLineService/GetUserTimeline',
+                request_serializer=api_dot_v1_dot_timeline__pb2.GetUserTimelineRequest.SerializeToString,
+                response_deserializer=api_dot_v1_dot_timeline__pb2.GetTimelineResponse.FromString,
+                )
+        self.GetFriendsTimeline = channel.unary_unary(
+                '/api.v1.TimeLineService/GetFriendsTimeline',
+                request_serializer=api_dot_v1_dot_timeline__pb2.GetFriendsTimelineRequest.SerializeToString,
+                response_deserializer=api_dot_v1_dot_timeline__pb2.GetTimelineResponse.FromString,
+                )
 
 
 class TimeLineServiceServicer(object):
@@ -64,6 +84,32 @@ class TimeLineServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SubjectCollectBatch(self, request, context):
+        """items are grouped by user and written in one transaction
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def EpisodeCollectBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetUserTimeline(self, request, context):
+        """newest first, paginated by `until_id`
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetFriendsTimeline(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_TimeLineServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -87,6 +133,26 @@ def add_TimeLineServiceServicer_to_server(servicer, server):
                     request_deserializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectRequest.FromString,
                     response_serializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectResponse.SerializeToString,
             ),
+            'SubjectCollectBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.SubjectCollectBatch,
+                    request_deserializer=api_dot_v1_dot_timeline__pb2.SubjectCollectBatchRequest.FromString,
+                    response_serializer=api_dot_v1_dot_timeline__pb2.SubjectCollectBatchResponse.SerializeToString,
+            ),
+            'EpisodeCollectBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.EpisodeCollectBatch,
+                    request_deserializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchRequest.FromString,
+                    response_serializer=api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchResponse.SerializeToString,
+            ),
+            'GetUserTimeline': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetUserTimeline,
+                    request_deserializer=api_dot_v1_dot_timeline__pb2.GetUserTimelineRequest.FromString,
+                    response_serializer=api_dot_v1_dot_timeline__pb2.GetTimelineResponse.SerializeToString,
+            ),
+            'GetFriendsTimeline': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetFriendsTimeline,
+                    request_deserializer=api_dot_v1_dot_timeline__pb2.GetFriendsTimelineRequest.FromString,
+                    response_serializer=api_dot_v1_dot_timeline__pb2.GetTimelineResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'api.v1.TimeLineService', rpc_method_handlers)
@@ -164,3 +230,71 @@ class TimeLineService(object):
             api_dot_v1_dot_timeline__pb2.EpisodeCollectResponse.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def SubjectCollectBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/api.v1.TimeLineService/SubjectCollectBatch',
+            api_dot_v1_dot_timeline__pb2.SubjectCollectBatchRequest.SerializeToString,
+            api_dot_v1_dot_timeline__pb2.SubjectCollectBatchResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def EpisodeCollectBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/api.v1.TimeLineService/EpisodeCollectBatch',
+            api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchRequest.SerializeToString,
+            api_dot_v1_dot_timeline__pb2.EpisodeCollectBatchResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetUserTimeline(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/api.v1.TimeLineService/GetUserTimeline',
+            api_dot_v1_dot_timeline__pb2.GetUserTimelineRequest.SerializeToString,
+            api_dot_v1_dot_timeline__pb2.GetTimelineResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GetFriendsTimeline(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/api.v1.TimeLineService/GetFriendsTimeline',
+            api_dot_v1_dot_timeline__pb2.GetFriendsTimelineRequest.SerializeToString,
+            api_dot_v1_dot_timeline__pb2.GetTimelineResponse.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -8,7 +8,10 @@ Copyright 2021-2022 by Trim21 <trim21.me@gmail.com>
 Copyright 2007-2016 by Armin Ronacher.
 """
 
-from io import BytesIO
+import math
+import mmap
+from typing import Any, Dict, Tuple, Iterable, Iterator
+from collections.abc import Mapping
 
 default_errors = "strict"
 
@@ -16,8 +19,29 @@ __all__ = (
     "dict_to_list",
     "load",
     "loads",
+    "dumps",
+    "dumps_str",
+    "dumps_int",
+    "dumps_float",
+    "loads_keys",
+    "LazyArray",
+    "iter_load",
 )
 
+_S = ord("s")
+_I = ord("i")
+_D = ord("d")
+_B = ord("b")
+_A = ord("a")
+_N = ord("n")
+_O = ord("o")
+_COLON = ord(":")
+_QUOTE = ord('"')
+_SEMICOLON = ord(";")
+_OPEN = ord("{")
+_CLOSE = ord("}")
+_WHITESPACE = frozenset(b" \t\r\n")
+
 
 def load(
     fp,
@@ -125,9 +149,456 @@ def loads(
     """Read a PHP-serialized object hierarchy from a string.  Characters in the
     string past the object's representation are ignored.  On Python 3 the
     string must be a bytestring.
+
+    `data` may be `bytes`, `bytearray` or `memoryview` (copied once), it's
+    walked by offset instead of being wrapped in a file object.
+    """
+    if array_hook is None:
+        array_hook = dict
+
+    return _unserialize(
+        _as_buffer(data), 0, charset, errors, decode_strings, array_hook
+    )[0]
+
+
+def _as_buffer(data):
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if not isinstance(data, (bytes, bytearray)):
+        raise TypeError(f"a bytes-like object is required, not {type(data).__name__!r}")
+    return data
+
+
+def iter_load(
+    fp,
+    charset="utf-8",
+    errors=default_errors,
+    decode_strings=True,
+    array_hook=None,
+    chunk_size=64 * 1024,
+) -> Iterator[Tuple[int, Any]]:
+    """Decode a stream of concatenated PHP-serialized objects from `fp`,
+    yield ``(offset, obj)`` for each object, ``offset`` is the position of the
+    object in the stream. ASCII whitespaces between objects are ignored.
+
+    `fp` is read `chunk_size` bytes at a time, the buffer only holds the object
+    currently being decoded and the rest of the last chunk, so `fp` is read
+    ahead of the last yielded object.
+
+    A `mmap.mmap` is decoded in place without buffering.
     """
-    with BytesIO(data) as fp:
-        return load(fp, charset, errors, decode_strings, array_hook)
+    if array_hook is None:
+        array_hook = dict
+
+    if isinstance(fp, mmap.mmap):
+        yield from _iter_buffer(
+            fp, fp.tell(), charset, errors, decode_strings, array_hook
+        )
+        return
+
+    try:
+        base = fp.tell()
+    except (AttributeError, OSError):
+        base = 0
+
+    buf = b""
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+
+        if pos < len(buf):
+            try:
+                value, end = _unserialize(
+                    buf, pos, charset, errors, decode_strings, array_hook
+                )
+            except _TruncatedError:
+                if eof:
+                    raise
+            else:
+                yield base + pos, value
+                pos = end
+                continue
+        elif eof:
+            return
+
+        # need more data, drop what is already decoded and read next chunk.
+        # read size grows with the pending object to keep re-decoding linear.
+        chunk = fp.read(max(chunk_size, len(buf) - pos))
+        if not chunk:
+            eof = True
+        base += pos
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _iter_buffer(data, pos, charset, errors, decode_strings, array_hook):
+    size = len(data)
+    while True:
+        while pos < size and data[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= size:
+            return
+        value, end = _unserialize(
+            data, pos, charset, errors, decode_strings, array_hook
+        )
+        yield pos, value
+        pos = end
+
+
+class _TruncatedError(ValueError):
+    """`data` ends before the current object is complete."""
+
+    def __init__(self):
+        super().__init__("unexpected end of stream")
+
+
+def _unserialize(  # noqa: PLR0911
+    data, pos, charset, errors, decode_strings, array_hook
+):
+    """decode one value starting at ``data[pos]``, return ``(value, end)``
+    where ``end`` is the offset right after the value.
+
+    opcode is matched case-insensitive like `load` does.
+    """
+    try:
+        op = data[pos] | 0x20
+
+        if op == _S:
+            # s:<length>:"<bytes>";
+            sep = data.find(b":", pos + 2)
+            if sep == -1:
+                raise _TruncatedError
+            start = sep + 2
+            end = start + int(data[pos + 2 : sep])
+            if (
+                data[pos + 1] != _COLON
+                or data[sep + 1] != _QUOTE
+                or data[end] != _QUOTE
+                or data[end + 1] != _SEMICOLON
+            ):
+                raise _malformed(data, pos)
+            if decode_strings:
+                return data[start:end].decode(charset, errors), end + 2
+            return bytes(data[start:end]), end + 2
+
+        if op == _I or op == _D or op == _B:  # noqa: SIM109
+            # i:<int>; d:<float>; b:<0|1>;
+            end = data.find(b";", pos + 2)
+            if end == -1:
+                raise _TruncatedError
+            if data[pos + 1] != _COLON:
+                raise _malformed(data, pos)
+            if op == _I:
+                return int(data[pos + 2 : end]), end + 1
+            if op == _D:
+                return float(data[pos + 2 : end]), end + 1
+            return int(data[pos + 2 : end]) != 0, end + 1
+
+        if op == _A:
+            # a:<count>:{<key><value>...}
+            sep = data.find(b":", pos + 2)
+            if sep == -1:
+                raise _TruncatedError
+            if data[pos + 1] != _COLON or data[sep + 1] != _OPEN:
+                raise _malformed(data, pos)
+            count = int(data[pos + 2 : sep])
+            pos = sep + 2
+            result = []
+            for _ in range(count):
+                key, pos = _unserialize(
+                    data, pos, charset, errors, decode_strings, array_hook
+                )
+                value, pos = _unserialize(
+                    data, pos, charset, errors, decode_strings, array_hook
+                )
+                result.append((key, value))
+            if data[pos] != _CLOSE:
+                raise _malformed(data, pos)
+            return array_hook(result), pos + 1
+
+        if op == _N:
+            if data[pos + 1] != _SEMICOLON:
+                raise _malformed(data, pos)
+            return None, pos + 2
+    except IndexError:
+        raise _TruncatedError from None
+
+    if op == _O:
+        raise ValueError("deserialize php object is not allowed")
+    raise ValueError(f"unexpected opcode at offset {pos}")  # pragma: no cover
+
+
+def _malformed(data, pos) -> ValueError:  # pragma: no cover
+    return ValueError(
+        f"failed expectation, malformed value at offset {pos}: "
+        f"{bytes(data[pos : pos + 20])!r}"
+    )
+
+
+def loads_keys(
+    data,
+    keys: Iterable[Any],
+    charset="utf-8",
+    errors=default_errors,
+    decode_strings=True,
+    array_hook=None,
+) -> Dict[Any, Any]:
+    """Decode only the values of top level array `keys` from a PHP-serialized
+    array, values of other keys are skipped without being decoded.
+
+    Keys missing from the array are missing from the result. For a duplicated
+    key the last value is returned, as `loads` and php do, so the whole array is
+    scanned, only the values returned are decoded.
+    """
+    if array_hook is None:
+        array_hook = dict
+
+    data = _as_buffer(data)
+    wanted = keys if isinstance(keys, (set, frozenset)) else set(keys)
+    if not wanted:
+        return {}
+
+    offsets: Dict[Any, int] = {}
+    for key, start, _ in _scan_array(data, charset, errors, decode_strings):
+        if key in wanted:
+            offsets[key] = start
+    return {
+        key: _unserialize(data, start, charset, errors, decode_strings, array_hook)[0]
+        for key, start in offsets.items()
+    }
+
+
+class LazyArray(Mapping):
+    """Read-only view of a PHP-serialized array, top level keys are decoded on
+    construction, values are decoded on first access.
+
+    `raw(key)` return the serialized value without decoding it.
+    """
+
+    __slots__ = (
+        "_data",
+        "_charset",
+        "_errors",
+        "_decode_strings",
+        "_array_hook",
+        "_offsets",
+        "_values",
+    )
+
+    def __init__(
+        self,
+        data,
+        charset="utf-8",
+        errors=default_errors,
+        decode_strings=True,
+        array_hook=None,
+    ):
+        self._data = _as_buffer(data)
+        self._charset = charset
+        self._errors = errors
+        self._decode_strings = decode_strings
+        self._array_hook = dict if array_hook is None else array_hook
+        self._offsets: Dict[Any, Tuple[int, int]] = {
+            key: (start, end)
+            for key, start, end in _scan_array(
+                self._data, charset, errors, decode_strings
+            )
+        }
+        self._values: Dict[Any, Any] = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        start, _ = self._offsets[key]
+        value = _unserialize(
+            self._data,
+            start,
+            self._charset,
+            self._errors,
+            self._decode_strings,
+            self._array_hook,
+        )[0]
+        self._values[key] = value
+        return value
+
+    def __iter__(self) -> Iterator:
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, key) -> bool:
+        return key in self._offsets
+
+    def raw(self, key) -> bytes:
+        start, end = self._offsets[key]
+        return bytes(self._data[start:end])
+
+    def __repr__(self):
+        return f"<LazyArray keys={list(self._offsets)!r}>"
+
+
+def _scan_array(data, charset, errors, decode_strings):
+    """yield ``(key, start, end)`` for each item of the array at ``data[0]``,
+    ``data[start:end]`` is the serialized value.
+    """
+    try:
+        if data[0] | 0x20 != _A:
+            raise ValueError("php serialized data is not an array")
+        sep = data.find(b":", 2)
+        if sep == -1:
+            raise _TruncatedError
+        if data[1] != _COLON or data[sep + 1] != _OPEN:
+            raise _malformed(data, 0)
+        count = int(data[2:sep])
+    except IndexError:
+        raise _TruncatedError from None
+
+    pos = sep + 2
+    for _ in range(count):
+        key, pos = _unserialize(data, pos, charset, errors, decode_strings, dict)
+        end = _skip(data, pos)
+        yield key, pos, end
+        pos = end
+
+
+def _skip(data, pos):
+    """return the offset right after the value at ``data[pos]`` without decoding
+    it, strings are skipped by their length prefix and arrays by item count.
+    """
+    try:
+        op = data[pos] | 0x20
+
+        if op == _S:
+            sep = data.find(b":", pos + 2)
+            if sep == -1:
+                raise _TruncatedError
+            end = sep + 2 + int(data[pos + 2 : sep])
+            if (
+                data[sep + 1] != _QUOTE
+                or data[end] != _QUOTE
+                or data[end + 1] != _SEMICOLON
+            ):
+                raise _malformed(data, pos)
+            return end + 2
+
+        if op == _I or op == _D or op == _B:  # noqa: SIM109
+            end = data.find(b";", pos + 2)
+            if end == -1:
+                raise _TruncatedError
+            return end + 1
+
+        if op == _A:
+            sep = data.find(b":", pos + 2)
+            if sep == -1:
+                raise _TruncatedError
+            if data[sep + 1] != _OPEN:
+                raise _malformed(data, pos)
+            count = int(data[pos + 2 : sep])
+            pos = sep + 2
+            for _ in range(count * 2):
+                pos = _skip(data, pos)
+            if data[pos] != _CLOSE:
+                raise _malformed(data, pos)
+            return pos + 1
+
+        if op == _N:
+            return pos + 2
+    except IndexError:
+        raise _TruncatedError from None
+
+    if op == _O:
+        raise ValueError("deserialize php object is not allowed")
+    raise ValueError(f"unexpected opcode at offset {pos}")  # pragma: no cover
+
+
+def dumps(obj) -> str:
+    """Serialize `obj` to a PHP-serialized string.
+
+    Output is the same as `phpserialize.serialize` for `None`, `bool`, `int`,
+    `float`, `str`, `list` and `dict`, php objects are not supported. NaN and
+    infinity are intentionally written as php does, ``d:NAN;``, ``d:INF;`` and
+    ``d:-INF;``, see `dumps_float`.
+    """
+    out: list = []
+    _serialize(obj, out)
+    return "".join(out)
+
+
+def dumps_str(s: str) -> str:
+    if s.isascii():
+        return f's:{len(s)}:"{s}";'
+    return f's:{len(s.encode())}:"{s}";'
+
+
+def dumps_int(i: int) -> str:
+    if i > 9223372036854775807:
+        return _dumps_big_number(i)
+    return f"i:{i};"
+
+
+def dumps_float(f: float) -> str:
+    if not math.isfinite(f):
+        # php spelling, on purpose. `phpserialize.serialize` doesn't write
+        # these the same way (it raises, other versions write ``d:nan;``), php
+        # reads ``d:NAN;`` back as NAN
+        return "d:NAN;" if math.isnan(f) else ("d:INF;" if f > 0 else "d:-INF;")
+    if f > 9223372036854775807:
+        return _dumps_big_number(f)
+    return f"d:{f};"
+
+
+def _dumps_big_number(num) -> str:
+    # keep the same output as `phpserialize.serialize`
+    mantissa, exponent = f"d:{num:.15E};".split("E")
+    mantissa = mantissa.rstrip("0")
+    if mantissa.endswith("."):
+        mantissa += "0"
+    return f"{mantissa}E{exponent}"
+
+
+def _dumps_key(k) -> str:
+    t = type(k)
+    if t in (int, float):
+        return dumps_int(int(k))
+    if t is str:
+        if k.isdigit():
+            return dumps_int(int(k))
+        return dumps_str(k)
+    raise ValueError(f"Illegal offset type {t.__name__!r}")
+
+
+def _serialize(obj, out: list):
+    t = type(obj)
+    if t is str:
+        out.append(dumps_str(obj))
+    elif t is int:
+        out.append(dumps_int(obj))
+    elif obj is None:
+        out.append("N;")
+    elif t is bool:
+        out.append("b:1;" if obj else "b:0;")
+    elif t is float:
+        out.append(dumps_float(obj))
+    elif t is dict:
+        out.append(f"a:{len(obj)}:{{")
+        for key, value in obj.items():
+            out.append(_dumps_key(key))
+            _serialize(value, out)
+        out.append("}")
+    elif t is list:
+        out.append(f"a:{len(obj)}:{{")
+        for key, value in enumerate(obj):
+            out.append(f"i:{key};")
+            _serialize(value, out)
+        out.append("}")
+    else:
+        raise ValueError(f"serialize {t.__name__!r} is not allowed")
 
 
 def dict_to_list(d):
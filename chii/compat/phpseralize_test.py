@@ -1,11 +1,36 @@
+import math
+import mmap
+from io import BytesIO
+from typing import Any, Dict, List
 from pathlib import Path
 
 import pytest
+import phpserialize
 
-from chii.compat.phpseralize import loads, dict_to_list
+from chii.compat.phpseralize import (
+    LazyArray,
+    load,
+    dumps,
+    loads,
+    iter_load,
+    loads_keys,
+    dict_to_list,
+)
 
 fixtures_path = Path(__file__).parent.joinpath("fixtures")
 
+valid_fixtures = [
+    "subject_8_tags.txt",
+    "with_null.txt",
+    "bool.txt",
+    "tml_memo_subject.txt",
+    "tml_memo_subject_batch.txt",
+    "tml_img_subject.txt",
+    "tml_img_subject_batch.txt",
+    "tml_memo_progress.txt",
+    "tml_memo_episode.txt",
+]
+
 
 def test_loads():
     assert loads(b"a:4:{i:1;i:2;i:30;i:2;i:20;i:2;i:21;i:0;}") == {
@@ -67,3 +92,175 @@ def test_loads_disallow_object():
 
 def test_loads_bool():
     assert loads(fixtures_path.joinpath("bool.txt").read_bytes().strip()) == {1: True}
+
+
+@pytest.mark.parametrize("fixture", valid_fixtures)
+def test_loads_same_as_load(fixture: str):
+    raw = fixtures_path.joinpath(fixture).read_bytes().strip()
+
+    cases: List[Dict[str, Any]] = [
+        {},
+        {"decode_strings": True},
+        {"array_hook": list},
+        {"decode_strings": True, "array_hook": dict_to_list_or_dict},
+    ]
+    for kwargs in cases:
+        with BytesIO(raw) as fp:
+            expected = load(fp, **kwargs)
+        assert loads(raw, **{"decode_strings": False, **kwargs}) == expected
+        assert loads(memoryview(raw), **{"decode_strings": False, **kwargs}) == expected
+        assert loads(bytearray(raw), **{"decode_strings": False, **kwargs}) == expected
+
+
+def dict_to_list_or_dict(pairs):
+    try:
+        return dict_to_list(pairs)
+    except ValueError:
+        return dict(pairs)
+
+
+def test_loads_uppercase_opcode():
+    assert loads(b'A:2:{I:0;S:1:"a";i:1;N;}') == {0: "a", 1: None}
+
+
+def test_loads_ignore_trailing():
+    assert loads(b"i:1;i:2;") == 1
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"i:1", b's:3:"ab', b"a:1:{i:1;", b"a:1:{i:1;i:1;"]
+)
+def test_loads_truncated(data: bytes):
+    with pytest.raises(ValueError, match="unexpected end of stream"):
+        loads(data)
+
+
+def test_loads_str():
+    with pytest.raises(TypeError):
+        loads('s:1:"a";')  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        False,
+        0,
+        -3,
+        2**70,
+        1.5,
+        0.1 + 0.2,
+        1e20,
+        "",
+        "沙盒",
+        [1, "a", None],
+        {"1": 2, "x": [], 3.7: {"nested": True}},
+    ],
+)
+def test_dumps(value):
+    assert dumps(value) == phpserialize.serialize(value)
+
+
+@pytest.mark.parametrize("fixture", valid_fixtures)
+def test_dumps_round_trip(fixture: str):
+    raw = fixtures_path.joinpath(fixture).read_bytes().strip()
+    assert dumps(loads(raw)).encode() == raw
+
+
+def test_dumps_non_finite_float():
+    # php spelling, not the output of `phpserialize.serialize`
+    assert dumps([math.nan, math.inf, -math.inf]) == (
+        "a:3:{i:0;d:NAN;i:1;d:INF;i:2;d:-INF;}"
+    )
+    assert math.isnan(loads(b"d:NAN;"))
+    assert loads(b"d:-INF;") == -math.inf
+
+
+def test_dumps_disallow_object():
+    with pytest.raises(ValueError, match="not allowed"):
+        dumps(object())
+
+
+def test_loads_keys():
+    raw = fixtures_path.joinpath("tml_memo_subject_batch.txt").read_bytes().strip()
+    full = loads(raw)
+
+    assert loads_keys(raw, [1428, 302286, 404]) == {
+        1428: full[1428],
+        302286: full[302286],
+    }
+    assert loads_keys(raw, []) == {}
+    assert loads_keys(raw, {1428}, array_hook=list) == {
+        1428: dict(loads(raw, array_hook=list))[1428]
+    }
+
+
+def test_loads_keys_skip_nested():
+    raw = fixtures_path.joinpath("with_null.txt").read_bytes().strip()
+    assert loads_keys(raw, {2}) == {2: {0: 1, 1: 4.5, 2: 3}}
+    assert loads_keys(b'a:3:{i:0;a:1:{i:0;a:0:{}}s:1:"k";b:1;i:2;d:0.5;}', {2}) == {
+        2: 0.5
+    }
+
+
+def test_loads_keys_duplicated():
+    raw = b'a:3:{i:1;s:1:"a";i:2;b:1;i:1;s:1:"b";}'
+    # the last one, same as loads and LazyArray
+    assert loads(raw)[1] == LazyArray(raw)[1] == "b"
+    assert loads_keys(raw, {1}) == {1: "b"}
+
+
+def test_loads_keys_not_array():
+    with pytest.raises(ValueError, match="not an array"):
+        loads_keys(b"i:1;", {1})
+
+
+@pytest.mark.parametrize("fixture", valid_fixtures)
+def test_lazy_array(fixture: str):
+    raw = fixtures_path.joinpath(fixture).read_bytes().strip()
+    view = LazyArray(raw)
+    assert dict(view) == loads(raw)
+    for key in view:
+        assert loads(view.raw(key)) == view[key]
+
+
+def test_lazy_array_disallow_object():
+    with pytest.raises(ValueError, match="php object"):
+        LazyArray(fixtures_path.joinpath("disallow_object.txt").read_bytes().strip())
+
+
+def test_iter_load():
+    payloads = [
+        fixtures_path.joinpath(name).read_bytes().strip() for name in valid_fixtures
+    ]
+    stream = b"\n".join(payloads) + b"\n"
+
+    expected = []
+    offset = 0
+    for raw in payloads:
+        expected.append((offset, loads(raw)))
+        offset += len(raw) + 1
+
+    for chunk_size in [1, 7, 64, 1024 * 1024]:
+        with BytesIO(stream) as fp:
+            assert list(iter_load(fp, chunk_size=chunk_size)) == expected
+
+
+def test_iter_load_mmap(tmp_path: Path):
+    payloads = [
+        fixtures_path.joinpath(name).read_bytes().strip() for name in valid_fixtures
+    ]
+    file = tmp_path.joinpath("dump.txt")
+    file.write_bytes(b"".join(payloads))
+
+    with file.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert [value for _, value in iter_load(m)] == [loads(x) for x in payloads]
+
+
+def test_iter_load_truncated():
+    with BytesIO(b'i:1;a:1:{i:1;s:3:"ab') as fp:
+        it = iter_load(fp, chunk_size=4)
+        assert next(it) == (0, 1)
+        with pytest.raises(ValueError, match="unexpected end of stream"):
+            next(it)
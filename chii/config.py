@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import Literal, Optional
 
 from dotenv import load_dotenv
 from pydantic import Field, AnyHttpUrl, BaseSettings
@@ -19,20 +19,112 @@ class Settings(BaseSettings):
     MYSQL_USER: str = Field(env="MYSQL_USER", default="user")
     MYSQL_PASS: str = Field(env="MYSQL_PASS", default="password")
     MYSQL_DB: str = Field(env="MYSQL_DB", default="bangumi")
+    # read only replica for timeline read rpc, same user, password and database
+    MYSQL_REPLICA_HOST: Optional[str] = Field(env="MYSQL_REPLICA_HOST", default=None)
+    MYSQL_REPLICA_PORT: Optional[int] = Field(env="MYSQL_REPLICA_PORT", default=None)
+    # upper bound of replication lag, a user's own timeline is read from primary
+    # for this long after this node wrote it
+    replica_lag_seconds: float = Field(env="REPLICA_LAG_SECONDS", default=5)
 
     COMMIT_REF: str = Field(env="COMMIT_REF", default="dev")
     grpc_port: int = Field(env="GRPC_PORT", default=5000)
     grpc_max_workers: int = Field(env="GRPC_MAX_WORKERS", default=10)
+    # serve with grpc.aio and an async engine instead of a thread pool
+    grpc_aio: bool = Field(env="GRPC_AIO", default=False)
+    # rpcs handled at the same time by the aio server, more are rejected with
+    # RESOURCE_EXHAUSTED, unlimited by default. rpcs of the aio server are not
+    # bound to worker threads, `grpc_max_workers` only applies to the sync server
+    grpc_aio_max_concurrent_rpcs: Optional[int] = Field(
+        env="GRPC_AIO_MAX_CONCURRENT_RPCS", default=None
+    )
 
     SLOW_SQL_MS: int = Field(env="SLOW_SQL_MS", default=0)
 
+    # local http endpoint of sql and pool stats, 0 to disable
+    debug_http_port: int = Field(env="DEBUG_HTTP_PORT", default=0)
+    debug_http_host: str = Field(env="DEBUG_HTTP_HOST", default="127.0.0.1")
+
+    # connection pool of each engine, size defaults to `grpc_max_workers`, or
+    # `grpc_aio_max_concurrent_rpcs` of async engines when it's set,
+    # one connection for each rpc handled at the same time
+    db_pool_size: Optional[int] = Field(env="DB_POOL_SIZE", default=None)
+    db_max_overflow: int = Field(env="DB_MAX_OVERFLOW", default=20)
+    # seconds to wait for a connection before raising
+    db_pool_timeout: float = Field(env="DB_POOL_TIMEOUT", default=30)
+    db_pool_recycle: int = Field(env="DB_POOL_RECYCLE", default=14400)
+    # test connection with a ping on each checkout
+    db_pool_pre_ping: bool = Field(env="DB_POOL_PRE_PING", default=False)
+
+    # users whose newest timeline is cached in memory, 0 to disable.
+    # the cache is per process and only sees writes of this process, timelines
+    # written by other nodes or the PHP site are not in it, and a collection may
+    # merge into an older timeline of the user instead of the newest one.
+    # only enable it when a single node writes timelines.
+    latest_timeline_cache_size: int = Field(env="LATEST_TIMELINE_CACHE_SIZE", default=0)
+
+    # memory for decoded timelines returned by read rpc, 0 to disable
+    timeline_decode_cache_mb: int = Field(env="TIMELINE_DECODE_CACHE_MB", default=64)
+
+    # merge EpisodeCollect/SubjectProgress of the same user and subject
+    # received in this window into one write, 0 to disable
+    progress_coalesce_ms: int = Field(env="PROGRESS_COALESCE_MS", default=0)
+
+    # SubjectCollect and progress writes of the thread pool server received in
+    # this window, or up to `group_commit_max_items`, share one transaction.
+    # 0 to disable, see `chii.timeline.group_commit`
+    group_commit_ms: int = Field(env="GROUP_COMMIT_MS", default=0)
+    group_commit_max_items: int = Field(env="GROUP_COMMIT_MAX_ITEMS", default=50)
+
+    # serialize write rpc of the same user in the thread pool server with this
+    # many striped locks, 0 to disable, see `chii.timeline.locks`
+    user_lock_stripes: int = Field(env="USER_LOCK_STRIPES", default=4096)
+
+    # build friends timeline by k-way merge of per-user cursors instead of one
+    # ``tml_uid IN (...)`` query, see `chii.timeline.feed`. slower on sqlite,
+    # not measured on MySQL yet, see ``scripts/bench_friends_feed.py``
+    friends_timeline_merge: bool = Field(env="FRIENDS_TIMELINE_MERGE", default=False)
+
+    # write single timelines with the ORM unit of work, or Core INSERT/UPDATE,
+    # see `chii.timeline.writer`
+    timeline_writer: Literal["orm", "core"] = Field(
+        env="TIMELINE_WRITER", default="orm"
+    )
+
     @property
     def MYSQL_SYNC_DSN(self) -> str:
-        return "mysql+pymysql://{}:{}@{}:{}/{}".format(
+        return self._dsn("pymysql", self.MYSQL_HOST, self.MYSQL_PORT)
+
+    @property
+    def MYSQL_ASYNC_DSN(self) -> str:
+        return self._dsn("aiomysql", self.MYSQL_HOST, self.MYSQL_PORT)
+
+    @property
+    def MYSQL_REPLICA_SYNC_DSN(self) -> Optional[str]:
+        if not self.MYSQL_REPLICA_HOST:
+            return None
+        return self._dsn(
+            "pymysql",
+            self.MYSQL_REPLICA_HOST,
+            self.MYSQL_REPLICA_PORT or self.MYSQL_PORT,
+        )
+
+    @property
+    def MYSQL_REPLICA_ASYNC_DSN(self) -> Optional[str]:
+        if not self.MYSQL_REPLICA_HOST:
+            return None
+        return self._dsn(
+            "aiomysql",
+            self.MYSQL_REPLICA_HOST,
+            self.MYSQL_REPLICA_PORT or self.MYSQL_PORT,
+        )
+
+    def _dsn(self, driver: str, host: str, port: int) -> str:
+        return "mysql+{}://{}:{}@{}:{}/{}".format(
+            driver,
             self.MYSQL_USER,
             self.MYSQL_PASS,
-            self.MYSQL_HOST,
-            self.MYSQL_PORT,
+            host,
+            port,
             self.MYSQL_DB,
         )
 
@@ -0,0 +1,147 @@
+"""
+connection pool metrics.
+
+engines created by `chii.db.sa` use `TimedQueuePool` (or `TimedAsyncQueuePool`),
+they record the time each checkout waits for a free connection, including
+opening a new one when the pool is in overflow. `pool_stats` returns these
+and the current state of all pools in this process, to tell whether a slow rpc
+waited for the pool or for MySQL.
+"""
+import time
+import weakref
+import threading
+from typing import Any, Dict, List, Tuple
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, exc, event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# a checkout longer than this is counted in `PoolStats.waited`
+WAIT_THRESHOLD = 0.001
+
+
+@dataclass(slots=True)
+class PoolStats:
+    size: int = 0
+    checked_out: int = 0
+    # connections opened beyond `size`, negative if some of `size` aren't opened
+    overflow: int = 0
+    checkouts: int = 0
+    # checkouts slower than `WAIT_THRESHOLD`
+    waited: int = 0
+    wait_seconds: float = 0
+    max_wait_seconds: float = 0
+    # checkouts failed after `pool_timeout`
+    timeouts: int = 0
+    # new DBAPI connections
+    connects: int = 0
+    # connections discarded after an error, or pre-ping failure
+    invalidations: int = 0
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = PoolStats()
+
+    def checkout(self, seconds: float, timeout: bool = False):
+        with self._lock:
+            s = self._stats
+            if timeout:
+                s.timeouts += 1
+            else:
+                s.checkouts += 1
+            s.wait_seconds += seconds
+            if seconds > WAIT_THRESHOLD:
+                s.waited += 1
+            if seconds > s.max_wait_seconds:
+                s.max_wait_seconds = seconds
+
+    def connect(self, *args: Any):
+        with self._lock:
+            self._stats.connects += 1
+
+    def invalidate(self, *args: Any):
+        with self._lock:
+            self._stats.invalidations += 1
+
+    def stats(self, pool: QueuePool) -> PoolStats:
+        with self._lock:
+            s = self._stats
+            return PoolStats(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+                checkouts=s.checkouts,
+                waited=s.waited,
+                wait_seconds=s.wait_seconds,
+                max_wait_seconds=s.max_wait_seconds,
+                timeouts=s.timeouts,
+                connects=s.connects,
+                invalidations=s.invalidations,
+            )
+
+
+class _Timed:
+    metrics: PoolMetrics
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()  # type: ignore[misc]
+        except exc.TimeoutError:
+            self.metrics.checkout(time.perf_counter() - start, timeout=True)
+            raise
+        self.metrics.checkout(time.perf_counter() - start)
+        return conn
+
+    def recreate(self) -> Any:
+        # engine.dispose() replaces the pool, keep counting in the same metrics
+        pool = super().recreate()  # type: ignore[misc]
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(_Timed, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_Timed, AsyncAdaptedQueuePool):
+    pass
+
+
+_engines: List[Tuple[str, "weakref.ref[Engine]"]] = []
+_engines_lock = threading.Lock()
+
+
+def instrument(name: str, engine: Engine):
+    """record metrics of `engine`, its pool must be created by a `_Timed` class"""
+    metrics = PoolMetrics()
+    engine.pool.metrics = metrics  # type: ignore[attr-defined]
+    event.listen(engine, "connect", metrics.connect)
+    event.listen(engine, "invalidate", metrics.invalidate)
+    event.listen(engine, "soft_invalidate", metrics.invalidate)
+    with _engines_lock:
+        _engines.append((name, weakref.ref(engine)))
+
+
+def pool_stats() -> Dict[str, PoolStats]:
+    """stats of pools of all engines, by name. engines created more than once
+    are named ``name``, ``name-2``..."""
+    result: Dict[str, PoolStats] = {}
+    with _engines_lock:
+        engines = list(_engines)
+
+    for name, ref in engines:
+        engine = ref()
+        if engine is None:
+            continue
+        key = name
+        i = 1
+        while key in result:
+            i += 1
+            key = f"{name}-{i}"
+        pool = engine.pool
+        result[key] = pool.metrics.stats(pool)  # type: ignore[attr-defined]
+
+    return result
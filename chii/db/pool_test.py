@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+from sqlalchemy import exc, text, create_engine
+
+from chii.db.pool import TimedQueuePool, instrument, pool_stats
+
+
+def engine(tmp_path, name: str):
+    e = create_engine(
+        f"sqlite:///{tmp_path.joinpath('db.sqlite')}",
+        poolclass=TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    instrument(name, e)
+    return e
+
+
+def test_pool_stats(tmp_path):
+    e = engine(tmp_path, "test_pool_stats")
+    with e.connect() as conn:
+        conn.execute(text("select 1"))
+        stats = pool_stats()["test_pool_stats"]
+        assert stats.size == 1
+        assert stats.checked_out == 1
+        assert stats.overflow == 0
+
+        with pytest.raises(exc.TimeoutError):
+            e.connect()
+
+    stats = pool_stats()["test_pool_stats"]
+    assert stats.checked_out == 0
+    assert stats.checkouts == 1
+    assert stats.timeouts == 1
+    assert stats.connects == 1
+    assert stats.max_wait_seconds >= 0.1
+
+
+def test_pool_wait(tmp_path):
+    e = engine(tmp_path, "test_pool_wait")
+    conn = e.connect()
+    released = threading.Timer(0.05, conn.close)
+    released.start()
+    with e.connect():
+        pass
+    released.join()
+
+    stats = pool_stats()["test_pool_wait"]
+    assert stats.checkouts == 2
+    # the first checkout also connects, it may pass the threshold on a busy host
+    assert stats.waited >= 1
+    assert 0.05 <= stats.max_wait_seconds < 0.1
+
+
+def test_pool_invalidate_and_dispose(tmp_path):
+    e = engine(tmp_path, "test_pool_invalidate")
+    with e.connect() as conn:
+        conn.invalidate()
+
+    e.dispose()
+    with e.connect():
+        pass
+
+    stats = pool_stats()["test_pool_invalidate"]
+    assert stats.invalidations == 1
+    assert stats.checkouts == 2
+    assert stats.connects == 2
@@ -1,13 +1,19 @@
 import time
+import functools
+from typing import Any, Dict, Tuple, Union, TypeVar, Callable, Iterator, Optional
 
 from loguru import logger
 from sqlalchemy import (
     CHAR,
     Text,
     Column,
+    Engine,
+    Select,
     String,
     DateTime,
     Connection,
+    Executable,
+    CursorResult,
     or_,
     and_,
     func,
@@ -17,15 +23,27 @@ from sqlalchemy import (
     delete,
     select,
     update,
+    bindparam,
     create_engine,
 )
-from sqlalchemy.orm import joinedload, selectinload, sessionmaker, subqueryload
+from sqlalchemy.orm import Session, joinedload, selectinload, sessionmaker, subqueryload
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.dialects.mysql import insert
 
 from chii.config import config
+from chii.db.pool import TimedQueuePool, TimedAsyncQueuePool, instrument, pool_stats
+from chii.db.sql_stats import sql_stats
 
 count = func.count
 
+_TP = TypeVar("_TP", bound=Tuple[Any, ...])
+_S = TypeVar("_S", bound=Executable)
+
 __all__ = [
     "CHAR",
     "selectinload",
@@ -40,14 +58,22 @@ __all__ = [
     "text",
     "select",
     "update",
+    "bindparam",
     "insert",
     "and_",
     "func",
     "count",
     "or_",
     "get",
+    "scan",
+    "cached_statement",
+    "execute_core",
     "delete",
+    "RoutingSession",
     "sync_session_maker",
+    "async_session_maker",
+    "pool_stats",
+    "sql_stats",
 ]
 
 
@@ -58,35 +84,162 @@ def get(T, *where, order=None):
     return s
 
 
-def sync_session_maker():
+def cached_statement(fn: Callable[..., _S]) -> Callable[..., _S]:
+    """memoize a statement builder. its arguments should only decide the shape of
+    the statement (optional filters, size of a union...), values are `bindparam`
+    passed on execution.
+
+    SQLAlchemy generates the cache key of a statement to find its compiled form
+    on each execution, the key is memoized on the statement object. building the
+    statement again for each rpc and generating its key costs more Python time
+    than executing it, see ``scripts/bench_statement_cache.py``.
+    """
+    return functools.lru_cache(maxsize=256)(fn)  # type: ignore[return-value]
+
+
+def execute_core(
+    session: Session, statement: Executable, params: Optional[Dict[str, Any]] = None
+) -> CursorResult[Any]:
+    """execute `statement` on the connection of `session` without ORM execution.
+
+    for statements selecting columns or writing without ORM objects, rows are
+    plain tuples and the session is not autoflushed. the connection is chosen by
+    ``session.get_bind`` with this statement, `RoutingSession` may read replica.
+    """
+    conn = session.connection(bind_arguments={"clause": statement})
+    return conn.execute(statement, params)
+
+
+def scan(
+    conn: Union[Session, Connection], statement: Select[_TP], batch_size: int = 1000
+) -> Iterator[_TP]:
+    """rows of `statement` as tuples, in constant memory.
+
+    rows are read from a server side cursor (``SSCursor`` of pymysql) in batches
+    of `batch_size`, instead of buffering the whole result set in client. select
+    columns instead of ORM entities, they are not added to identity map.
+
+    the connection can't execute other statements before the iteration ends.
+    """
+    if isinstance(conn, Session):
+        conn = conn.connection()
+
+    with conn.execute(
+        statement.execution_options(stream_results=True, yield_per=batch_size)
+    ) as result:
+        yield from result.tuples()
+
+
+class RoutingSession(Session):
+    """session sending SELECT to replica engine `replica_bind` when created with
+    ``replica=True``, everything else and all statements of other sessions go to
+    the primary.
+
+    a write path must not use a replica session, data it reads to decide what to
+    write may be stale.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        replica_bind: Optional[Engine] = None,
+        replica: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.replica_bind = replica_bind if replica else None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self.replica_bind is not None
+            and isinstance(clause, Select)
+            and not self._flushing
+        ):
+            return self.replica_bind
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def sync_session_maker() -> sessionmaker[RoutingSession]:
+    """sessions of primary, ``SessionMaker(replica=True)`` reads from replica if
+    `MYSQL_REPLICA_HOST` is configured."""
+    replica = None
+    if config.MYSQL_REPLICA_SYNC_DSN:
+        replica = _sync_engine(config.MYSQL_REPLICA_SYNC_DSN, "sync-replica")
+
+    return sessionmaker(
+        _sync_engine(config.MYSQL_SYNC_DSN, "sync"),
+        class_=RoutingSession,
+        replica_bind=replica,
+    )
+
+
+def async_session_maker() -> async_sessionmaker[AsyncSession]:
+    replica = None
+    if config.MYSQL_REPLICA_ASYNC_DSN:
+        replica = _async_engine(config.MYSQL_REPLICA_ASYNC_DSN, "async-replica")
+
+    return async_sessionmaker(
+        _async_engine(config.MYSQL_ASYNC_DSN, "async"),
+        sync_session_class=RoutingSession,
+        # sync session of `AsyncSession` runs on sync engine of `AsyncEngine`
+        replica_bind=replica.sync_engine if replica is not None else None,
+    )
+
+
+def _sync_engine(dsn: str, name: str) -> Engine:
     engine = create_engine(
-        config.MYSQL_SYNC_DSN,
-        pool_recycle=14400,
-        pool_size=10,
-        max_overflow=20,
+        dsn,
+        poolclass=TimedQueuePool,
+        **pool_args(config.grpc_max_workers),
+        echo=config.debug,
+    )
+    instrument(name, engine)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    return engine
+
+
+def _async_engine(dsn: str, name: str) -> AsyncEngine:
+    engine = create_async_engine(
+        dsn,
+        poolclass=TimedAsyncQueuePool,
+        **pool_args(config.grpc_aio_max_concurrent_rpcs or config.grpc_max_workers),
         echo=config.debug,
     )
+    instrument(name, engine.sync_engine)
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+    return engine
 
-    if config.SLOW_SQL_MS:
-        event.listen(engine, "before_cursor_execute", before_cursor_execute)
-        event.listen(engine, "after_cursor_execute", after_cursor_execute)
 
-    return sessionmaker(engine)
+def pool_args(default_size: int) -> Dict[str, Any]:
+    return {
+        "pool_size": config.db_pool_size or default_size,
+        "max_overflow": config.db_max_overflow,
+        "pool_timeout": config.db_pool_timeout,
+        "pool_recycle": config.db_pool_recycle,
+        "pool_pre_ping": config.db_pool_pre_ping,
+    }
 
 
 def before_cursor_execute(
     conn: Connection, cursor, statement, parameters, context, executemany
 ):
-    conn.info.setdefault("query_start_time", []).append(time.time())
+    # on the execution context of this statement instead of a stack in
+    # ``conn.info``, nothing is left behind when the statement raises
+    context.query_start_time = time.time()
 
 
 def after_cursor_execute(
     conn: Connection, cursor, statement, parameters, context, executemany
 ):
-    start = conn.info["query_start_time"].pop(-1)
+    start = context.query_start_time
     end = time.time()
     total = end - start
-    if total * 1000 > config.SLOW_SQL_MS:
+    sql_stats.record(statement, total, cursor.rowcount)
+    if config.SLOW_SQL_MS and total * 1000 > config.SLOW_SQL_MS:
         logger.warning(
             "slow sql",
             statement=statement,
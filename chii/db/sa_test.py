@@ -0,0 +1,107 @@
+import pytest
+from sqlalchemy import Table, Column, Integer, MetaData, exc, event, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from chii.db import sa
+from chii.db.sql_stats import sql_stats
+
+metadata = MetaData()
+table = Table(
+    "t", metadata, Column("id", Integer, primary_key=True), Column("v", Integer)
+)
+
+
+def test_scan():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    options = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, stmt, params, context, many: options.append(
+            context.execution_options
+        ),
+    )
+    with Session(engine) as session:
+        session.execute(table.insert(), [{"id": i, "v": i * 2} for i in range(25)])
+
+        rows = list(
+            sa.scan(
+                session,
+                sa.select(table.c.id, table.c.v).where(table.c.id >= 5),
+                batch_size=10,
+            )
+        )
+        assert rows == [(i, i * 2) for i in range(5, 25)]
+        assert options[-1]["stream_results"]
+        assert options[-1]["yield_per"] == 10
+
+        # connection is usable after scan
+        assert session.scalar(sa.select(sa.count()).select_from(table)) == 25
+
+
+def test_routing_session():
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    for engine, v in [(primary, 1), (replica, 2)]:
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(table.insert(), {"id": 1, "v": v})
+
+    SessionMaker = sessionmaker(primary, class_=sa.RoutingSession, replica_bind=replica)
+    query = sa.select(table.c.v).where(table.c.id == 1)
+    with SessionMaker() as session:
+        assert session.scalar(query) == 1
+
+    with SessionMaker(replica=True) as session:
+        assert session.scalar(query) == 2
+        # writes always go to primary
+        session.execute(sa.update(table).values(v=3))
+        session.commit()
+
+    with primary.connect() as conn:
+        assert conn.scalar(query) == 3
+
+
+def test_execute_core():
+    primary = create_engine("sqlite://")
+    replica = create_engine("sqlite://")
+    for engine, v in [(primary, 1), (replica, 2)]:
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(table.insert(), {"id": 1, "v": v})
+
+    @sa.cached_statement
+    def query():
+        return sa.select(table.c.v).where(table.c.id == sa.bindparam("id"))
+
+    assert query() is query()
+
+    SessionMaker = sessionmaker(primary, class_=sa.RoutingSession, replica_bind=replica)
+    with SessionMaker(replica=True) as session:
+        assert sa.execute_core(session, query(), {"id": 1}).scalar() == 2
+        sa.execute_core(session, sa.update(table).values(v=sa.bindparam("v")), {"v": 3})
+        session.commit()
+
+    with primary.connect() as conn:
+        assert conn.scalar(query(), {"id": 1}) == 3
+
+
+def test_cursor_execute_listeners_statement_raises():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    event.listen(engine, "before_cursor_execute", sa.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", sa.after_cursor_execute)
+    sql_stats.reset()
+
+    with engine.connect() as conn:
+        conn.execute(table.insert(), {"id": 1, "v": 1})
+        for _ in range(3):
+            with pytest.raises(exc.IntegrityError):
+                conn.execute(table.insert(), {"id": 1, "v": 2})
+        # nothing is left on the connection by failed statements
+        assert "query_start_time" not in conn.info
+        assert conn.scalar(sa.select(sa.count()).select_from(table)) == 1
+
+    # only completed statements are recorded
+    assert sorted(s.count for s in sql_stats.stats()) == [1, 1]
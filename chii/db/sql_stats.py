@@ -0,0 +1,145 @@
+"""
+latency histogram of each SQL statement shape.
+
+statements are normalised to a fingerprint, literals and parameters become
+``?``, ``IN (?, ?, ?)`` lists and repeated ``UNION ALL`` parts are collapsed,
+so the same query with different values or list sizes shares one histogram.
+
+statement text of a cached compiled query is the same string each time,
+fingerprints are memoized and recording a statement is a dict lookup, a bisect
+and a few additions under a lock.
+"""
+import re
+import bisect
+import functools
+import itertools
+import threading
+from typing import Dict, List, Tuple
+from dataclasses import dataclass
+
+# upper bounds in seconds of histogram buckets, 0.1ms, 0.2ms ... ~105s
+BUCKETS: Tuple[float, ...] = tuple(0.0001 * 2**i for i in range(21))
+
+# statements beyond this share the fingerprint `OTHER`
+MAX_FINGERPRINTS = 1000
+OTHER = "other"
+
+_literal = re.compile(
+    r"""
+    '(?:[^'\\]|\\.|'')*'          # string
+    | %\(\w+\)s | %s | \?         # pymysql / sqlite parameters
+    | __\[POSTCOMPILE_\w+\]       # sqlalchemy literal_execute parameters
+    | \b\d+(?:\.\d+)?\b           # number
+    """,
+    re.VERBOSE,
+)
+_anon = re.compile(r"\b(anon|param)_\d+\b")
+_list = re.compile(r"\?(?:\s*,\s*\?)+")
+_space = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    s = _space.sub(" ", statement).strip()
+    s = _anon.sub(r"\1_?", s)
+    s = _literal.sub("?", s)
+    s = _list.sub("?, ...", s)
+
+    parts = s.split(" UNION ALL ")
+    if len(parts) > 1:
+        collapsed = [parts[0]]
+        for prev, part in itertools.pairwise(parts):
+            if part != prev:
+                collapsed.append(part)
+            elif collapsed[-1] != "...":
+                collapsed.append("...")
+        s = " UNION ALL ".join(collapsed)
+
+    return s
+
+
+@dataclass(slots=True)
+class StatementStats:
+    fingerprint: str
+    count: int
+    # rows returned or affected, as reported by cursor.rowcount
+    rows: int
+    total_seconds: float
+    max_seconds: float
+    # upper bound of the histogram bucket
+    p50: float
+    p95: float
+    p99: float
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "rows", "total", "max")
+
+    def __init__(self) -> None:
+        # last bucket for statements slower than `BUCKETS[-1]`
+        self.buckets: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count: int = 0
+        self.rows: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def percentile(self, q: float) -> float:
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target and n:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+
+class SqlStats:
+    def __init__(self, max_fingerprints: int = MAX_FINGERPRINTS):
+        self.max_fingerprints = max_fingerprints
+        self._data: Dict[str, _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, rows: int):
+        key = fingerprint(statement)
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            h = self._data.get(key)
+            if h is None:
+                if len(self._data) >= self.max_fingerprints:
+                    key = OTHER
+                h = self._data.setdefault(key, _Histogram())
+            h.buckets[bucket] += 1
+            h.count += 1
+            # -1, or ~0 of pymysql SSCursor, if unknown
+            if 0 < rows < 1 << 32:
+                h.rows += rows
+            h.total += seconds
+            if seconds > h.max:
+                h.max = seconds
+
+    def stats(self) -> List[StatementStats]:
+        """stats of each fingerprint, by total time descending"""
+        with self._lock:
+            result = [
+                StatementStats(
+                    fingerprint=key,
+                    count=h.count,
+                    rows=h.rows,
+                    total_seconds=h.total,
+                    max_seconds=h.max,
+                    p50=h.percentile(0.5),
+                    p95=h.percentile(0.95),
+                    p99=h.percentile(0.99),
+                )
+                for key, h in self._data.items()
+            ]
+        result.sort(key=lambda s: s.total_seconds, reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+# statements of all engines created by `chii.db.sa`
+sql_stats = SqlStats()
@@ -0,0 +1,55 @@
+import pytest
+
+from chii.db.sql_stats import OTHER, SqlStats, fingerprint
+
+
+def test_fingerprint():
+    assert (
+        fingerprint(
+            "SELECT a FROM t \nWHERE x IN (%(x_1)s, %(x_2)s)"
+            " AND y = 'it''s' AND z = 12 LIMIT __[POSTCOMPILE_limit]"
+        )
+        == "SELECT a FROM t WHERE x IN (?, ...) AND y = ? AND z = ? LIMIT ?"
+    )
+    assert fingerprint("SELECT a FROM t WHERE x IN (%s)") == (
+        "SELECT a FROM t WHERE x IN (?)"
+    )
+
+
+def test_fingerprint_union():
+    part = "SELECT anon_{0}.id FROM (SELECT t.id FROM t WHERE t.uid = %s) AS anon_{0}"
+    two = fingerprint(" UNION ALL ".join(part.format(i) for i in range(2)))
+    assert two == fingerprint(" UNION ALL ".join(part.format(i) for i in range(30)))
+    assert two.endswith("AS anon_? UNION ALL ...")
+
+
+def test_sql_stats():
+    stats = SqlStats()
+    for i in range(100):
+        stats.record("SELECT a FROM t WHERE id = %s", 0.001 if i < 90 else 0.1, 1)
+    stats.record("UPDATE t SET a = %s", 2, -1)
+
+    update, select = stats.stats()
+    assert update.fingerprint == "UPDATE t SET a = ?"
+    assert update.rows == 0
+    assert select.count == 100
+    assert select.rows == 100
+    assert select.total_seconds == pytest.approx(0.09 + 1)
+    assert select.max_seconds == 0.1
+    assert 0.001 <= select.p50 < 0.002
+    assert 0.1 <= select.p95 < 0.2
+    assert select.p99 == select.p95
+
+    stats.reset()
+    assert stats.stats() == []
+
+
+def test_sql_stats_max_fingerprints():
+    stats = SqlStats(max_fingerprints=1)
+    stats.record("SELECT a FROM t", 0.001, 1)
+    stats.record("SELECT b FROM t", 0.001, 1)
+    stats.record("SELECT c FROM t", 0.001, 1)
+    assert [(s.fingerprint, s.count) for s in stats.stats()] == [
+        (OTHER, 2),
+        ("SELECT a FROM t", 1),
+    ]
@@ -117,6 +117,32 @@ class ChiiEpisode(Base):
     ep_ban = Column(TINYINT(3), nullable=False, index=True, server_default=text("'0'"))
 
 
+class ChiiFriend(Base):
+    __tablename__ = "chii_friends"
+
+    uid: int = Column(
+        "frd_uid",
+        MEDIUMINT(8),
+        primary_key=True,
+        index=True,
+        server_default=text("'0'"),
+    )
+    fid: int = Column(
+        "frd_fid",
+        MEDIUMINT(8),
+        primary_key=True,
+        index=True,
+        server_default=text("'0'"),
+    )
+    grade = Column("frd_grade", TINYINT(3), nullable=False, server_default=text("'1'"))
+    dateline = Column(
+        "frd_dateline", INTEGER(10), nullable=False, server_default=text("'0'")
+    )
+    description = Column(
+        "frd_description", CHAR(255), nullable=False, server_default=text("''")
+    )
+
+
 class ChiiMemberfield(Base):
     __tablename__ = "chii_memberfields"
 
@@ -877,7 +903,21 @@ class ChiiIndexRelated(Base):
 
 class ChiiTimeline(Base):
     __tablename__ = "chii_timeline"
-    __table_args__ = (Index("query_tml_cat", "tml_uid", "tml_cat"),)
+    __table_args__ = (
+        Index("query_tml_cat", "tml_uid", "tml_cat"),
+        # covering index of `chii.timeline.latest_timeline_query`,
+        # probing user's newest timeline never reads tml_memo/tml_img
+        Index(
+            "query_tml_latest",
+            "tml_uid",
+            "tml_id",
+            "tml_dateline",
+            "tml_cat",
+            "tml_type",
+            "tml_batch",
+            "tml_related",
+        ),
+    )
 
     if TYPE_CHECKING:
 
@@ -897,20 +937,20 @@ class ChiiTimeline(Base):
         ):
             ...
 
-    id = Column("tml_id", INTEGER(10), primary_key=True)
-    uid = Column(
+    id: int = Column("tml_id", INTEGER(10), primary_key=True)
+    uid: int = Column(
         "tml_uid", MEDIUMINT(8), nullable=False, index=True, server_default=text("'0'")
     )
     cat: int = Column("tml_cat", SMALLINT(6), nullable=False, index=True)
     type: int = Column(
         "tml_type", SMALLINT(6), nullable=False, server_default=text("'0'")
     )
-    related = Column(
+    related: str = Column(
         "tml_related", CHAR(255), nullable=False, server_default=text("'0'"), default=0
     )
     memo: str = Column("tml_memo", MEDIUMTEXT, nullable=False)
     img: str = Column("tml_img", MEDIUMTEXT, nullable=False)
-    batch = Column("tml_batch", TINYINT(3), nullable=False, index=True)
+    batch: int = Column("tml_batch", TINYINT(3), nullable=False, index=True)
     source = Column(
         "tml_source",
         TINYINT(3),
@@ -1,42 +1,71 @@
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Tuple, Callable, Optional, NamedTuple
+from dataclasses import dataclass
 
 from pydantic import BaseModel
+from sqlalchemy import Select, Update, Integer
 
+from chii.db import sa
 from chii.compat import phpseralize
 from chii.subject import SubjectType
 from chii.db.const import IntEnum
-from chii.db.tables import ChiiTimeline
+from chii.db.tables import ChiiFriend, ChiiTimeline
+from chii.timeline.memo import (
+    BlogMemo,
+    EdenMemo,
+    MonoMemo,
+    WikiMemo,
+    GroupMemo,
+    IndexMemo,
+    DoujinMemo,
+    SayEditMemo,
+    SubjectMemo,
+    ProgressMemo,
+    RelationMemo,
+    SubjectImage,
+    dumps_batch,
+    set_batch_item,
+    dumps_subject_memo,
+    dumps_progress_memo,
+    dumps_subject_image,
+)
 
-
-class SubjectMemo(BaseModel):
-    collect_comment: str
-    collect_rate: int
-    subject_id: str
-    subject_name: str
-    subject_name_cn: str
-    subject_series: bool = False
-    subject_type_id: str
-
-
-class SubjectImage(BaseModel):
-    subject_id: str
-    images: str
-
-
-class ProgressMemo(BaseModel):
-    vols_update: Optional[int] = None
-    vols_total: Optional[str] = None
-
-    eps_update: Optional[int] = None
-    eps_total: Optional[str] = None
-
-    subject_id: Optional[str] = None
-    subject_type_id: Optional[str] = None
-    subject_name: Optional[str] = None
-
-    ep_name: Optional[str] = None
-    ep_sort: Optional[float] = None
-    ep_id: Optional[int] = None
+__all__ = [
+    "SubjectMemo",
+    "SubjectImage",
+    "ProgressMemo",
+    "RelationMemo",
+    "GroupMemo",
+    "EdenMemo",
+    "WikiMemo",
+    "SayEditMemo",
+    "BlogMemo",
+    "IndexMemo",
+    "MonoMemo",
+    "DoujinMemo",
+    "dumps_batch",
+    "set_batch_item",
+    "dumps_subject_memo",
+    "dumps_subject_image",
+    "dumps_progress_memo",
+    "Image",
+    "MERGE_WINDOW",
+    "LatestTimeline",
+    "latest_timeline_query",
+    "TIMELINE_PAGE_SIZE",
+    "TIMELINE_PAGE_MAX_SIZE",
+    "user_timeline_query",
+    "friends_timeline_query",
+    "friend_ids_query",
+    "update_memo_query",
+    "TimelineCat",
+    "Timeline",
+    "SUBJECT_TYPE_MAP",
+    "MEMO_DECODERS",
+    "parseMemo",
+    "parseImg",
+    "parseTimeLine",
+]
 
 
 class Image(BaseModel):
@@ -63,11 +92,112 @@ class TimelineCat(IntEnum):
     Doujin = 9
 
 
-class Timeline(BaseModel):
-    type: int
-    cat: int
+@dataclass(slots=True, kw_only=True)
+class Timeline:
     id: int
+    uid: int
+    cat: int
+    type: int
+    batch: bool
+    related: str
+    dateline: int
+    # decoded php array, or plain text of 吐槽
     memo: Any
+    img: Any
+
+
+# 同一用户 15 分钟内的同类时间线会被合并
+MERGE_WINDOW = 15 * 60
+
+
+class LatestTimeline(NamedTuple):
+    """columns of user's newest timeline needed to decide merging or inserting,
+    without `memo` and `img`.
+
+    covered by index `query_tml_latest`.
+    """
+
+    id: int
+    dateline: int
+    cat: int
+    type: int
+    batch: int
+    related: str
+
+    def in_merge_window(self, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        return self.dateline >= int(now - MERGE_WINDOW)
+
+
+@sa.cached_statement
+def latest_timeline_query() -> Select:
+    """newest timeline of user ``:uid``"""
+    return (
+        sa.select(
+            ChiiTimeline.id,
+            ChiiTimeline.dateline,
+            ChiiTimeline.cat,
+            ChiiTimeline.type,
+            ChiiTimeline.batch,
+            ChiiTimeline.related,
+        )
+        .where(ChiiTimeline.uid == sa.bindparam("uid"))
+        .order_by(ChiiTimeline.id.desc())
+        .limit(1)
+    )
+
+
+@sa.cached_statement
+def update_memo_query() -> Update:
+    """set memo of timeline ``:tl_id`` to ``:memo``"""
+    return (
+        sa.update(ChiiTimeline)
+        .where(ChiiTimeline.id == sa.bindparam("tl_id"))
+        .values(memo=sa.bindparam("memo"))
+    )
+
+
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_PAGE_MAX_SIZE = 100
+
+
+@sa.cached_statement
+def user_timeline_query(cat: bool, until: bool) -> Select:
+    """keyset pagination of user ``:uid``'s timeline, newest first.
+
+    parameters ``:cat`` and ``:until_id`` are used if `cat` and `until` is true,
+    and ``:limit``.
+
+    range scan of index `query_tml_cat (tml_uid, tml_cat)`, or `tml_uid` without
+    `cat`, both end with primary key `tml_id`, so the cost doesn't grow with page.
+    """
+    return _timeline_page(ChiiTimeline.uid == sa.bindparam("uid"), cat, until)
+
+
+@sa.cached_statement
+def friends_timeline_query(cat: bool, until: bool) -> Select:
+    """`user_timeline_query` of users in ``:uids``"""
+    return _timeline_page(
+        ChiiTimeline.uid.in_(sa.bindparam("uids", expanding=True)), cat, until
+    )
+
+
+def _timeline_page(where: Any, cat: bool, until: bool) -> Select:
+    query = sa.select(ChiiTimeline).where(where)
+    if cat:
+        query = query.where(ChiiTimeline.cat == sa.bindparam("cat"))
+    if until:
+        query = query.where(ChiiTimeline.id < sa.bindparam("until_id"))
+    return query.order_by(ChiiTimeline.id.desc()).limit(
+        sa.bindparam("limit", type_=Integer, literal_execute=True)
+    )
+
+
+@sa.cached_statement
+def friend_ids_query() -> Select:
+    """users followed by ``:uid``"""
+    return sa.select(ChiiFriend.fid).where(ChiiFriend.uid == sa.bindparam("uid"))
 
 
 SUBJECT_TYPE_MAP: Dict[int, List[int]] = {
@@ -79,26 +209,109 @@ SUBJECT_TYPE_MAP: Dict[int, List[int]] = {
 }
 
 
-def parseMemo(cat: int, type: int, batch: bool, memo: str):
-    if cat == TimelineCat.Relation and type in [2, 3, 4]:
-        return phpseralize.loads(memo)
+MemoDecoder = Callable[[str], Any]
 
-    if cat == TimelineCat.Say:
-        if type == 2:
-            return phpseralize.loads(memo)
-        return phpseralize.loads(memo)
-    return None
+# memo model of (cat, type), type None for all types of this cat.
+_MEMO_MODELS: Dict[Tuple[int, Optional[int]], Callable[[Any], Any]] = {
+    (TimelineCat.Relation, 2): RelationMemo.from_php,
+    (TimelineCat.Relation, 3): GroupMemo.from_php,
+    (TimelineCat.Relation, 4): GroupMemo.from_php,
+    (TimelineCat.Relation, 5): EdenMemo.from_php,
+    (TimelineCat.Relation, 6): EdenMemo.from_php,
+    (TimelineCat.Wiki, None): WikiMemo.from_php,
+    (TimelineCat.Subject, None): SubjectMemo.from_php,
+    (TimelineCat.Progress, None): ProgressMemo.from_php,
+    (TimelineCat.Say, 2): SayEditMemo.from_php,
+    (TimelineCat.Blog, None): BlogMemo.from_php,
+    (TimelineCat.Index, None): IndexMemo.from_php,
+    (TimelineCat.Mono, None): MonoMemo.from_php,
+    (TimelineCat.Doujin, None): DoujinMemo.from_php,
+}
 
+# types of each cat used by php site are all smaller than this
+_MAX_TYPE = 32
 
-def parseTimeLine(tl: ChiiTimeline) -> Timeline:
-    memo = parseMemo(tl.cat, tl.type, bool(tl.batch), tl.memo)
 
-    if not memo:
-        raise ValueError(
-            f"unexpected timeline<id=${tl.id}> cat ${tl.cat} type ${tl.type} ${tl.memo}"
-        )
+def _decode_php(memo: str) -> Any:
+    return phpseralize.loads(memo.encode())
+
+
+def _decode_text(memo: str) -> Any:
+    return memo
+
+
+def _single(model: Callable[[Any], Any]) -> MemoDecoder:
+    def decode(memo: str) -> Any:
+        return model(phpseralize.loads(memo.encode()))
+
+    return decode
+
 
-    if tl.cat == TimelineCat.Relation and type in [2, 3, 4]:
-        return Timeline(id=tl.id, cat=tl.cat, type=tl.type, memo=memo)
+def _batch(model: Callable[[Any], Any]) -> MemoDecoder:
+    """memo of batch timeline is a php array of ``{id: memo}``"""
+
+    def decode(memo: str) -> Any:
+        items = phpseralize.loads(memo.encode())
+        if not isinstance(items, dict):
+            raise ValueError(  # noqa: TRY004
+                f"memo of batch timeline should be a php array, got {items!r}"
+            )
+        return {key: model(value) for key, value in items.items()}
+
+    return decode
+
+
+def _memo_decoders() -> Dict[Tuple[int, int, bool], MemoDecoder]:
+    decoders: Dict[Tuple[int, int, bool], MemoDecoder] = {}
+    for cat in TimelineCat:
+        for type in range(_MAX_TYPE):
+            model = _MEMO_MODELS.get((cat, type)) or _MEMO_MODELS.get((cat, None))
+            if model is not None:
+                decoders[(cat, type, False)] = _single(model)
+                decoders[(cat, type, True)] = _batch(model)
+            elif cat == TimelineCat.Say:
+                # 吐槽 except [SayEditMemo] is not serialized
+                decoders[(cat, type, False)] = _decode_text
+                decoders[(cat, type, True)] = _decode_text
+    return decoders
+
+
+# (cat, type, batch) -> decoder, php arrays without a model are decoded as is.
+MEMO_DECODERS = _memo_decoders()
+
+
+def parseMemo(cat: int, type: int, batch: bool, memo: str) -> Any:
+    decode = MEMO_DECODERS.get((cat, type, batch), _decode_php)
+    if not memo and decode is not _decode_text:
+        return None
+
+    return decode(memo)
+
+
+def parseImg(img: str) -> Any:
+    if not img:
+        return None
+
+    return phpseralize.loads(img.encode())
+
+
+def parseTimeLine(tl: ChiiTimeline) -> Timeline:
+    try:
+        memo = parseMemo(tl.cat, tl.type, bool(tl.batch), tl.memo)
+        img = parseImg(tl.img)
+    except ValueError as e:
+        raise ValueError(
+            f"unexpected timeline<id={tl.id}> cat {tl.cat} type {tl.type}: {e}"
+        ) from e
 
-    raise ValueError("unknown timeline")
+    return Timeline(
+        id=tl.id,
+        uid=tl.uid,
+        cat=tl.cat,
+        type=tl.type,
+        batch=bool(tl.batch),
+        related=tl.related,
+        dateline=tl.dateline,
+        memo=memo,
+        img=img,
+    )
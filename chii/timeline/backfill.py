@@ -0,0 +1,205 @@
+"""
+parallel, resumable scan of ``chii_timeline`` by ``tml_id`` ranges.
+
+``[min_id, max_id]`` is split into ranges of `range_size` ids, each range is
+processed by ``func(start, end)`` in a `ProcessPoolExecutor`. `func` and
+`initializer` are pickled to the workers, so they must be module level
+functions (or `functools.partial` of them), the initializer should create the
+engine of the worker process, `session_maker` does this.
+
+finished ranges and the sum of their results are saved in a `Checkpoint` file,
+a restarted run only processes ids not covered by it, even with a different
+`range_size`, and reports results of the ranges finished by earlier runs too.
+"""
+import os
+import json
+import time
+import functools
+from typing import Any, Set, List, Tuple, Callable, Iterable, Optional
+from pathlib import Path
+from collections import Counter
+from dataclasses import field, dataclass
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from loguru import logger
+
+from chii.db import sa
+from chii.db.tables import ChiiTimeline
+
+# inclusive ``(start, end)`` of ``tml_id``
+IdRange = Tuple[int, int]
+
+
+@dataclass(slots=True)
+class RangeResult:
+    rows: int = 0
+    # timelines failed to process, by ``(cat, type)``
+    errors: Counter[Tuple[int, int]] = field(default_factory=Counter)
+
+    def add(self, other: "RangeResult"):
+        self.rows += other.rows
+        self.errors.update(other.errors)
+
+
+@functools.cache
+def session_maker():
+    """session maker of this worker process, engine is created on first call."""
+    return sa.sync_session_maker()
+
+
+def timeline_id_bounds() -> Optional[IdRange]:
+    with session_maker()() as session:
+        min_id, max_id = session.execute(
+            sa.select(sa.func.min(ChiiTimeline.id), sa.func.max(ChiiTimeline.id))
+        ).one()
+    if min_id is None:
+        return None
+    return min_id, max_id
+
+
+def split_range(start: int, end: int, size: int) -> List[IdRange]:
+    return [(s, min(s + size - 1, end)) for s in range(start, end + 1, size)]
+
+
+def merge_ranges(ranges: Iterable[IdRange]) -> List[IdRange]:
+    merged: List[IdRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def pending_ranges(
+    min_id: int, max_id: int, size: int, done: Iterable[IdRange]
+) -> List[IdRange]:
+    """ranges of at most `size` ids in ``[min_id, max_id]`` not covered by `done`"""
+    ranges: List[IdRange] = []
+    start = min_id
+    for done_start, done_end in merge_ranges(done):
+        if done_end < start:
+            continue
+        if done_start > max_id:
+            break
+        if done_start > start:
+            ranges.extend(split_range(start, done_start - 1, size))
+        start = done_end + 1
+    ranges.extend(split_range(start, max_id, size))
+    return ranges
+
+
+class Checkpoint:
+    """finished id ranges and the sum of their results, saved as json in `path`
+    after each ``add``.
+
+    ``path=None`` keeps them in memory only.
+    """
+
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.done: List[IdRange] = []
+        # results of ranges in `done`
+        self.result = RangeResult()
+        if path is not None and path.exists():
+            data = json.loads(path.read_text())
+            self.done = merge_ranges((start, end) for start, end in data["done"])
+            # missing in checkpoint of older version
+            self.result.rows = data.get("rows", 0)
+            self.result.errors.update(
+                {(cat, type): count for cat, type, count in data.get("errors", [])}
+            )
+
+    def add(self, r: IdRange, result: RangeResult):
+        self.done = merge_ranges([*self.done, r])
+        self.result.add(result)
+        if self.path is None:
+            return
+
+        data = {
+            "done": self.done,
+            "rows": self.result.rows,
+            "errors": [
+                [cat, type, count]
+                for (cat, type), count in sorted(self.result.errors.items())
+            ],
+        }
+        # write then rename, a crash never leaves a truncated checkpoint
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+
+def run(
+    func: Callable[[int, int], RangeResult],
+    bounds: Callable[[], Optional[IdRange]],
+    checkpoint: Checkpoint,
+    range_size: int = 100_000,
+    workers: Optional[int] = None,
+    initializer: Optional[Callable[[], Any]] = None,
+) -> RangeResult:
+    """process ids in ``bounds()`` not in `checkpoint` with `func`.
+
+    `bounds` also runs in a worker, the calling process never connects to
+    database. a range raising exception is logged and left out of checkpoint,
+    it will be processed again in next run.
+
+    return results of all ranges in `checkpoint`, including earlier runs.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = RangeResult()
+    total.add(checkpoint.result)
+    with ProcessPoolExecutor(workers, initializer=initializer) as pool:
+        id_bounds = pool.submit(bounds).result()
+        if id_bounds is None:
+            return total
+
+        ranges = pending_ranges(*id_bounds, range_size, checkpoint.done)
+        logger.info(
+            "processing ids {}..{} in {} ranges, {} workers",
+            *id_bounds,
+            len(ranges),
+            workers,
+        )
+
+        start_time = time.monotonic()
+        # rows of this run
+        rows = 0
+        futures = {pool.submit(func, *r): r for r in ranges}
+        failed: Set[IdRange] = set()
+        try:
+            for i, future in enumerate(as_completed(futures), 1):
+                r = futures[future]
+                result = _result(future, r)
+                if result is None:
+                    failed.add(r)
+                    continue
+
+                checkpoint.add(r, result)
+                total.add(result)
+                rows += result.rows
+                elapsed = time.monotonic() - start_time
+                logger.info(
+                    "{}/{} ranges, {} rows, {:.0f} rows/s, {} errors",
+                    i,
+                    len(ranges),
+                    total.rows,
+                    rows / elapsed if elapsed else 0,
+                    sum(total.errors.values()),
+                )
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    if failed:
+        logger.error("failed ranges: {}", merge_ranges(failed))
+
+    return total
+
+
+def _result(future: "Future[RangeResult]", r: IdRange) -> Optional[RangeResult]:
+    try:
+        return future.result()
+    except Exception:
+        logger.exception("failed to process ids {}..{}", *r)
+        return None
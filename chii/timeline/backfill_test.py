@@ -0,0 +1,75 @@
+from collections import Counter
+
+from chii.timeline.backfill import (
+    Checkpoint,
+    RangeResult,
+    run,
+    split_range,
+    merge_ranges,
+    pending_ranges,
+)
+
+
+def test_split_range():
+    assert split_range(1, 10, 4) == [(1, 4), (5, 8), (9, 10)]
+    assert split_range(1, 4, 4) == [(1, 4)]
+    assert split_range(5, 4, 4) == []
+
+
+def test_merge_ranges():
+    assert merge_ranges([(5, 8), (1, 4), (10, 12), (11, 11)]) == [(1, 8), (10, 12)]
+
+
+def test_pending_ranges():
+    assert pending_ranges(1, 10, 4, []) == [(1, 4), (5, 8), (9, 10)]
+    assert pending_ranges(1, 10, 4, [(1, 4), (9, 10)]) == [(5, 8)]
+    # checkpoint of a run with another range size
+    assert pending_ranges(1, 10, 4, [(3, 5)]) == [(1, 2), (6, 9), (10, 10)]
+    # table grew since last run
+    assert pending_ranges(1, 12, 4, [(1, 10), (20, 30)]) == [(11, 12)]
+
+
+def test_checkpoint(tmp_path):
+    path = tmp_path.joinpath("checkpoint")
+    c = Checkpoint(path)
+    assert c.done == []
+    c.add((5, 8), RangeResult(rows=4, errors=Counter({(1, 2): 1})))
+    c.add((1, 4), RangeResult(rows=3, errors=Counter({(1, 2): 1, (3, 0): 1})))
+
+    resumed = Checkpoint(path)
+    assert resumed.done == [(1, 8)]
+    assert resumed.result == RangeResult(rows=7, errors=Counter({(1, 2): 2, (3, 0): 1}))
+    assert not tmp_path.joinpath("checkpoint.tmp").exists()
+
+
+def bounds():
+    return 1, 10
+
+
+def count_ids(start: int, end: int) -> RangeResult:
+    if start == 5:
+        raise ValueError("failed")
+    return RangeResult(rows=end - start + 1, errors=Counter({(start, 0): 1}))
+
+
+def test_run():
+    checkpoint = Checkpoint(None)
+    result = run(count_ids, bounds, checkpoint, range_size=4, workers=2)
+    assert result.rows == 6
+    assert result.errors == Counter({(1, 0): 1, (9, 0): 1})
+    # failed range is processed again in next run
+    assert checkpoint.done == [(1, 4), (9, 10)]
+
+
+def grown_bounds():
+    return 1, 12
+
+
+def test_run_resume(tmp_path):
+    path = tmp_path.joinpath("checkpoint")
+    run(count_ids, bounds, Checkpoint(path), range_size=4, workers=2)
+
+    # ranges finished by the first run are counted
+    result = run(count_ids, grown_bounds, Checkpoint(path), range_size=4, workers=2)
+    assert result.rows == 8
+    assert result.errors == Counter({(1, 0): 1, (9, 0): 1, (11, 0): 1})
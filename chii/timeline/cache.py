@@ -0,0 +1,238 @@
+"""
+in-process caches of timeline service, stats of caches created with a `name` are
+returned by `cache_stats`.
+"""
+import time
+import weakref
+import threading
+from typing import Any, Dict, Union, Generic, TypeVar, Callable, Optional
+from collections import OrderedDict
+from dataclasses import replace, dataclass
+
+from chii.timeline import MERGE_WINDOW, LatestTimeline
+from chii.db.tables import ChiiTimeline
+
+
+@dataclass(slots=True)
+class CacheStats:
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    # removed by LRU because cache is full
+    evictions: int = 0
+    # removed because the timeline left merge window, or changed in database
+    expirations: int = 0
+    # approximate memory used by entries
+    bytes: int = 0
+
+
+class LatestTimelineCache:
+    """Bounded LRU of user's newest timeline, keyed by uid.
+
+    An entry is only useful to decide merging, so it expires once its timeline
+    leaves the merge window. ``maxsize=0`` disables the cache.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: int = MERGE_WINDOW,
+        timer: Callable[[], float] = time.time,
+        name: Optional[str] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._data: "OrderedDict[int, LatestTimeline]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        if name is not None:
+            _registry[name] = self
+
+    def get(self, uid: int) -> Optional[LatestTimeline]:
+        with self._lock:
+            latest = self._data.get(uid)
+            if latest is None:
+                self._stats.misses += 1
+                return None
+
+            if latest.dateline + self.ttl < self.timer():
+                del self._data[uid]
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+
+            self._data.move_to_end(uid)
+            self._stats.hits += 1
+            return latest
+
+    def put(self, uid: int, latest: LatestTimeline):
+        if not self.maxsize:
+            return
+
+        with self._lock:
+            self._data[uid] = latest
+            self._data.move_to_end(uid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats.evictions += 1
+
+    def discard(self, uid: int):
+        with self._lock:
+            self._data.pop(uid, None)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return replace(self._stats, size=len(self._data))
+
+
+V = TypeVar("V")
+
+
+class _Decoded(Generic[V]):
+    __slots__ = ("dateline", "memo", "img", "value", "size")
+
+    def __init__(self, tl: ChiiTimeline, value: V):
+        self.dateline = tl.dateline
+        # compared with the row on each hit, so a timeline changed by other
+        # process (php site, other nodes) is never served stale
+        self.memo = tl.memo
+        self.img = tl.img
+        self.value = value
+        self.size = approximate_size(tl)
+
+
+def approximate_size(tl: ChiiTimeline) -> int:
+    # measured with tracemalloc and sys.getsizeof on the timeline fixtures of
+    # `chii.compat`: an entry keeps the raw memo/img str for validation, the
+    # value of `timeline_json` (two JSON str) and the entry object, about 3
+    # bytes per character of memo and img plus 700 bytes. a `parseTimeLine`
+    # value (dataclasses) is up to twice as large for batch timelines.
+    return 3 * (len(tl.memo) + len(tl.img)) + 700
+
+
+class DecodedTimelineCache(Generic[V]):
+    """LRU of `decoder` result keyed by tml_id, bounded by approximate bytes.
+
+    `decoder` is `parseTimeLine`, or a function also converting the result to
+    what is served, so a hit costs no conversion either.
+
+    write paths call `discard` when they change memo of a timeline, an entry is
+    also dropped if memo, img or dateline of the row don't match it.
+    ``max_bytes=0`` disables the cache.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        decoder: Callable[[ChiiTimeline], V],
+        name: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.decoder = decoder
+        self._data: "OrderedDict[int, _Decoded[V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+        if name is not None:
+            _registry[name] = self
+
+    def decode(self, tl: ChiiTimeline) -> V:
+        """`decoder` result of the row, from cache if the row didn't change."""
+        if not self.max_bytes:
+            return self.decoder(tl)
+
+        with self._lock:
+            entry = self._data.get(tl.id)
+            if entry is not None:
+                if (
+                    entry.dateline == tl.dateline
+                    and entry.memo == tl.memo
+                    and entry.img == tl.img
+                ):
+                    self._data.move_to_end(tl.id)
+                    self._stats.hits += 1
+                    return entry.value
+
+                self._remove(tl.id)
+                self._stats.expirations += 1
+            self._stats.misses += 1
+
+        value = self.decoder(tl)
+        self.put(tl, value)
+        return value
+
+    def put(self, tl: ChiiTimeline, value: V):
+        entry = _Decoded(tl, value)
+        if entry.size > self.max_bytes:
+            return
+
+        with self._lock:
+            if tl.id in self._data:
+                self._remove(tl.id)
+            self._data[tl.id] = entry
+            self._stats.bytes += entry.size
+            while self._stats.bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._stats.bytes -= evicted.size
+                self._stats.evictions += 1
+
+    def discard(self, tl_id: int):
+        with self._lock:
+            if tl_id in self._data:
+                self._remove(tl_id)
+
+    def _remove(self, tl_id: int):
+        self._stats.bytes -= self._data.pop(tl_id).size
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return replace(self._stats, size=len(self._data))
+
+
+_Cache = Union[LatestTimelineCache, "DecodedTimelineCache[Any]"]
+_registry: "weakref.WeakValueDictionary[str, _Cache]" = weakref.WeakValueDictionary()
+
+
+def cache_stats() -> Dict[str, CacheStats]:
+    """stats of caches by name, the newest one of a name"""
+    return {name: c.stats() for name, c in list(_registry.items())}
+
+
+class RecentWrites:
+    """users whose timeline is written by this process in the last `window`
+    seconds, reads of their own timeline may miss it on a lagging replica.
+
+    keep at most `maxsize` users, ``window=0`` disables it.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        maxsize: int = 100_000,
+        timer: Callable[[], float] = time.time,
+    ):
+        self.window = window
+        self.maxsize = maxsize
+        self.timer = timer
+        self._data: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, uid: int):
+        if not self.window:
+            return
+
+        now = self.timer()
+        with self._lock:
+            self._data[uid] = now
+            self._data.move_to_end(uid)
+            # ordered by write time, oldest first
+            while self._data and (
+                len(self._data) > self.maxsize
+                or next(iter(self._data.values())) + self.window < now
+            ):
+                self._data.popitem(last=False)
+
+    def __contains__(self, uid: int) -> bool:
+        with self._lock:
+            written = self._data.get(uid)
+        return written is not None and written + self.window >= self.timer()
@@ -0,0 +1,180 @@
+from chii.timeline import (
+    MERGE_WINDOW,
+    SayEditMemo,
+    TimelineCat,
+    LatestTimeline,
+    parseTimeLine,
+)
+from chii.db.tables import ChiiTimeline
+from chii.timeline.cache import (
+    CacheStats,
+    RecentWrites,
+    LatestTimelineCache,
+    DecodedTimelineCache,
+    cache_stats,
+    approximate_size,
+)
+from chii.compat.phpseralize import dumps
+
+
+class FakeTimer:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def latest(tl_id: int, dateline: int) -> LatestTimeline:
+    return LatestTimeline(
+        id=tl_id, dateline=dateline, cat=3, type=2, batch=0, related="8"
+    )
+
+
+def test_get_put():
+    cache = LatestTimelineCache(10, timer=FakeTimer(1000))
+    assert cache.get(1) is None
+
+    cache.put(1, latest(1, 1000))
+    assert cache.get(1) == latest(1, 1000)
+
+    cache.put(1, latest(2, 1000))
+    assert cache.get(1) == latest(2, 1000)
+
+    assert cache.stats() == CacheStats(size=1, hits=2, misses=1)
+
+
+def test_expire():
+    timer = FakeTimer(1000)
+    cache = LatestTimelineCache(10, timer=timer)
+    cache.put(1, latest(1, 1000))
+
+    timer.now = 1000 + MERGE_WINDOW
+    assert cache.get(1) is not None
+
+    timer.now += 1
+    assert cache.get(1) is None
+    assert cache.stats() == CacheStats(size=0, hits=1, misses=1, expirations=1)
+
+
+def test_evict_least_recently_used():
+    cache = LatestTimelineCache(2, timer=FakeTimer(1000))
+    cache.put(1, latest(1, 1000))
+    cache.put(2, latest(2, 1000))
+    assert cache.get(1) is not None
+
+    cache.put(3, latest(3, 1000))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+    assert cache.stats().evictions == 1
+
+
+def test_discard():
+    cache = LatestTimelineCache(2, timer=FakeTimer(1000))
+    cache.put(1, latest(1, 1000))
+    cache.discard(1)
+    cache.discard(2)
+    assert cache.get(1) is None
+
+
+def test_disabled():
+    cache = LatestTimelineCache(0, timer=FakeTimer(1000))
+    cache.put(1, latest(1, 1000))
+    assert cache.get(1) is None
+    assert cache.stats().size == 0
+
+
+def timeline_row(tl_id: int, after: str = "a") -> ChiiTimeline:
+    return ChiiTimeline(
+        id=tl_id,
+        uid=1,
+        cat=TimelineCat.Say,
+        type=2,
+        related="8",
+        memo=dumps({"before": "", "after": after}),
+        img="",
+        batch=0,
+        dateline=1000,
+    )
+
+
+def test_decoded_hit():
+    cache = DecodedTimelineCache(1 << 20, parseTimeLine)
+    first = cache.decode(timeline_row(1))
+    assert first.memo == SayEditMemo(before="", after="a")
+    assert cache.decode(timeline_row(1)) is first
+    assert cache.stats() == CacheStats(
+        size=1, hits=1, misses=1, bytes=approximate_size(timeline_row(1))
+    )
+
+
+def test_decoded_row_changed():
+    cache = DecodedTimelineCache(1 << 20, parseTimeLine)
+    cache.decode(timeline_row(1))
+    assert cache.decode(timeline_row(1, after="b")).memo.after == "b"
+    assert cache.stats().expirations == 1
+
+
+def test_decoded_discard():
+    cache = DecodedTimelineCache(1 << 20, parseTimeLine)
+    cache.decode(timeline_row(1))
+    cache.discard(1)
+    cache.discard(2)
+    assert cache.stats() == CacheStats(misses=1)
+
+
+def test_decoded_evict_by_size():
+    size = approximate_size(timeline_row(1))
+    cache = DecodedTimelineCache(size * 2, parseTimeLine)
+    for tl_id in [1, 2, 3]:
+        cache.decode(timeline_row(tl_id))
+
+    stats = cache.stats()
+    assert stats.size == 2
+    assert stats.bytes == size * 2
+    assert stats.evictions == 1
+
+    cache.decode(timeline_row(1))
+    assert cache.stats().misses == 4
+
+
+def test_decoded_too_large():
+    cache = DecodedTimelineCache(100, parseTimeLine)
+    cache.decode(timeline_row(1))
+    assert cache.stats().size == 0
+
+
+def test_decoded_disabled():
+    cache = DecodedTimelineCache(0, parseTimeLine)
+    assert cache.decode(timeline_row(1)).memo.after == "a"
+    assert cache.stats() == CacheStats()
+
+
+def test_recent_writes():
+    timer = FakeTimer(1000)
+    recent = RecentWrites(5, maxsize=2, timer=timer)
+    recent.add(1)
+    assert 1 in recent
+    assert 2 not in recent
+
+    timer.now = 1005
+    recent.add(2)
+    recent.add(3)
+    assert 1 not in recent
+    assert 2 in recent
+
+    timer.now = 1011
+    assert 2 not in recent
+
+
+def test_recent_writes_disabled():
+    recent = RecentWrites(0)
+    recent.add(1)
+    assert 1 not in recent
+
+
+def test_cache_stats():
+    cache = DecodedTimelineCache(1 << 20, parseTimeLine, name="test")
+    cache.decode(timeline_row(1))
+    assert cache_stats()["test"] == cache.stats()
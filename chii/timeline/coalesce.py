@@ -0,0 +1,150 @@
+"""
+coalesce bursts of writes with the same key.
+
+the first submit of a key waits `window` seconds, later submits of the same key
+in the window only replace the value. then the final value is flushed once, and
+all callers return (or raise) with the result of this flush.
+
+`Coalescer` is used by the thread pool server, it waits in the caller's thread.
+`AsyncCoalescer` is the same for the asyncio server. stats of coalescers created
+with a `name` are returned by `coalesce_stats`.
+"""
+import time
+import asyncio
+import weakref
+import threading
+from typing import Any, Dict, Union, Generic, TypeVar, Callable, Optional, Awaitable
+from dataclasses import replace, dataclass
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class CoalesceStats:
+    # keys waiting for flush
+    pending: int = 0
+    submitted: int = 0
+    flushed: int = 0
+    # submits replaced by a later value of the same key, never written
+    collapsed: int = 0
+
+
+class _Pending(Generic[V]):
+    __slots__ = ("value", "done", "error")
+
+    def __init__(self, value: V):
+        self.value = value
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class Coalescer(Generic[K, V]):
+    def __init__(
+        self,
+        window: float,
+        flush: Callable[[K, V], Any],
+        name: Optional[str] = None,
+    ):
+        self.window = window
+        self.flush = flush
+        self._pending: Dict[K, _Pending[V]] = {}
+        self._lock = threading.Lock()
+        self._stats = CoalesceStats()
+        if name is not None:
+            _registry[name] = self
+
+    def submit(self, key: K, value: V):
+        with self._lock:
+            self._stats.submitted += 1
+            p = self._pending.get(key)
+            leader = p is None
+            if p is None:
+                p = self._pending[key] = _Pending(value)
+            else:
+                p.value = value
+                self._stats.collapsed += 1
+
+        if leader:
+            self._lead(key, p)
+        else:
+            p.done.wait()
+
+        if p.error is not None:
+            raise p.error
+
+    def _lead(self, key: K, p: _Pending[V]):
+        time.sleep(self.window)
+        with self._lock:
+            # submits after this point start a new flush
+            del self._pending[key]
+            self._stats.flushed += 1
+        try:
+            self.flush(key, p.value)
+        except BaseException as e:
+            p.error = e
+        finally:
+            p.done.set()
+
+    def stats(self) -> CoalesceStats:
+        with self._lock:
+            return replace(self._stats, pending=len(self._pending))
+
+
+class AsyncCoalescer(Generic[K, V]):
+    def __init__(
+        self,
+        window: float,
+        flush: Callable[[K, V], Awaitable[Any]],
+        name: Optional[str] = None,
+    ):
+        self.window = window
+        self.flush = flush
+        self._pending: Dict[K, _AsyncPending[V]] = {}
+        self._stats = CoalesceStats()
+        if name is not None:
+            _registry[name] = self
+
+    async def submit(self, key: K, value: V):
+        self._stats.submitted += 1
+        p = self._pending.get(key)
+        if p is None:
+            p = self._pending[key] = _AsyncPending(value)
+            # flush in its own task, cancelling the first caller doesn't drop
+            # values of other callers
+            p.task = asyncio.create_task(self._lead(key, p))
+        else:
+            p.value = value
+            self._stats.collapsed += 1
+
+        await asyncio.shield(p.task)
+
+    async def _lead(self, key: K, p: "_AsyncPending[V]"):
+        await asyncio.sleep(self.window)
+        # submits after this point start a new flush
+        del self._pending[key]
+        self._stats.flushed += 1
+        await self.flush(key, p.value)
+
+    def stats(self) -> CoalesceStats:
+        # only changed in the event loop, a copy read from other threads is
+        # at worst one submit behind
+        return replace(self._stats, pending=len(self._pending))
+
+
+class _AsyncPending(Generic[V]):
+    __slots__ = ("value", "task")
+
+    def __init__(self, value: V):
+        self.value = value
+        self.task: "asyncio.Task[None]"
+
+
+_registry: "weakref.WeakValueDictionary[str, Union[Coalescer, AsyncCoalescer]]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def coalesce_stats() -> Dict[str, CoalesceStats]:
+    """stats of coalescers by name, the newest one of a name"""
+    return {name: c.stats() for name, c in list(_registry.items())}
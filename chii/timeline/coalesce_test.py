@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import List, Tuple
+
+import pytest
+
+from chii.timeline.coalesce import (
+    Coalescer,
+    CoalesceStats,
+    AsyncCoalescer,
+    coalesce_stats,
+)
+
+
+def test_coalesce():
+    flushed: List[Tuple[str, int]] = []
+    c: Coalescer[str, int] = Coalescer(0.2, lambda k, v: flushed.append((k, v)))
+
+    threads = []
+    for key, value in [("a", 1), ("b", 1), ("a", 2), ("a", 3)]:
+        t = threading.Thread(target=c.submit, args=(key, value))
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+
+    assert sorted(flushed) == [("a", 3), ("b", 1)]
+    assert c.stats() == CoalesceStats(pending=0, submitted=4, flushed=2, collapsed=2)
+
+    c.submit("a", 4)
+    assert flushed[-1] == ("a", 4)
+
+
+def test_coalesce_error():
+    def flush(key: str, value: int):
+        raise ValueError(value)
+
+    c: Coalescer[str, int] = Coalescer(0.1, flush)
+    errors: List[BaseException] = []
+
+    def submit(value: int):
+        try:
+            c.submit("a", value)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(v,)) for v in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 3
+    assert c.stats().flushed == 1
+
+
+def test_async_coalesce():
+    flushed: List[Tuple[str, int]] = []
+
+    async def flush(key: str, value: int):
+        flushed.append((key, value))
+
+    async def main():
+        c: AsyncCoalescer[str, int] = AsyncCoalescer(0.05, flush)
+        await asyncio.gather(
+            c.submit("a", 1), c.submit("b", 1), c.submit("a", 2), c.submit("a", 3)
+        )
+        assert c.stats() == CoalesceStats(
+            pending=0, submitted=4, flushed=2, collapsed=2
+        )
+
+    asyncio.run(main())
+    assert sorted(flushed) == [("a", 3), ("b", 1)]
+
+
+def test_async_coalesce_leader_cancelled():
+    flushed: List[int] = []
+
+    async def flush(key: str, value: int):
+        flushed.append(value)
+
+    async def main():
+        c: AsyncCoalescer[str, int] = AsyncCoalescer(0.05, flush)
+        leader = asyncio.create_task(c.submit("a", 1))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(c.submit("a", 2))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(main())
+    assert flushed == [2]
+
+
+def test_coalesce_stats():
+    c: Coalescer[str, int] = Coalescer(0, lambda k, v: None, "test")
+    c.submit("a", 1)
+    assert coalesce_stats()["test"] == c.stats()
@@ -0,0 +1,240 @@
+"""
+flatten timelines into columnar batches for offline analytics.
+
+each memo item is one row, a batch timeline of n subjects gives n rows with the
+same `id` and their key in `item`. useful memo fields of all categories share
+nullable columns, a field not in the memo of a row is None. rows with a memo
+failed to decode are kept with all memo columns None and ``memo_error=True``.
+
+files are written with pyarrow (parquet) when it is installed, csv doesn't need
+any extra package.
+"""
+import os
+import csv
+from typing import (
+    Any,
+    Dict,
+    List,
+    Type,
+    Tuple,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Protocol,
+)
+from pathlib import Path
+
+from chii.timeline import SayEditMemo, parseMemo
+from chii.timeline.backfill import RangeResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+
+# `tml_id`, `tml_uid`, `tml_cat`, `tml_type`, `tml_batch`, `tml_related`,
+# `tml_dateline`, `tml_memo` of chii_timeline
+TimelineRow = Tuple[int, int, int, int, int, str, int, str]
+
+TIMELINE_COLUMNS: Dict[str, Type[Any]] = {
+    "id": int,
+    "uid": int,
+    "cat": int,
+    "type": int,
+    "batch": bool,
+    "related": str,
+    "dateline": int,
+    # key of item in batch memo
+    "item": str,
+    "memo_error": bool,
+}
+
+MEMO_COLUMNS: Dict[str, Type[Any]] = {
+    "subject_id": int,
+    "subject_type_id": int,
+    "ep_id": int,
+    "ep_sort": float,
+    "eps_update": int,
+    "vols_update": int,
+    "collect_rate": int,
+    "collect_comment": str,
+}
+
+COLUMNS: Dict[str, Type[Any]] = {
+    **TIMELINE_COLUMNS,
+    **MEMO_COLUMNS,
+    # 吐槽, or the new content of an edited one
+    "text": str,
+}
+
+_EMPTY_MEMO = (None,) * (len(MEMO_COLUMNS) + 1)
+
+
+def flatten(row: TimelineRow) -> List[Tuple[Any, ...]]:
+    """rows of `COLUMNS` from a timeline, raise `ValueError` for bad memo"""
+    tl_id, uid, cat, type, batch, related, dateline, memo = row
+    decoded = parseMemo(cat, type, bool(batch), memo)
+
+    head = (tl_id, uid, cat, type, bool(batch), related, dateline)
+    if batch and isinstance(decoded, dict):
+        return [
+            (*head, str(key), False, *_memo_fields(value))
+            for key, value in decoded.items()
+        ]
+
+    return [(*head, None, False, *_memo_fields(decoded))]
+
+
+def _memo_fields(memo: Any) -> Tuple[Any, ...]:
+    """values of `MEMO_COLUMNS` and text, raise `ValueError` for a field of
+    wrong type"""
+    if memo is None:
+        return _EMPTY_MEMO
+
+    if isinstance(memo, str):
+        return (*_EMPTY_MEMO[:-1], memo)
+
+    values: List[Any] = []
+    for name, t in MEMO_COLUMNS.items():
+        if isinstance(memo, dict):
+            value = memo.get(name)
+        else:
+            value = getattr(memo, name, None)
+        try:
+            values.append(None if value in (None, "") else t(value))
+        except (TypeError, ValueError) as e:
+            # memo of other categories isn't validated, it may be anything
+            raise ValueError(f"bad memo field {name}: {value!r}") from e
+
+    text = memo.after if isinstance(memo, SayEditMemo) else None
+    return (*values, text)
+
+
+def _error_row(row: TimelineRow) -> Tuple[Any, ...]:
+    tl_id, uid, cat, type, batch, related, dateline, _ = row
+    return (
+        tl_id,
+        uid,
+        cat,
+        type,
+        bool(batch),
+        related,
+        dateline,
+        None,
+        True,
+        *_EMPTY_MEMO,
+    )
+
+
+class ColumnBatch:
+    """rows of `COLUMNS` stored by column"""
+
+    def __init__(self):
+        self.columns: Dict[str, List[Any]] = {name: [] for name in COLUMNS}
+        self._lists = list(self.columns.values())
+
+    def __len__(self) -> int:
+        return len(self._lists[0])
+
+    def append(self, row: Tuple[Any, ...]):
+        for values, value in zip(self._lists, row, strict=True):
+            values.append(value)
+
+    def clear(self):
+        for values in self._lists:
+            values.clear()
+
+
+class Writer(Protocol):
+    def write(self, batch: ColumnBatch):
+        ...
+
+    def close(self):
+        ...
+
+
+class ParquetWriter:
+    def __init__(self, path: Path):
+        if pa is None:
+            raise RuntimeError("pyarrow is required to write parquet files")
+        types = {
+            int: pa.int64(),
+            float: pa.float64(),
+            bool: pa.bool_(),
+            str: pa.string(),
+        }
+        self.schema = pa.schema([(name, types[t]) for name, t in COLUMNS.items()])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, batch: ColumnBatch):
+        self._writer.write_table(
+            pa.Table.from_pydict(batch.columns, schema=self.schema)
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+class CsvWriter:
+    def __init__(self, path: Path):
+        self._file = path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, batch: ColumnBatch):
+        self._writer.writerows(zip(*batch.columns.values(), strict=True))
+
+    def close(self):
+        self._file.close()
+
+
+WRITERS: Dict[str, Callable[[Path], Writer]] = {
+    "parquet": ParquetWriter,
+    "csv": CsvWriter,
+}
+
+
+def write_range(
+    path: Path, fmt: str, rows: Iterable[TimelineRow], batch_size: int = 10_000
+) -> RangeResult:
+    """write flattened `rows` to `path` in batches of `batch_size`.
+
+    the file is written to a temporary name and renamed when complete, a
+    crashed export never leaves a partial file. nothing is written without rows.
+    """
+    result = RangeResult()
+    batch = ColumnBatch()
+    tmp = path.with_name(path.name + ".tmp")
+    writer: Optional[Writer] = None
+    try:
+        for row in _flatten_all(rows, result):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer = writer or WRITERS[fmt](tmp)
+                writer.write(batch)
+                batch.clear()
+
+        if len(batch):
+            writer = writer or WRITERS[fmt](tmp)
+            writer.write(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        os.replace(tmp, path)
+    return result
+
+
+def _flatten_all(
+    rows: Iterable[TimelineRow], result: RangeResult
+) -> Iterator[Tuple[Any, ...]]:
+    for row in rows:
+        result.rows += 1
+        try:
+            yield from flatten(row)
+        except ValueError:
+            result.errors[(row[2], row[3])] += 1
+            yield _error_row(row)
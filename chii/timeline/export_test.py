@@ -0,0 +1,121 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from chii.timeline import TimelineCat
+from chii.timeline.export import COLUMNS, flatten, write_range
+from chii.compat.phpseralize import dumps
+
+fixtures_path = Path(__file__).parent.parent.joinpath("compat", "fixtures")
+
+
+def row(cat: int, type: int, memo: str, batch: int = 0):
+    return (1, 2, cat, type, batch, "8", 1672520183, memo)
+
+
+def as_dict(values):
+    return dict(zip(COLUMNS, values, strict=True))
+
+
+def test_flatten_subject_batch():
+    memo = fixtures_path.joinpath("tml_memo_subject_batch.txt").read_text().strip()
+    rows = [as_dict(r) for r in flatten(row(TimelineCat.Subject, 2, memo, batch=1))]
+
+    assert [r["item"] for r in rows] == [
+        "363612",
+        "353657",
+        "1428",
+        "376703",
+        "328609",
+        "302286",
+    ]
+    assert rows[0]["id"] == 1
+    assert rows[0]["batch"] is True
+    assert rows[0]["subject_id"] == 363612
+    assert rows[0]["subject_type_id"] == 2
+    assert rows[0]["collect_rate"] == 7
+    assert rows[0]["collect_comment"] == "看了两集，感觉还行"
+    assert rows[1]["collect_comment"] is None
+    assert rows[0]["ep_id"] is None
+
+
+def test_flatten_episode():
+    memo = fixtures_path.joinpath("tml_memo_episode.txt").read_text().strip()
+    [r] = [as_dict(r) for r in flatten(row(TimelineCat.Progress, 0, memo))]
+    assert r["item"] is None
+    assert r["ep_id"] == 1075441
+    assert r["ep_sort"] == 2.0
+    assert r["subject_id"] == 363612
+
+
+def test_flatten_say():
+    [r] = [as_dict(r) for r in flatten(row(TimelineCat.Say, 1, "hello"))]
+    assert r["text"] == "hello"
+    assert r["subject_id"] is None
+
+    memo = dumps({"before": "a", "after": "b"})
+    [r] = [as_dict(r) for r in flatten(row(TimelineCat.Say, 2, memo))]
+    assert r["text"] == "b"
+
+
+def test_flatten_bad_memo():
+    with pytest.raises(ValueError, match="unexpected end"):
+        flatten(row(TimelineCat.Subject, 2, "a:1:{"))
+
+
+@pytest.mark.parametrize(
+    "memo",
+    [
+        {"subject_id": [1]},
+        {"subject_id": "8", "ep_sort": "x"},
+    ],
+)
+def test_flatten_malformed_memo(tmp_path, memo):
+    # decoded as is, fields are not validated
+    with pytest.raises(ValueError, match="bad memo field"):
+        flatten(row(TimelineCat.Relation, 0, dumps(memo)))
+
+    path = tmp_path.joinpath("1-1.csv")
+    result = write_range(path, "csv", [row(TimelineCat.Relation, 0, dumps(memo))])
+    assert result.errors == {(TimelineCat.Relation, 0): 1}
+    with path.open(encoding="utf-8") as f:
+        assert [r["memo_error"] for r in csv.DictReader(f)] == ["True"]
+
+
+def test_write_range_csv(tmp_path):
+    path = tmp_path.joinpath("1-4.csv")
+    result = write_range(
+        path,
+        "csv",
+        [
+            row(TimelineCat.Say, 1, "a"),
+            row(TimelineCat.Subject, 2, "a:1:{"),
+            row(TimelineCat.Say, 1, "b"),
+        ],
+        batch_size=2,
+    )
+
+    assert result.rows == 3
+    assert result.errors == {(TimelineCat.Subject, 2): 1}
+    with path.open(encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["text"] for r in rows] == ["a", "", "b"]
+    assert [r["memo_error"] for r in rows] == ["False", "True", "False"]
+    assert not tmp_path.joinpath("1-4.csv.tmp").exists()
+
+
+def test_write_range_empty(tmp_path):
+    path = tmp_path.joinpath("1-4.csv")
+    assert write_range(path, "csv", []).rows == 0
+    assert not path.exists()
+
+
+def test_write_range_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path.joinpath("1-4.parquet")
+    write_range(path, "parquet", [row(TimelineCat.Say, 1, "a")])
+
+    table = pq.read_table(path)  # noqa: PD012
+    assert table.column_names == list(COLUMNS)
+    assert table.column("text").to_pylist() == ["a"]
@@ -0,0 +1,120 @@
+"""
+timeline feed of many users, k-way merged by `tml_id`.
+
+``WHERE tml_uid IN (...) ORDER BY tml_id DESC LIMIT n`` reads and sorts all
+timelines of all followees after the cursor, it slows down with the number of
+followees and their history. Instead:
+
+1. newest ``tml_id`` of each followee, ``MAX(tml_id) GROUP BY tml_uid`` is one
+   index seek per user (loose index scan of `tml_uid` / `query_tml_cat`).
+2. if the `limit`-th largest of these ids is X, there are `limit` timelines
+   >= X, a user whose newest timeline is older than X has nothing in this page.
+   so at most `limit` users are left.
+3. a keyset cursor of at most `limit` ids for each of them, in one statement,
+   merged by `heapq.merge` and stop after `limit` ids.
+4. full rows are only fetched for the ids of this page.
+"""
+import heapq
+from typing import Dict, List, Tuple, Sequence
+from operator import itemgetter
+from itertools import islice
+
+from sqlalchemy import Select, Integer, union_all
+from sqlalchemy.orm import Session
+
+from chii.db import sa
+from chii.db.tables import ChiiTimeline
+
+# users in one `newest_ids_query`
+FEED_SHARD_SIZE = 1000
+
+
+def friends_feed(
+    session: Session,
+    uids: Sequence[int],
+    cat: int = 0,
+    until_id: int = 0,
+    limit: int = 20,
+    shard_size: int = FEED_SHARD_SIZE,
+) -> List[ChiiTimeline]:
+    """newest first timelines of `uids` with ``tml_id < until_id``."""
+    if not uids or limit <= 0:
+        return []
+
+    newest: List[Tuple[int, int]] = []
+    for i in range(0, len(uids), shard_size):
+        newest.extend(
+            sa.execute_core(
+                session,
+                newest_ids_query(bool(cat), bool(until_id)),
+                {"uids": uids[i : i + shard_size], "cat": cat, "until_id": until_id},
+            ).tuples()
+        )
+
+    candidates = [uid for uid, _ in heapq.nlargest(limit, newest, key=itemgetter(1))]
+    if not candidates:
+        return []
+
+    cursors: Dict[int, List[int]] = {uid: [] for uid in candidates}
+    params: Dict[str, int] = {f"uid_{i}": uid for i, uid in enumerate(candidates)}
+    params.update(cat=cat, until_id=until_id, limit=limit)
+    for uid, tl_id in sa.execute_core(
+        session, user_ids_query(len(candidates), bool(cat), bool(until_id)), params
+    ).tuples():
+        cursors[uid].append(tl_id)
+
+    ids = list(
+        islice(
+            heapq.merge(
+                *(sorted(c, reverse=True) for c in cursors.values()), reverse=True
+            ),
+            limit,
+        )
+    )
+
+    return list(
+        session.scalars(
+            sa.select(ChiiTimeline)
+            .where(ChiiTimeline.id.in_(ids))
+            .order_by(ChiiTimeline.id.desc())
+        )
+    )
+
+
+# statements below only depend on the number of users and used filters,
+# they are built and compiled once, only parameters change between pages.
+
+
+@sa.cached_statement
+def newest_ids_query(cat: bool, until: bool) -> Select:
+    """``(uid, newest tml_id)`` of each user in ``:uids``"""
+    query = sa.select(ChiiTimeline.uid, sa.func.max(ChiiTimeline.id)).where(
+        ChiiTimeline.uid.in_(sa.bindparam("uids", expanding=True))
+    )
+    if cat:
+        query = query.where(ChiiTimeline.cat == sa.bindparam("cat", type_=Integer))
+    if until:
+        query = query.where(ChiiTimeline.id < sa.bindparam("until_id", type_=Integer))
+    return query.group_by(ChiiTimeline.uid)
+
+
+@sa.cached_statement
+def user_ids_query(size: int, cat: bool, until: bool) -> Select:
+    """``(uid, tml_id)`` of newest ``:limit`` timelines of each user in
+    ``:uid_0 ... :uid_{size-1}``, one keyset scan of index per user."""
+    limit = sa.bindparam("limit", type_=Integer, literal_execute=True)
+    per_user = []
+    for i in range(size):
+        query = sa.select(
+            ChiiTimeline.uid.label("uid"), ChiiTimeline.id.label("id")
+        ).where(ChiiTimeline.uid == sa.bindparam(f"uid_{i}", type_=Integer))
+        if cat:
+            query = query.where(ChiiTimeline.cat == sa.bindparam("cat", type_=Integer))
+        if until:
+            query = query.where(
+                ChiiTimeline.id < sa.bindparam("until_id", type_=Integer)
+            )
+        sub = query.order_by(ChiiTimeline.id.desc()).limit(limit).subquery()
+        per_user.append(sa.select(sub.c.uid, sub.c.id))
+
+    return union_all(*per_user)  # type: ignore[return-value]
@@ -0,0 +1,30 @@
+from sqlalchemy.dialects import mysql
+
+from chii.timeline.feed import user_ids_query, newest_ids_query
+
+
+def compile_sql(query, **params) -> str:
+    return str(
+        query.params(**params).compile(
+            dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+def test_newest_ids_query():
+    sql = compile_sql(newest_ids_query(True, True), uids=[1, 2], cat=3, until_id=9)
+    assert sql.endswith(
+        "WHERE chii_timeline.tml_uid IN (1, 2) AND chii_timeline.tml_cat = 3"
+        " AND chii_timeline.tml_id < 9 GROUP BY chii_timeline.tml_uid"
+    )
+
+
+def test_user_ids_query():
+    query = user_ids_query(2, False, False)
+    assert query is user_ids_query(2, False, False)
+
+    sql = compile_sql(query, uid_0=1, uid_1=2, limit=20)
+    assert sql.count("UNION ALL") == 1
+    assert sql.count("ORDER BY chii_timeline.tml_id DESC \n LIMIT 20") == 2
+    assert "chii_timeline.tml_uid = 1 " in sql
+    assert "chii_timeline.tml_uid = 2 " in sql
@@ -0,0 +1,155 @@
+"""
+group commit of concurrent writes.
+
+callers `submit` an item and block. the first item of a group waits up to
+`window` seconds, or until `max_items` items are submitted, then its caller runs
+all items of the group with `run_group`, in one transaction with one commit.
+each caller returns the result of its own item.
+
+if `run_group` raises, its transaction is rolled back and items are run again one
+by one with `run_one`, a failed item only fails its own caller. a `BaseException`
+which is not an `Exception` is raised to callers of all items instead.
+
+stats of committers created with a `name` are returned by `group_stats`, the
+average group size and seconds of waiting and running a group are what to tune
+`window` with.
+"""
+import time
+import weakref
+import threading
+from typing import Any, Dict, List, Generic, TypeVar, Callable, Optional
+from dataclasses import replace, dataclass
+
+from loguru import logger
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass(slots=True)
+class GroupStats:
+    submitted: int = 0
+    groups: int = 0
+    # groups failed and run item by item
+    fallbacks: int = 0
+    max_group_size: int = 0
+    # leaders waiting for their group to fill, at most `window` each
+    wait_seconds: float = 0
+    # running groups, including one by one fallbacks
+    run_seconds: float = 0
+    max_run_seconds: float = 0
+
+
+class _Group(Generic[T]):
+    __slots__ = ("items", "results", "errors", "full", "done")
+
+    def __init__(self):
+        self.items: List[T] = []
+        self.results: List[Any] = []
+        self.errors: List[Optional[BaseException]] = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class GroupCommitter(Generic[T, R]):
+    def __init__(
+        self,
+        window: float,
+        max_items: int,
+        run_group: Callable[[List[T]], List[R]],
+        run_one: Callable[[T], R],
+        name: Optional[str] = None,
+    ):
+        self.window = window
+        self.max_items = max_items
+        self.run_group = run_group
+        self.run_one = run_one
+        self._group: Optional[_Group[T]] = None
+        self._lock = threading.Lock()
+        self._stats = GroupStats()
+        if name is not None:
+            _registry[name] = self
+
+    def submit(self, item: T) -> R:
+        with self._lock:
+            self._stats.submitted += 1
+            g = self._group
+            leader = g is None
+            if g is None:
+                g = self._group = _Group()
+            i = len(g.items)
+            g.items.append(item)
+            if len(g.items) >= self.max_items:
+                # submits after this point start a new group
+                self._group = None
+                g.full.set()
+
+        if leader:
+            self._lead(g)
+        else:
+            g.done.wait()
+
+        error = g.errors[i]
+        if error is not None:
+            raise error
+        result: R = g.results[i]
+        return result
+
+    def _lead(self, g: _Group[T]):
+        start = time.perf_counter()
+        g.full.wait(self.window)
+        with self._lock:
+            if self._group is g:
+                self._group = None
+            s = self._stats
+            s.groups += 1
+            s.max_group_size = max(s.max_group_size, len(g.items))
+            s.wait_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            self._run(g)
+        except BaseException as e:
+            # not run one by one, fail all items with it
+            g.errors = [e] * len(g.items)
+            raise
+        finally:
+            g.done.set()
+            self._record_run(time.perf_counter() - start)
+
+    def _record_run(self, seconds: float):
+        with self._lock:
+            s = self._stats
+            s.run_seconds += seconds
+            if seconds > s.max_run_seconds:
+                s.max_run_seconds = seconds
+
+    def _run(self, g: _Group[T]):
+        g.errors = [None] * len(g.items)
+        try:
+            g.results = self.run_group(g.items)
+            return
+        except Exception:
+            logger.exception("group of {} items failed, run one by one", len(g.items))
+            with self._lock:
+                self._stats.fallbacks += 1
+
+        g.results = [None] * len(g.items)
+        for i, item in enumerate(g.items):
+            try:
+                g.results[i] = self.run_one(item)
+            except BaseException as e:
+                g.errors[i] = e
+
+    def stats(self) -> GroupStats:
+        with self._lock:
+            return replace(self._stats)
+
+
+_registry: "weakref.WeakValueDictionary[str, GroupCommitter[Any, Any]]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def group_stats() -> Dict[str, GroupStats]:
+    """stats of group committers by name, the newest one of a name"""
+    return {name: g.stats() for name, g in list(_registry.items())}
@@ -0,0 +1,90 @@
+import threading
+from typing import Dict, List
+from dataclasses import replace
+
+import pytest
+
+from chii.timeline.group_commit import GroupStats, GroupCommitter, group_stats
+
+
+def submit_all(g: GroupCommitter[int, int], items: List[int]) -> Dict[int, object]:
+    results: Dict[int, object] = {}
+
+    def submit(item: int):
+        try:
+            results[item] = g.submit(item)
+        except (ValueError, KeyboardInterrupt) as e:
+            results[item] = e
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in items]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_group_commit():
+    groups: List[List[int]] = []
+
+    def run_group(items: List[int]) -> List[int]:
+        groups.append(sorted(items))
+        return [i * 10 for i in items]
+
+    g: GroupCommitter[int, int] = GroupCommitter(0.2, 100, run_group, pytest.fail)
+    assert submit_all(g, [1, 2, 3]) == {1: 10, 2: 20, 3: 30}
+    assert groups == [[1, 2, 3]]
+    stats = g.stats()
+    assert replace(stats, wait_seconds=0, run_seconds=0, max_run_seconds=0) == (
+        GroupStats(submitted=3, groups=1, fallbacks=0, max_group_size=3)
+    )
+    # the group waited for the whole window
+    assert stats.wait_seconds >= 0.2
+    assert 0 < stats.run_seconds == stats.max_run_seconds
+
+
+def test_group_commit_max_items():
+    groups: List[int] = []
+
+    def run_group(items: List[int]) -> List[int]:
+        groups.append(len(items))
+        return items
+
+    # a full group doesn't wait for the window
+    g: GroupCommitter[int, int] = GroupCommitter(10, 2, run_group, pytest.fail)
+    assert submit_all(g, [1, 2, 3, 4]) == {1: 1, 2: 2, 3: 3, 4: 4}
+    assert groups == [2, 2]
+
+
+def test_group_commit_fallback():
+    def run_group(items: List[int]) -> List[int]:
+        raise RuntimeError("deadlock")
+
+    def run_one(item: int) -> int:
+        if item == 2:
+            raise ValueError(item)
+        return item
+
+    g: GroupCommitter[int, int] = GroupCommitter(0.2, 100, run_group, run_one)
+    results = submit_all(g, [1, 2, 3])
+    assert results[1] == 1
+    assert isinstance(results[2], ValueError)
+    assert results[3] == 3
+    assert g.stats().fallbacks == 1
+
+
+def test_group_commit_base_exception():
+    def run_group(items: List[int]) -> List[int]:
+        raise KeyboardInterrupt
+
+    g: GroupCommitter[int, int] = GroupCommitter(0.2, 100, run_group, pytest.fail)
+    results = submit_all(g, [1, 2, 3])
+    assert sorted(results) == [1, 2, 3]
+    assert all(isinstance(r, KeyboardInterrupt) for r in results.values())
+    assert g.stats().fallbacks == 0
+
+
+def test_group_stats():
+    g: GroupCommitter[int, int] = GroupCommitter(0, 1, list, pytest.fail, "test")
+    g.submit(1)
+    assert group_stats()["test"] == g.stats()
@@ -0,0 +1,87 @@
+"""
+striped in-process locks, serialize write rpc of the same user on this node.
+
+concurrent rpc of a user read the newest timeline and merge or insert in their
+own transactions, they race through this logic and wait for each other's row
+and gap locks in InnoDB. holding the lock of the user around the transaction
+lets them run one by one in this process instead.
+
+a key is locked by one of a fixed number of `threading.Lock`, keys with the same
+``hash(key) % stripes`` share a lock. with 4096 stripes, two users block each
+other only if their uid collide modulo 4096, consecutive uids never do. time
+waited for locks is recorded, `lock_stats` returns it for all named locks.
+"""
+import time
+import weakref
+import threading
+import contextlib
+from typing import Dict, Iterator
+from dataclasses import replace, dataclass
+
+# an acquisition longer than this is counted in `LockStats.waited`
+WAIT_THRESHOLD = 0.001
+
+
+@dataclass(slots=True)
+class LockStats:
+    stripes: int = 0
+    acquisitions: int = 0
+    # acquisitions slower than `WAIT_THRESHOLD`
+    waited: int = 0
+    wait_seconds: float = 0
+    max_wait_seconds: float = 0
+
+
+class StripedLock:
+    def __init__(self, name: str, stripes: int):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._stats_lock = threading.Lock()
+        self._stats = LockStats(stripes=stripes)
+        _registry[name] = self
+
+    def stripe(self, key: int) -> int:
+        return hash(key) % len(self._locks)
+
+    @contextlib.contextmanager
+    def hold(self, *keys: int) -> Iterator[None]:
+        """hold locks of all `keys`.
+
+        stripes are acquired in index order, holders of overlapping keys never
+        deadlock. locks are not reentrant, don't hold a key twice in a thread.
+        """
+        stripes = sorted({self.stripe(key) for key in keys})
+        start = time.perf_counter()
+        acquired = 0
+        try:
+            for i in stripes:
+                self._locks[i].acquire()
+                acquired += 1
+            self._record(time.perf_counter() - start)
+            yield
+        finally:
+            for i in reversed(stripes[:acquired]):
+                self._locks[i].release()
+
+    def _record(self, seconds: float):
+        with self._stats_lock:
+            s = self._stats
+            s.acquisitions += 1
+            s.wait_seconds += seconds
+            if seconds > WAIT_THRESHOLD:
+                s.waited += 1
+            if seconds > s.max_wait_seconds:
+                s.max_wait_seconds = seconds
+
+    def stats(self) -> LockStats:
+        with self._stats_lock:
+            return replace(self._stats)
+
+
+_registry: "weakref.WeakValueDictionary[str, StripedLock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def lock_stats() -> Dict[str, LockStats]:
+    """stats of striped locks by name, the newest one of a name"""
+    return {name: lock.stats() for name, lock in list(_registry.items())}
@@ -0,0 +1,64 @@
+import time
+import threading
+
+from chii.timeline.locks import StripedLock, lock_stats
+
+
+def test_striped_lock_same_key():
+    lock = StripedLock("test", 16)
+    entered = threading.Event()
+    order = []
+
+    def first():
+        with lock.hold(1):
+            entered.set()
+            time.sleep(0.05)
+            order.append("first")
+
+    t = threading.Thread(target=first)
+    t.start()
+    entered.wait()
+    with lock.hold(17):  # same stripe as 1
+        order.append("second")
+    t.join()
+
+    assert order == ["first", "second"]
+    stats = lock.stats()
+    assert stats.acquisitions == 2
+    assert stats.waited == 1
+    assert stats.max_wait_seconds >= 0.03
+    assert lock_stats()["test"] == stats
+
+
+def test_striped_lock_other_key():
+    lock = StripedLock("test", 16)
+    with lock.hold(1):
+        done = threading.Event()
+
+        def other():
+            with lock.hold(2):
+                done.set()
+
+        threading.Thread(target=other).start()
+        assert done.wait(1)
+
+
+def test_striped_lock_many_keys():
+    lock = StripedLock("test", 16)
+    stop = time.monotonic() + 0.1
+
+    def hold(*keys: int):
+        while time.monotonic() < stop:
+            with lock.hold(*keys):
+                pass
+
+    # acquired in opposite order of keys, can't deadlock
+    threads = [
+        threading.Thread(target=hold, args=(1, 2, 3)),
+        threading.Thread(target=hold, args=(3, 2, 1, 17)),
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(2)
+        assert not t.is_alive()
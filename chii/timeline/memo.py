@@ -0,0 +1,389 @@
+"""
+memo of timeline written by this service, and their php serializer.
+
+memo classes are plain slotted dataclasses, `from_php` convert the output of
+`phpseralize.loads` with the same coercion as the pydantic models they replaced
+(``1`` -> ``"1"`` for str fields, ``"1"`` -> ``1`` for int fields...),
+without building validators on each call.
+
+`dumps_*` functions are specialised for the fixed key set of each memo,
+output is the same as ``phpserialize.serialize(dataclasses.asdict(memo))``,
+except NaN and infinity of float fields, written in php spelling
+(``d:NAN;``), see `phpseralize.dumps_float`.
+"""
+from typing import Any, Type, Mapping, TypeVar, Callable, Optional
+from dataclasses import dataclass
+
+from chii.compat.phpseralize import LazyArray, dumps_int, dumps_str, dumps_float
+
+
+@dataclass(slots=True, kw_only=True)
+class SubjectMemo:
+    collect_comment: str
+    collect_rate: int
+    subject_id: str
+    subject_name: str
+    subject_name_cn: str
+    subject_series: bool = False
+    subject_type_id: str
+
+    @classmethod
+    def from_php(cls, v: Any) -> "SubjectMemo":
+        d = _mapping(v, cls)
+        return cls(
+            collect_comment=_str(_required(d, "collect_comment")),
+            collect_rate=_int(_required(d, "collect_rate")),
+            subject_id=_str(_required(d, "subject_id")),
+            subject_name=_str(_required(d, "subject_name")),
+            subject_name_cn=_str(_required(d, "subject_name_cn")),
+            subject_series=_bool(d.get("subject_series", False)),
+            subject_type_id=_str(_required(d, "subject_type_id")),
+        )
+
+    def to_php(self) -> str:
+        return dumps_subject_memo(self)
+
+
+@dataclass(slots=True, kw_only=True)
+class SubjectImage:
+    subject_id: str
+    images: str
+
+    @classmethod
+    def from_php(cls, v: Any) -> "SubjectImage":
+        d = _mapping(v, cls)
+        return cls(
+            subject_id=_str(_required(d, "subject_id")),
+            images=_str(_required(d, "images")),
+        )
+
+    def to_php(self) -> str:
+        return dumps_subject_image(self)
+
+
+@dataclass(slots=True, kw_only=True)
+class ProgressMemo:
+    vols_update: Optional[int] = None
+    vols_total: Optional[str] = None
+
+    eps_update: Optional[int] = None
+    eps_total: Optional[str] = None
+
+    subject_id: Optional[str] = None
+    subject_type_id: Optional[str] = None
+    subject_name: Optional[str] = None
+
+    ep_name: Optional[str] = None
+    ep_sort: Optional[float] = None
+    ep_id: Optional[int] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "ProgressMemo":
+        d = _mapping(v, cls)
+        get = d.get
+        return cls(
+            vols_update=_optional(_int, get("vols_update")),
+            vols_total=_optional(_str, get("vols_total")),
+            eps_update=_optional(_int, get("eps_update")),
+            eps_total=_optional(_str, get("eps_total")),
+            subject_id=_optional(_str, get("subject_id")),
+            subject_type_id=_optional(_str, get("subject_type_id")),
+            subject_name=_optional(_str, get("subject_name")),
+            ep_name=_optional(_str, get("ep_name")),
+            ep_sort=_optional(_float, get("ep_sort")),
+            ep_id=_optional(_int, get("ep_id")),
+        )
+
+    def to_php(self) -> str:
+        return dumps_progress_memo(self)
+
+
+# memo of timelines written by the php site, only read by this service.
+# old rows are not consistent, all fields are optional.
+
+
+@dataclass(slots=True, kw_only=True)
+class RelationMemo:
+    """add friend, Relation type 2"""
+
+    uid: Optional[str] = None
+    username: Optional[str] = None
+    nickname: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "RelationMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class GroupMemo:
+    """join or create group, Relation type 3 and 4"""
+
+    grp_id: Optional[str] = None
+    grp_name: Optional[str] = None
+    grp_title: Optional[str] = None
+    grp_desc: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "GroupMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class EdenMemo:
+    """join or create 天窗, Relation type 5 and 6"""
+
+    eden_id: Optional[str] = None
+    eden_name: Optional[str] = None
+    eden_title: Optional[str] = None
+    eden_desc: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "EdenMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class WikiMemo:
+    subject_id: Optional[str] = None
+    subject_name: Optional[str] = None
+    subject_name_cn: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "WikiMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class SayEditMemo:
+    """Say type 2, 修改签名"""
+
+    before: Optional[str] = None
+    after: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "SayEditMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class BlogMemo:
+    entry_id: Optional[str] = None
+    entry_title: Optional[str] = None
+    entry_desc: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "BlogMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class IndexMemo:
+    idx_id: Optional[str] = None
+    idx_title: Optional[str] = None
+    idx_desc: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "IndexMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class MonoMemo:
+    """collect person or character, `cat` tells which one"""
+
+    id: Optional[str] = None
+    name: Optional[str] = None
+    cat: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "MonoMemo":
+        return _optional_str_fields(cls, v)
+
+
+@dataclass(slots=True, kw_only=True)
+class DoujinMemo:
+    id: Optional[str] = None
+    name: Optional[str] = None
+    title: Optional[str] = None
+
+    @classmethod
+    def from_php(cls, v: Any) -> "DoujinMemo":
+        return _optional_str_fields(cls, v)
+
+
+T = TypeVar("T")
+
+
+def _optional_str_fields(cls: Type[T], v: Any) -> T:
+    d = _mapping(v, cls)
+    return cls(
+        **{
+            name: _optional(_str, d.get(name))
+            for name in cls.__slots__  # type: ignore[attr-defined]
+        }
+    )
+
+
+# coercion of pydantic v1 default (non-strict) validators.
+
+
+def _mapping(v: Any, cls: type) -> Mapping:
+    if not isinstance(v, Mapping):
+        raise ValueError(  # noqa: TRY004
+            f"{cls.__name__} expected a php array, got {v!r}"
+        )
+    return v
+
+
+def _required(d: Mapping, key: str) -> Any:
+    try:
+        return d[key]
+    except KeyError:
+        raise ValueError(f"field {key!r} required") from None
+
+
+def _optional(fn: Callable[[Any], Any], v: Any) -> Any:
+    if v is None:
+        return None
+    return fn(v)
+
+
+def _str(v: Any) -> str:
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (int, float)):
+        return str(v)
+    if isinstance(v, bytes):
+        return v.decode()
+    raise ValueError(f"str type expected, got {v!r}")
+
+
+def _int(v: Any) -> int:
+    if type(v) is int:
+        return v
+    try:
+        return int(v)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"value is not a valid integer, got {v!r}") from None
+
+
+def _float(v: Any) -> float:
+    if type(v) is float:
+        return v
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"value is not a valid float, got {v!r}") from None
+
+
+_BOOL_FALSE = {0, "0", "off", "f", "false", "n", "no"}
+_BOOL_TRUE = {1, "1", "on", "t", "true", "y", "yes"}
+
+
+def _bool(v: Any) -> bool:
+    if v is True or v is False:
+        return v
+    if isinstance(v, bytes):
+        v = v.decode()
+    if isinstance(v, str):
+        v = v.lower()
+    try:
+        if v in _BOOL_TRUE:
+            return True
+        if v in _BOOL_FALSE:
+            return False
+    except TypeError:
+        pass
+    raise ValueError(f"value could not be parsed to a boolean, got {v!r}")
+
+
+def dumps_subject_memo(m: SubjectMemo) -> str:
+    return "".join(
+        (
+            'a:7:{s:15:"collect_comment";',
+            dumps_str(m.collect_comment),
+            's:12:"collect_rate";',
+            dumps_int(m.collect_rate),
+            's:10:"subject_id";',
+            dumps_str(m.subject_id),
+            's:12:"subject_name";',
+            dumps_str(m.subject_name),
+            's:15:"subject_name_cn";',
+            dumps_str(m.subject_name_cn),
+            's:14:"subject_series";',
+            "b:1;" if m.subject_series else "b:0;",
+            's:15:"subject_type_id";',
+            dumps_str(m.subject_type_id),
+            "}",
+        )
+    )
+
+
+def dumps_subject_image(m: SubjectImage) -> str:
+    return "".join(
+        (
+            'a:2:{s:10:"subject_id";',
+            dumps_str(m.subject_id),
+            's:6:"images";',
+            dumps_str(m.images),
+            "}",
+        )
+    )
+
+
+def dumps_progress_memo(m: ProgressMemo) -> str:
+    return "".join(
+        (
+            'a:10:{s:11:"vols_update";',
+            "N;" if m.vols_update is None else dumps_int(m.vols_update),
+            's:10:"vols_total";',
+            "N;" if m.vols_total is None else dumps_str(m.vols_total),
+            's:10:"eps_update";',
+            "N;" if m.eps_update is None else dumps_int(m.eps_update),
+            's:9:"eps_total";',
+            "N;" if m.eps_total is None else dumps_str(m.eps_total),
+            's:10:"subject_id";',
+            "N;" if m.subject_id is None else dumps_str(m.subject_id),
+            's:15:"subject_type_id";',
+            "N;" if m.subject_type_id is None else dumps_str(m.subject_type_id),
+            's:12:"subject_name";',
+            "N;" if m.subject_name is None else dumps_str(m.subject_name),
+            's:7:"ep_name";',
+            "N;" if m.ep_name is None else dumps_str(m.ep_name),
+            's:7:"ep_sort";',
+            "N;" if m.ep_sort is None else dumps_float(m.ep_sort),
+            's:5:"ep_id";',
+            "N;" if m.ep_id is None else dumps_int(m.ep_id),
+            "}",
+        )
+    )
+
+
+def dumps_batch(memo: Mapping[int, Any], dumps: Callable[[Any], str]) -> str:
+    """serialize memo of a batch timeline, ``{subject_id: memo}``"""
+    return "".join(
+        [f"a:{len(memo)}:{{"]
+        + [f"i:{key};{dumps(value)}" for key, value in memo.items()]
+        + ["}"]
+    )
+
+
+def set_batch_item(raw: bytes, key: int, dumped: str) -> str:
+    """replace or append item ``key`` of a serialized batch memo/img with the
+    serialized value ``dumped``.
+
+    other items are copied as is, without being decoded.
+    """
+    view = LazyArray(raw)
+    found = key in view or str(key) in view
+    parts = [f"a:{len(view) if found else len(view) + 1}:{{"]
+    for k in view:
+        if int(k) == key:
+            parts.append(f"i:{key};{dumped}")
+        else:
+            parts.append(f"i:{k};{view.raw(k).decode()}")
+    if not found:
+        parts.append(f"i:{key};{dumped}")
+    parts.append("}")
+    return "".join(parts)
@@ -0,0 +1,198 @@
+from typing import Any, Dict, Type, Optional
+from dataclasses import asdict, replace
+
+import pytest
+import pydantic
+import phpserialize
+
+from chii.timeline.memo import (
+    SubjectMemo,
+    ProgressMemo,
+    SubjectImage,
+    dumps_batch,
+    set_batch_item,
+    dumps_subject_memo,
+    dumps_progress_memo,
+    dumps_subject_image,
+)
+
+subject_memo = SubjectMemo(
+    subject_id="363612",
+    subject_type_id="2",
+    subject_name_cn="",
+    subject_series=True,
+    subject_name="沙盒",
+    collect_comment="&quot;神作&quot;",
+    collect_rate=7,
+)
+
+subject_image = SubjectImage(subject_id="363612", images="82/15/363612_On6wg.jpg")
+
+
+def test_dumps_subject_memo():
+    assert dumps_subject_memo(subject_memo) == phpserialize.serialize(
+        asdict(subject_memo)
+    )
+
+
+def test_dumps_subject_image():
+    assert dumps_subject_image(subject_image) == phpserialize.serialize(
+        asdict(subject_image)
+    )
+
+
+def test_dumps_progress_memo():
+    for memo in [
+        ProgressMemo(),
+        ProgressMemo(
+            ep_id=1075441,
+            subject_name="沙盒",
+            ep_name="",
+            subject_id="363612",
+            subject_type_id="2",
+            ep_sort=2.0,
+        ),
+        ProgressMemo(
+            subject_name="勇者、辞めます",
+            subject_id="353657",
+            subject_type_id="2",
+            eps_total="12",
+            vols_total="??",
+            eps_update=12,
+            vols_update=0,
+        ),
+    ]:
+        assert dumps_progress_memo(memo) == phpserialize.serialize(asdict(memo))
+
+
+def test_dumps_batch():
+    memo = {
+        363612: subject_memo,
+        1428: replace(subject_memo, subject_id="1428"),
+    }
+    assert dumps_batch(memo, dumps_subject_memo) == phpserialize.serialize(
+        {key: asdict(value) for key, value in memo.items()}
+    )
+
+
+def test_set_batch_item():
+    memo = {
+        363612: subject_memo,
+        1428: replace(subject_memo, subject_id="1428"),
+    }
+    raw = dumps_batch(memo, dumps_subject_memo).encode()
+    new = replace(subject_memo, collect_rate=1)
+
+    assert set_batch_item(raw, 1428, dumps_subject_memo(new)) == dumps_batch(
+        {363612: subject_memo, 1428: new}, dumps_subject_memo
+    )
+    assert set_batch_item(raw, 8, dumps_subject_memo(new)) == dumps_batch(
+        {**memo, 8: new}, dumps_subject_memo
+    )
+
+
+class PydanticSubjectMemo(pydantic.BaseModel):
+    collect_comment: str
+    collect_rate: int
+    subject_id: str
+    subject_name: str
+    subject_name_cn: str
+    subject_series: bool = False
+    subject_type_id: str
+
+
+class PydanticSubjectImage(pydantic.BaseModel):
+    subject_id: str
+    images: str
+
+
+class PydanticProgressMemo(pydantic.BaseModel):
+    vols_update: Optional[int] = None
+    vols_total: Optional[str] = None
+    eps_update: Optional[int] = None
+    eps_total: Optional[str] = None
+    subject_id: Optional[str] = None
+    subject_type_id: Optional[str] = None
+    subject_name: Optional[str] = None
+    ep_name: Optional[str] = None
+    ep_sort: Optional[float] = None
+    ep_id: Optional[int] = None
+
+
+@pytest.mark.parametrize(
+    ("cls", "model", "value"),
+    [
+        (SubjectMemo, PydanticSubjectMemo, asdict(subject_memo)),
+        (
+            SubjectMemo,
+            PydanticSubjectMemo,
+            {
+                "collect_comment": "",
+                "collect_rate": "8",
+                "subject_id": 363612,
+                "subject_name": "沙盒",
+                "subject_name_cn": 1.5,
+                "subject_type_id": "2",
+                "extra": "ignored",
+            },
+        ),
+        (
+            SubjectMemo,
+            PydanticSubjectMemo,
+            {**asdict(subject_memo), "subject_series": "1"},
+        ),
+        (
+            SubjectMemo,
+            PydanticSubjectMemo,
+            {**asdict(subject_memo), "subject_series": 0},
+        ),
+        (SubjectImage, PydanticSubjectImage, asdict(subject_image)),
+        (SubjectImage, PydanticSubjectImage, {"subject_id": 1, "images": ""}),
+        (ProgressMemo, PydanticProgressMemo, {}),
+        (
+            ProgressMemo,
+            PydanticProgressMemo,
+            {
+                "ep_id": "1075441",
+                "ep_name": "",
+                "ep_sort": "2",
+                "subject_id": "363612",
+                "subject_name": "沙盒",
+            },
+        ),
+        (
+            ProgressMemo,
+            PydanticProgressMemo,
+            {
+                "eps_total": "12",
+                "eps_update": 12,
+                "vols_total": "??",
+                "vols_update": None,
+                "subject_id": 353657,
+                "subject_type_id": "2",
+            },
+        ),
+    ],
+)
+def test_from_php_same_as_pydantic(
+    cls: Any, model: Type[pydantic.BaseModel], value: Dict[str, Any]
+):
+    m = cls.from_php(value)
+    assert asdict(m) == model.parse_obj(value).dict()
+    assert m.to_php() == phpserialize.serialize(model.parse_obj(value).dict())
+
+
+@pytest.mark.parametrize(
+    ("cls", "value"),
+    [
+        (SubjectMemo, {**asdict(subject_memo), "collect_rate": "1.5"}),
+        (SubjectMemo, {**asdict(subject_memo), "subject_series": "2"}),
+        (SubjectMemo, {**asdict(subject_memo), "subject_id": None}),
+        (SubjectImage, {"subject_id": "1"}),
+        (SubjectImage, "a"),
+        (ProgressMemo, {"ep_sort": "x"}),
+    ],
+)
+def test_from_php_invalid(cls: Any, value: Any):
+    with pytest.raises(ValueError, match="valid|boolean|expected|required"):
+        cls.from_php(value)
@@ -0,0 +1,147 @@
+from typing import Any
+from pathlib import Path
+
+import pytest
+from sqlalchemy.dialects import mysql
+
+from chii.timeline import (
+    BlogMemo,
+    MonoMemo,
+    WikiMemo,
+    GroupMemo,
+    IndexMemo,
+    DoujinMemo,
+    SayEditMemo,
+    SubjectMemo,
+    TimelineCat,
+    ProgressMemo,
+    RelationMemo,
+    parseMemo,
+    parseTimeLine,
+    user_timeline_query,
+    friends_timeline_query,
+)
+from chii.db.tables import ChiiTimeline
+from chii.compat.phpseralize import dumps, loads
+
+fixtures_path = Path(__file__).parent.parent.joinpath("compat", "fixtures")
+
+
+def timeline(
+    cat: int = TimelineCat.Subject,
+    type: int = 2,
+    memo: str = "",
+    img: str = "",
+    batch: int = 0,
+) -> ChiiTimeline:
+    return ChiiTimeline(
+        id=1,
+        uid=2,
+        cat=cat,
+        type=type,
+        related="8",
+        memo=memo,
+        img=img,
+        batch=batch,
+        dateline=1672520183,
+    )
+
+
+def test_parse_subject_batch():
+    memo = fixtures_path.joinpath("tml_memo_subject_batch.txt").read_text().strip()
+    img = fixtures_path.joinpath("tml_img_subject_batch.txt").read_text().strip()
+
+    tl = parseTimeLine(timeline(memo=memo, img=img, batch=1))
+
+    assert tl.batch
+    assert tl.memo == {
+        key: SubjectMemo.from_php(value) for key, value in loads(memo.encode()).items()
+    }
+    assert tl.img == loads(img.encode())
+
+
+@pytest.mark.parametrize(
+    ("cat", "type", "memo", "expected"),
+    [
+        (
+            TimelineCat.Relation,
+            2,
+            {"uid": 1, "username": "u", "nickname": "n"},
+            RelationMemo(uid="1", username="u", nickname="n"),
+        ),
+        (
+            TimelineCat.Relation,
+            3,
+            {"grp_id": "2", "grp_name": "a"},
+            GroupMemo(grp_id="2", grp_name="a"),
+        ),
+        (
+            TimelineCat.Wiki,
+            1,
+            {"subject_id": "1", "subject_name": "n"},
+            WikiMemo(subject_id="1", subject_name="n"),
+        ),
+        (
+            TimelineCat.Progress,
+            2,
+            {"ep_id": "5", "ep_sort": "2"},
+            ProgressMemo(ep_id=5, ep_sort=2.0),
+        ),
+        (
+            TimelineCat.Say,
+            2,
+            {"before": "a", "after": "b"},
+            SayEditMemo(before="a", after="b"),
+        ),
+        (TimelineCat.Blog, 1, {"entry_id": 3}, BlogMemo(entry_id="3")),
+        (TimelineCat.Index, 1, {"idx_id": 3}, IndexMemo(idx_id="3")),
+        (TimelineCat.Mono, 1, {"id": 3, "cat": 1}, MonoMemo(id="3", cat="1")),
+        (TimelineCat.Doujin, 1, {"id": 3}, DoujinMemo(id="3")),
+        (TimelineCat.Relation, 9, {"x": 1}, {"x": 1}),
+    ],
+)
+def test_parse_memo(cat: int, type: int, memo: Any, expected: Any):
+    assert parseMemo(cat, type, False, dumps(memo)) == expected
+    assert parseMemo(cat, type, True, dumps({7: memo})) == {7: expected}
+
+
+def test_parse_memo_batch_not_array():
+    with pytest.raises(ValueError, match="batch timeline"):
+        parseMemo(TimelineCat.Subject, 2, True, "i:1;")
+
+
+def test_parse_say():
+    tl = parseTimeLine(timeline(cat=TimelineCat.Say, type=1, memo="a:1:{"))
+    assert tl.memo == "a:1:{"
+    assert tl.img is None
+
+
+def test_parse_invalid():
+    with pytest.raises(ValueError, match="timeline<id=1>"):
+        parseTimeLine(timeline(memo="a:1:{"))
+
+
+def compile_sql(query, **params) -> str:
+    return str(
+        query.params(**params).compile(
+            dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+def test_user_timeline_query():
+    query = user_timeline_query(True, True)
+    assert query is user_timeline_query(True, True)
+    sql = compile_sql(query, uid=1, cat=3, until_id=100, limit=10)
+    assert sql.endswith(
+        "WHERE chii_timeline.tml_uid = 1"
+        " AND chii_timeline.tml_cat = 3 AND chii_timeline.tml_id < 100"
+        " ORDER BY chii_timeline.tml_id DESC \n LIMIT 10"
+    )
+
+
+def test_friends_timeline_query_first_page():
+    sql = compile_sql(friends_timeline_query(False, False), uids=[1, 2], limit=20)
+    assert "chii_timeline.tml_uid IN (1, 2)" in sql
+    assert "tml_id <" not in sql
+    assert "tml_cat" not in sql.split("WHERE")[1]
@@ -0,0 +1,214 @@
+"""
+writing a single timeline, with or without the ORM unit of work.
+
+`OrmTimelineWriter` adds new `ChiiTimeline` to the session and flushes it,
+timelines to merge are loaded into the identity map.
+
+`CoreTimelineWriter` writes the same rows with ``INSERT INTO chii_timeline``, a
+timeline loaded for merging is detached, never in the session. column defaults
+of `ChiiTimeline` (source, replies, dateline) are Core defaults and apply to both.
+
+merging is a read-modify-write of ``tml_memo``, `save` of both writers is a
+compare-and-set without holding locks::
+
+    UPDATE chii_timeline SET ... WHERE tml_id = ? AND MD5(tml_memo) = ?
+
+with the hash of the memo `get` returned. if another transaction merged into the
+timeline since, no row is affected and `save` returns False, the caller reads
+the timeline again with ``lock=True`` and merges again. a plain SELECT in the
+same REPEATABLE READ transaction would return the same snapshot, ``FOR UPDATE``
+reads the newest version, and only a conflicting writer waits for it.
+
+``TIMELINE_WRITER=core`` switches the rpc service, see
+``scripts/bench_timeline_writer.py`` for the difference.
+"""
+import hashlib
+from typing import Any, Dict, Tuple, Callable, Optional, Protocol, cast
+
+from sqlalchemy import Table, Insert, Select, Update
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import get_history, set_committed_value
+
+from chii.db import sa
+from chii.timeline import LatestTimeline
+from chii.db.tables import ChiiTimeline
+
+__all__ = [
+    "TimelineWriter",
+    "OrmTimelineWriter",
+    "CoreTimelineWriter",
+    "WRITERS",
+    "MERGE_ATTEMPTS",
+    "MergeConflictError",
+]
+
+# reads of a timeline to merge into, the first one without lock
+MERGE_ATTEMPTS = 3
+
+_table = cast(Table, ChiiTimeline.__table__)
+
+# columns loaded by `CoreTimelineWriter.get`, source and replies are not needed
+_LOADED = ("id", "uid", "cat", "type", "related", "memo", "img", "batch", "dateline")
+# columns written by `CoreTimelineWriter.save`, changed by merging a timeline
+_MERGED = ("memo", "img", "batch")
+
+
+class MergeConflictError(Exception):
+    """timeline is still changed by others after `MERGE_ATTEMPTS` merges"""
+
+
+class TimelineWriter(Protocol):
+    def insert(self, session: Session, tl: ChiiTimeline) -> LatestTimeline:
+        """insert a new timeline, `tl.id` is set to the new primary key"""
+        ...
+
+    def get(
+        self, session: Session, tl_id: int, lock: bool = False
+    ) -> Optional[ChiiTimeline]:
+        """timeline to merge new items into, call `save` after changing it.
+
+        read the newest version with ``SELECT ... FOR UPDATE`` if `lock`.
+        """
+        ...
+
+    def save(self, session: Session, tl: ChiiTimeline) -> bool:
+        """write changes of `tl`, False if it's changed by others since `get`"""
+        ...
+
+
+class OrmTimelineWriter:
+    def insert(self, session: Session, tl: ChiiTimeline) -> LatestTimeline:
+        session.add(tl)
+        session.flush()
+        return latest(tl)
+
+    def get(
+        self, session: Session, tl_id: int, lock: bool = False
+    ) -> Optional[ChiiTimeline]:
+        if lock:
+            return session.get(
+                ChiiTimeline,
+                tl_id,
+                with_for_update=True,  # type: ignore[arg-type]
+                populate_existing=True,
+            )
+        return session.get(ChiiTimeline, tl_id)
+
+    def save(self, session: Session, tl: ChiiTimeline) -> bool:
+        if compare_and_set(session, tl):
+            return True
+        # don't write the stale merge on flush
+        session.expire(tl)
+        return False
+
+
+class CoreTimelineWriter:
+    def insert(self, session: Session, tl: ChiiTimeline) -> LatestTimeline:
+        result = sa.execute_core(
+            session,
+            insert_query(),
+            {
+                "tml_uid": tl.uid,
+                "tml_cat": tl.cat,
+                "tml_type": tl.type,
+                "tml_related": tl.related,
+                "tml_memo": tl.memo,
+                "tml_img": tl.img,
+                "tml_batch": tl.batch,
+            },
+        )
+        tl.id = result.inserted_primary_key[0]
+        tl.dateline = result.last_inserted_params()["tml_dateline"]
+        return latest(tl)
+
+    def get(
+        self, session: Session, tl_id: int, lock: bool = False
+    ) -> Optional[ChiiTimeline]:
+        row = sa.execute_core(session, get_query(lock), {"tl_id": tl_id}).first()
+        if row is None:
+            return None
+        tl = ChiiTimeline(**dict(zip(_LOADED, row, strict=True)))
+        # loaded state, changes from here are in attribute history
+        make_transient_to_detached(tl)
+        return tl
+
+    def save(self, session: Session, tl: ChiiTimeline) -> bool:
+        return compare_and_set(session, tl)
+
+
+WRITERS: Dict[str, Callable[[], TimelineWriter]] = {
+    "orm": OrmTimelineWriter,
+    "core": CoreTimelineWriter,
+}
+
+
+def compare_and_set(session: Session, tl: ChiiTimeline) -> bool:
+    """write changed columns of `tl` if memo in database is still the loaded one,
+    changes are committed state of `tl` after"""
+    values: Dict[str, Any] = {}
+    for key in _MERGED:
+        added = get_history(tl, key).added
+        if added:
+            values[key] = added[0]
+    if not values:
+        return True
+
+    memo = get_history(tl, "memo")
+    loaded = [*memo.deleted, *memo.unchanged][0]
+    result = sa.execute_core(
+        session,
+        update_query(tuple(values)),
+        {"tl_id": tl.id, "memo_md5": memo_md5(loaded), **values},
+    )
+    if result.rowcount != 1:
+        return False
+
+    for key, value in values.items():
+        set_committed_value(tl, key, value)
+    return True
+
+
+def memo_md5(memo: str) -> str:
+    """same as ``MD5(tml_memo)`` of MySQL"""
+    return hashlib.md5(memo.encode(), usedforsecurity=False).hexdigest()
+
+
+def latest(tl: ChiiTimeline) -> LatestTimeline:
+    return LatestTimeline(
+        id=tl.id,
+        dateline=tl.dateline,
+        cat=tl.cat,
+        type=tl.type,
+        batch=tl.batch,
+        related=tl.related,
+    )
+
+
+@sa.cached_statement
+def insert_query() -> Insert:
+    return _table.insert()
+
+
+@sa.cached_statement
+def get_query(lock: bool) -> Select:
+    """timeline ``:tl_id`` to merge"""
+    query = sa.select(*(getattr(ChiiTimeline, key) for key in _LOADED)).where(
+        ChiiTimeline.id == sa.bindparam("tl_id")
+    )
+    if lock:
+        query = query.with_for_update()
+    return query
+
+
+@sa.cached_statement
+def update_query(columns: Tuple[str, ...]) -> Update:
+    """set `columns` of timeline ``:tl_id`` if md5 of its memo is ``:memo_md5``,
+    each column from a parameter of its name"""
+    return (
+        sa.update(ChiiTimeline)
+        .where(
+            ChiiTimeline.id == sa.bindparam("tl_id"),
+            sa.func.md5(ChiiTimeline.memo) == sa.bindparam("memo_md5"),
+        )
+        .values({c: sa.bindparam(c) for c in columns})
+    )
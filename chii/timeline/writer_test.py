@@ -0,0 +1,132 @@
+import time
+
+import pytest
+from sqlalchemy import Engine, text, event, create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from chii.db import sa
+from chii.db.tables import ChiiTimeline
+from chii.timeline.writer import WRITERS, memo_md5
+
+# chii_timeline with sqlite types
+DDL = """
+CREATE TABLE chii_timeline (
+  tml_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  tml_uid INTEGER NOT NULL DEFAULT 0,
+  tml_cat INTEGER NOT NULL,
+  tml_type INTEGER NOT NULL DEFAULT 0,
+  tml_related CHAR(255) NOT NULL DEFAULT '0',
+  tml_memo TEXT NOT NULL,
+  tml_img TEXT NOT NULL,
+  tml_batch INTEGER NOT NULL,
+  tml_source INTEGER NOT NULL DEFAULT 0,
+  tml_replies INTEGER NOT NULL,
+  tml_dateline INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def engine() -> Engine:
+    e = create_engine("sqlite://", poolclass=StaticPool)
+    # MD5() of MySQL
+    event.listen(
+        e,
+        "connect",
+        lambda conn, record: conn.create_function("md5", 1, memo_md5),
+    )
+    with e.begin() as conn:
+        conn.execute(text(DDL))
+    return e
+
+
+def timeline() -> ChiiTimeline:
+    return ChiiTimeline(uid=1, cat=3, type=2, related="8", memo="m", img="i", batch=0)
+
+
+@pytest.mark.parametrize("name", list(WRITERS))
+def test_writer(name: str):
+    e = engine()
+    writer = WRITERS[name]()
+
+    with Session(e) as session:
+        now = int(time.time())
+        latest = writer.insert(session, timeline())
+        assert latest.id == 1
+        assert latest.dateline >= now
+        assert (latest.cat, latest.type, latest.batch, latest.related) == (
+            3,
+            2,
+            0,
+            "8",
+        )
+
+        tl = writer.get(session, latest.id)
+        assert tl is not None
+        assert (tl.uid, tl.memo, tl.img) == (1, "m", "i")
+        tl.memo = "merged"
+        tl.batch = 1
+        assert writer.save(session, tl)
+        assert writer.get(session, 2) is None
+        session.commit()
+
+    with e.connect() as conn:
+        assert conn.execute(
+            sa.select(
+                ChiiTimeline.memo,
+                ChiiTimeline.img,
+                ChiiTimeline.batch,
+                ChiiTimeline.source,
+                ChiiTimeline.replies,
+                ChiiTimeline.dateline,
+            )
+        ).all() == [("merged", "i", 1, 5, 0, latest.dateline)]
+
+
+def test_core_writer_save_unchanged():
+    e = engine()
+    writer = WRITERS["core"]()
+    statements = []
+    event.listen(
+        e,
+        "before_cursor_execute",
+        lambda conn, cursor, stmt, *args: statements.append(stmt),
+    )
+
+    with Session(e) as session:
+        tl = writer.get(session, writer.insert(session, timeline()).id)
+        assert tl is not None
+        tl.memo = "m"
+        statements.clear()
+        assert writer.save(session, tl)
+        assert statements == []
+
+
+@pytest.mark.parametrize("name", list(WRITERS))
+def test_writer_save_conflict(name: str):
+    e = engine()
+    writer = WRITERS[name]()
+
+    with Session(e) as session:
+        tl_id = writer.insert(session, timeline()).id
+        tl = writer.get(session, tl_id)
+        assert tl is not None
+        # merged by another writer after `tl` is read
+        session.connection().execute(
+            sa.update(ChiiTimeline)
+            .values(memo="other")
+            .execution_options(synchronize_session=False)
+        )
+
+        tl.memo = "mine"
+        assert not writer.save(session, tl)
+
+        tl = writer.get(session, tl_id, lock=True)
+        assert tl is not None
+        assert tl.memo == "other"
+        tl.memo = "other, mine"
+        assert writer.save(session, tl)
+        session.commit()
+
+    with e.connect() as conn:
+        assert conn.scalar(sa.select(ChiiTimeline.memo)) == "other, mine"
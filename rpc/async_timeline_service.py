@@ -0,0 +1,181 @@
+from typing import Optional
+
+from grpc.aio import ServicerContext
+
+from api.v1 import timeline_pb2_grpc
+from chii.db import sa
+from chii.config import config
+from chii.timeline import (
+    SUBJECT_TYPE_MAP,
+    ProgressMemo,
+    SubjectImage,
+    friend_ids_query,
+    user_timeline_query,
+)
+from api.v1.timeline_pb2 import (
+    HelloRequest,
+    HelloResponse,
+    GetTimelineResponse,
+    EpisodeCollectRequest,
+    SubjectCollectRequest,
+    EpisodeCollectResponse,
+    GetUserTimelineRequest,
+    SubjectCollectResponse,
+    SubjectProgressRequest,
+    SubjectProgressResponse,
+    GetFriendsTimelineRequest,
+    EpisodeCollectBatchRequest,
+    SubjectCollectBatchRequest,
+    EpisodeCollectBatchResponse,
+    SubjectCollectBatchResponse,
+)
+from rpc.timeline_service import (
+    ProgressKey,
+    ProgressValue,
+    TimelineWriteLogic,
+    page_limit,
+    page_params,
+    batch_results,
+)
+from chii.timeline.coalesce import AsyncCoalescer
+
+
+class AsyncTimeLineService(
+    TimelineWriteLogic, timeline_pb2_grpc.TimeLineServiceServicer
+):
+    """`TimeLineService` for `grpc.aio` server, backed by an `AsyncSession`.
+
+    writing logic is shared with the sync service and executed by
+    ``AsyncSession.run_sync``, a rpc only holds a connection while its
+    transaction is running instead of a worker thread for its whole life.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.SessionMaker = sa.async_session_maker()
+        self.progress_coalescer: Optional[
+            AsyncCoalescer[ProgressKey, ProgressValue]
+        ] = None
+        if config.progress_coalesce_ms:
+            self.progress_coalescer = AsyncCoalescer(
+                config.progress_coalesce_ms / 1000, self.flush_progress, "progress"
+            )
+
+    async def Hello(
+        self, request: HelloRequest, context: ServicerContext
+    ) -> HelloResponse:
+        print(f"{config.node_id} rpc hello {request.name}")
+        return HelloResponse(message=f"{config.node_id}: hello {request.name}")
+
+    async def SubjectCollect(
+        self, request: SubjectCollectRequest, context: ServicerContext
+    ) -> SubjectCollectResponse:
+        tlType = SUBJECT_TYPE_MAP[request.subject.type][request.collection]
+        if config.debug:
+            print(request)
+        async with self.SessionMaker.begin() as session:
+            latest = await session.run_sync(self.subject_collect, request, tlType)
+
+        # only cache committed timeline
+        self.committed(request.user_id, latest)
+        return SubjectCollectResponse(ok=True)
+
+    async def EpisodeCollect(
+        self, req: EpisodeCollectRequest, context: ServicerContext
+    ) -> EpisodeCollectResponse:
+        if config.debug:
+            print(req)
+        memo, img = self.episode_memo(req)
+        await self.progress(req.user_id, req.subject.id, 2, memo, img)
+        return EpisodeCollectResponse(ok=True)
+
+    async def SubjectProgress(
+        self, req: SubjectProgressRequest, context: ServicerContext
+    ) -> SubjectProgressResponse:
+        if config.debug:
+            print(req)
+        memo, img = self.progress_memo(req)
+        await self.progress(req.user_id, req.subject.id, 0, memo, img)
+        return SubjectProgressResponse(ok=True)
+
+    async def progress(
+        self,
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ):
+        if self.progress_coalescer is None:
+            await self.write_progress(uid, subject_id, tlType, memo, img)
+        else:
+            await self.progress_coalescer.submit((uid, subject_id, tlType), (memo, img))
+
+    async def flush_progress(self, key: ProgressKey, value: ProgressValue):
+        await self.write_progress(*key, *value)
+
+    async def write_progress(
+        self,
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ):
+        async with self.SessionMaker.begin() as session:
+            latest = await session.run_sync(
+                self.progress_timeline, uid, subject_id, tlType, memo, img
+            )
+
+        self.committed(uid, latest)
+
+    async def SubjectCollectBatch(
+        self, req: SubjectCollectBatchRequest, context: ServicerContext
+    ) -> SubjectCollectBatchResponse:
+        async with self.SessionMaker.begin() as session:
+            errors = await session.run_sync(self.subject_collect_batch, req.items)
+
+        self.forget_latest(req.items)
+        return SubjectCollectBatchResponse(results=batch_results(errors))
+
+    async def EpisodeCollectBatch(
+        self, req: EpisodeCollectBatchRequest, context: ServicerContext
+    ) -> EpisodeCollectBatchResponse:
+        async with self.SessionMaker.begin() as session:
+            errors = await session.run_sync(self.episode_collect_batch, req.items)
+
+        self.forget_latest(req.items)
+        return EpisodeCollectBatchResponse(results=batch_results(errors))
+
+    async def GetUserTimeline(
+        self, req: GetUserTimelineRequest, context: ServicerContext
+    ) -> GetTimelineResponse:
+        limit = page_limit(req.limit)
+        # read from primary if this user just wrote, replica may lag behind
+        replica = req.user_id not in self.recent_writes
+        async with self.SessionMaker(replica=replica) as session:
+            tls = (
+                await session.scalars(
+                    user_timeline_query(bool(req.cat), bool(req.until_id)),
+                    page_params(req.user_id, req.cat, req.until_id, limit),
+                )
+            ).all()
+
+        return self.timeline_page(tls, limit)
+
+    async def GetFriendsTimeline(
+        self, req: GetFriendsTimelineRequest, context: ServicerContext
+    ) -> GetTimelineResponse:
+        limit = page_limit(req.limit)
+        async with self.SessionMaker(replica=True) as session:
+            friends = (
+                await session.scalars(friend_ids_query(), {"uid": req.user_id})
+            ).all()
+            if not friends:
+                return GetTimelineResponse()
+
+            tls = await session.run_sync(
+                self.friends_timeline, friends, req.cat, req.until_id, limit
+            )
+
+        return self.timeline_page(tls, limit)
@@ -0,0 +1,79 @@
+import json
+import asyncio
+
+from sqlalchemy import text, event
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from chii.db import sa
+from chii.timeline import TimelineCat
+from api.v1.timeline_pb2 import (
+    Episode,
+    Subject,
+    EpisodeCollectRequest,
+    SubjectCollectRequest,
+    GetUserTimelineRequest,
+)
+from chii.timeline.writer import memo_md5
+from chii.timeline.writer_test import DDL
+from rpc.async_timeline_service import AsyncTimeLineService
+
+
+async def engine() -> AsyncEngine:
+    e = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    # MD5() of MySQL
+    event.listen(
+        e.sync_engine,
+        "connect",
+        lambda conn, record: conn.create_function("md5", 1, memo_md5),
+    )
+    async with e.begin() as conn:
+        await conn.execute(text(DDL))
+    return e
+
+
+def service(e: AsyncEngine) -> AsyncTimeLineService:
+    s = AsyncTimeLineService()
+    s.SessionMaker = async_sessionmaker(e, sync_session_class=sa.RoutingSession)
+    return s
+
+
+def subject_collect(uid: int, subject_id: int) -> SubjectCollectRequest:
+    return SubjectCollectRequest(
+        user_id=uid, subject=Subject(id=subject_id, type=2, name="s"), collection=2
+    )
+
+
+def episode_collect(uid: int, subject_id: int, sort: int) -> EpisodeCollectRequest:
+    return EpisodeCollectRequest(
+        user_id=uid,
+        subject=Subject(id=subject_id, type=2, name="s"),
+        last=Episode(id=sort, sort=sort),
+    )
+
+
+def test_async_service():
+    async def run():
+        e = await engine()
+        s = service(e)
+
+        await s.SubjectCollect(subject_collect(1, 8), None)
+        # merged into previous timeline
+        await s.SubjectCollect(subject_collect(1, 9), None)
+        await s.EpisodeCollect(episode_collect(1, 8, 1), None)
+        await s.EpisodeCollect(episode_collect(1, 8, 2), None)
+        await s.SubjectCollect(subject_collect(2, 8), None)
+
+        page = await s.GetUserTimeline(GetUserTimelineRequest(user_id=1), None)
+        await e.dispose()
+        return page
+
+    page = asyncio.run(run())
+
+    assert [(tl.cat, tl.batch) for tl in page.items] == [
+        (TimelineCat.Progress, False),
+        (TimelineCat.Subject, True),
+    ]
+    progress, subject = page.items
+    assert json.loads(progress.memo)["ep_id"] == 2
+    assert set(json.loads(subject.memo)) == {"8", "9"}
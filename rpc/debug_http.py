@@ -0,0 +1,70 @@
+"""
+local http endpoint of in-process stats, started when `DEBUG_HTTP_PORT` is set.
+
+    GET /debug/sql    latency histogram of each sql fingerprint, slowest total
+                      first. ``?reset=1`` clears them after reading.
+    GET /debug/pool   connection pool stats of each engine.
+    GET /debug/locks  time waited for striped user locks of write rpc.
+    GET /debug/cache  hits, misses and evictions of in-process caches, to size
+                      `LATEST_TIMELINE_CACHE_SIZE` and `TIMELINE_DECODE_CACHE_MB`.
+    GET /debug/coalesce
+                      progress writes collapsed by `PROGRESS_COALESCE_MS`.
+    GET /debug/group_commit
+                      group sizes and seconds of waiting and running groups of
+                      `GROUP_COMMIT_MS`.
+
+listens on `DEBUG_HTTP_HOST` (127.0.0.1 by default), it has no authentication.
+"""
+import json
+import threading
+from typing import Any
+from dataclasses import asdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+from chii.db import sa
+from chii.timeline.cache import cache_stats
+from chii.timeline.locks import lock_stats
+from chii.timeline.coalesce import coalesce_stats
+from chii.timeline.group_commit import group_stats
+
+
+class DebugHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        body: Any
+        if url.path == "/debug/sql":
+            body = [asdict(s) for s in sa.sql_stats.stats()]
+            if parse_qs(url.query).get("reset") == ["1"]:
+                sa.sql_stats.reset()
+        elif url.path == "/debug/pool":
+            body = {name: asdict(s) for name, s in sa.pool_stats().items()}
+        elif url.path == "/debug/locks":
+            body = {name: asdict(s) for name, s in lock_stats().items()}
+        elif url.path == "/debug/cache":
+            body = {name: asdict(s) for name, s in cache_stats().items()}
+        elif url.path == "/debug/coalesce":
+            body = {name: asdict(s) for name, s in coalesce_stats().items()}
+        elif url.path == "/debug/group_commit":
+            body = {name: asdict(s) for name, s in group_stats().items()}
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body, indent=2).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+
+def start_debug_server(host: str, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), DebugHandler)
+    threading.Thread(
+        target=server.serve_forever, name="debug-http", daemon=True
+    ).start()
+    return server
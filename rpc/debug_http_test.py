@@ -0,0 +1,58 @@
+import json
+import http.client
+from typing import Any
+
+import pytest
+
+from rpc.debug_http import start_debug_server
+from chii.timeline.cache import LatestTimelineCache
+from chii.timeline.coalesce import Coalescer
+from chii.timeline.group_commit import GroupCommitter
+
+
+def get(path: str) -> Any:
+    server = start_debug_server("127.0.0.1", 0)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        conn.request("GET", path)
+        res = conn.getresponse()
+        assert res.status == 200
+        return json.loads(res.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_debug_coalesce():
+    c: Coalescer[str, int] = Coalescer(0, lambda k, v: None, "test")
+    c.submit("a", 1)
+
+    assert get("/debug/coalesce")["test"] == {
+        "pending": 0,
+        "submitted": 1,
+        "flushed": 1,
+        "collapsed": 0,
+    }
+
+
+def test_debug_cache():
+    cache = LatestTimelineCache(10, name="test")
+    cache.get(1)
+
+    assert get("/debug/cache")["test"] == {
+        "size": 0,
+        "hits": 0,
+        "misses": 1,
+        "evictions": 0,
+        "expirations": 0,
+        "bytes": 0,
+    }
+
+
+def test_debug_group_commit():
+    g: GroupCommitter[int, int] = GroupCommitter(0, 1, list, pytest.fail, "test")
+    g.submit(1)
+
+    stats = get("/debug/group_commit")["test"]
+    assert (stats["submitted"], stats["groups"], stats["max_group_size"]) == (1, 1, 1)
+    assert stats["run_seconds"] == stats["max_run_seconds"]
@@ -1,11 +1,24 @@
 import html
+import json
 import time
-from typing import Dict, Optional
+import functools
+import contextlib
+import dataclasses
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Callable,
+    Iterable,
+    Optional,
+    Sequence,
+    ContextManager,
+)
 
-import phpserialize as php
 from grpc import RpcContext
 from loguru import logger
-from pydantic import parse_obj_as
 from sqlalchemy.orm import Session
 
 from api.v1 import timeline_pb2_grpc
@@ -14,89 +27,172 @@ from chii.compat import phpseralize
 from chii.config import config
 from chii.timeline import (
     SUBJECT_TYPE_MAP,
+    TIMELINE_PAGE_SIZE,
+    TIMELINE_PAGE_MAX_SIZE,
     SubjectMemo,
     TimelineCat,
     ProgressMemo,
     SubjectImage,
+    LatestTimeline,
+    dumps_batch,
+    parseTimeLine,
+    set_batch_item,
+    friend_ids_query,
+    update_memo_query,
+    dumps_subject_memo,
+    dumps_progress_memo,
+    dumps_subject_image,
+    user_timeline_query,
+    latest_timeline_query,
+    friends_timeline_query,
 )
 from chii.db.tables import ChiiTimeline
+from chii.timeline.feed import friends_feed
 from api.v1.timeline_pb2 import (
+    Timeline,
+    BatchResult,
     HelloRequest,
     HelloResponse,
+    GetTimelineResponse,
     EpisodeCollectRequest,
     SubjectCollectRequest,
     EpisodeCollectResponse,
+    GetUserTimelineRequest,
     SubjectCollectResponse,
     SubjectProgressRequest,
     SubjectProgressResponse,
+    GetFriendsTimelineRequest,
+    EpisodeCollectBatchRequest,
+    SubjectCollectBatchRequest,
+    EpisodeCollectBatchResponse,
+    SubjectCollectBatchResponse,
+)
+from chii.timeline.cache import RecentWrites, LatestTimelineCache, DecodedTimelineCache
+from chii.timeline.locks import StripedLock
+from chii.timeline.writer import (
+    WRITERS,
+    MERGE_ATTEMPTS,
+    TimelineWriter,
+    MergeConflictError,
 )
+from chii.timeline.coalesce import Coalescer
+from chii.timeline.group_commit import GroupCommitter
 
 
-class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
-    def __init__(self):
-        self.SessionMaker = sa.sync_session_maker()
+class TimelineWriteLogic:
+    """rpc independent part of timeline service, methods write with a sync `Session`.
 
-    def Hello(self, request: HelloRequest, context) -> HelloResponse:
-        print(f"{config.node_id} rpc hello {request.name}")
-        return HelloResponse(message=f"{config.node_id}: hello {request.name}")
+    shared by `TimeLineService` and the asyncio server `AsyncTimeLineService`,
+    which call them with ``AsyncSession.run_sync``.
+    """
 
-    def SubjectCollect(
-        self, request: SubjectCollectRequest, context: RpcContext
-    ) -> SubjectCollectResponse:
-        tlType = SUBJECT_TYPE_MAP[request.subject.type][request.collection]
-        if config.debug:
-            print(request)
-        with self.SessionMaker.begin() as session:
-            tl: Optional[ChiiTimeline] = session.scalar(
-                sa.get(
-                    ChiiTimeline,
-                    ChiiTimeline.uid == request.user_id,
-                    order=ChiiTimeline.id.desc(),
+    def __init__(self):
+        self.latest_cache = LatestTimelineCache(
+            config.latest_timeline_cache_size, name="latest_timeline"
+        )
+        self.decoded_cache = DecodedTimelineCache(
+            config.timeline_decode_cache_mb * 1024 * 1024,
+            timeline_json,
+            name="decoded_timeline",
+        )
+        self.recent_writes = RecentWrites(
+            config.replica_lag_seconds if config.MYSQL_REPLICA_HOST else 0
+        )
+        self.writer: TimelineWriter = WRITERS[config.timeline_writer]()
+
+    def subject_collect(
+        self, session: Session, request: SubjectCollectRequest, tlType: int
+    ) -> LatestTimeline:
+        latest = self.latest_timeline(session, request.user_id)
+
+        if latest and latest.in_merge_window():
+            logger.info("find previous timeline, merging")
+            if latest.cat == TimelineCat.Subject and latest.type == tlType:
+                # only fetch memo and img when merging
+                tl = self.merge_timeline(
+                    session,
+                    self.writer.get(session, latest.id),
+                    functools.partial(self.merge_previous_timeline, req=request),
                 )
-            )
+                if tl is not None:
+                    return latest._replace(batch=tl.batch)
 
-            if tl and tl.dateline >= int(time.time() - 15 * 60):
-                logger.info("find previous timeline, merging")
-                if tl.cat == TimelineCat.Subject and tl.type == tlType:
-                    self.merge_previous_timeline(session, tl, request)
-                    return SubjectCollectResponse(ok=True)
+        logger.info(
+            "missing previous timeline or timeline type mismatch, create a new timeline"
+        )
+        return self.create_subject_collection_timeline(session, request, tlType)
 
-            logger.info(
-                "missing previous timeline or timeline type mismatch, create a new timeline"
-            )
-            self.create_subject_collection_timeline(session, request, tlType)
+    def merge_timeline(
+        self,
+        session: Session,
+        tl: Optional[ChiiTimeline],
+        merge: Callable[[ChiiTimeline], None],
+    ) -> Optional[ChiiTimeline]:
+        """change `tl` loaded by ``self.writer.get`` with `merge` and save it.
 
-        return SubjectCollectResponse(ok=True)
+        if another writer merged into it since it was read, read it again with
+        lock and merge again, at most `MERGE_ATTEMPTS` times.
 
-    def merge_previous_timeline(
-        self, session: Session, tl: ChiiTimeline, req: SubjectCollectRequest
+        return the saved timeline, None if it doesn't exist.
+        """
+        if tl is None:
+            return None
+        for _ in range(MERGE_ATTEMPTS):
+            merge(tl)
+            if self.writer.save(session, tl):
+                self.decoded_cache.discard(tl.id)
+                return tl
+            logger.info("timeline {} changed by another writer, merging again", tl.id)
+            tl = self.writer.get(session, tl.id, lock=True)
+            if tl is None:
+                return None
+
+        raise MergeConflictError(f"timeline {tl.id} changed {MERGE_ATTEMPTS} times")
+
+    def latest_timeline(self, session: Session, uid: int) -> Optional[LatestTimeline]:
+        latest: Optional[LatestTimeline] = self.latest_cache.get(uid)
+        if latest is not None:
+            return latest
+
+        row = sa.execute_core(session, latest_timeline_query(), {"uid": uid}).first()
+        if row is None:
+            return None
+        return LatestTimeline(*row)
+
+    def committed(self, uid: int, latest: LatestTimeline):
+        """after the transaction writing `latest` of `uid` is committed"""
+        self.latest_cache.put(uid, latest)
+        self.recent_writes.add(uid)
+
+    def forget_latest(
+        self, reqs: Iterable[Union[SubjectCollectRequest, EpisodeCollectRequest]]
     ):
+        """id of timelines inserted by `insert_many` are unknown,
+        users' newest timeline will be probed again on next write."""
+        for req in reqs:
+            self.latest_cache.discard(req.user_id)
+            self.recent_writes.add(req.user_id)
+
+    def update_memo(self, session: Session, tl_id: int, memo: str) -> int:
+        """set memo of timeline `tl_id`, return number of matched rows,
+        0 if it's deleted."""
+        result = sa.execute_core(
+            session, update_memo_query(), {"tl_id": tl_id, "memo": memo}
+        )
+        self.decoded_cache.discard(tl_id)
+        return result.rowcount
+
+    def insert(self, session: Session, tl: ChiiTimeline) -> LatestTimeline:
+        return self.writer.insert(session, tl)
+
+    @staticmethod
+    def merge_previous_timeline(tl: ChiiTimeline, req: SubjectCollectRequest):
+        """merge collection into subject timeline `tl` in place.
+
+        raise ValueError if memo or img of `tl` is malformed, `tl` is left as is.
+        """
         escaped = html.escape(req.comment)
-        if tl.batch:
-            memo = parse_obj_as(
-                Dict[int, SubjectMemo], phpseralize.loads(tl.memo.encode())
-            )
-        else:
-            m = parse_obj_as(SubjectMemo, phpseralize.loads(tl.memo.encode()))
-            if int(m.subject_id) == req.subject.id:
-                # save request called twice, just ignore
-                should_update = False
-                if m.collect_comment != escaped:
-                    should_update = True
-                    m.collect_comment = escaped
-
-                if m.collect_rate != req.rate:
-                    should_update = True
-                    m.collect_rate = req.rate
-
-                if should_update:
-                    tl.memo = php.serialize(m.dict())
-                    session.add(tl)
-                return
-
-            memo = {int(m.subject_id): m}
-
-        memo[req.subject.id] = SubjectMemo(
+        new_memo = SubjectMemo(
             subject_id=str(req.subject.id),
             subject_type_id=str(req.subject.type),
             subject_name_cn=req.subject.name_cn,
@@ -105,28 +201,52 @@ class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
             collect_comment=escaped,
             collect_rate=req.rate,
         )
+        new_img = SubjectImage(subject_id=str(req.subject.id), images=req.subject.image)
 
         if tl.batch:
-            img = parse_obj_as(
-                Dict[int, SubjectImage], phpseralize.loads(tl.img.encode())
+            # only the item of this subject changes, others are copied as is
+            memo = set_batch_item(
+                tl.memo.encode(), req.subject.id, dumps_subject_memo(new_memo)
             )
-        else:
-            i = parse_obj_as(SubjectImage, phpseralize.loads(tl.img.encode()))
-            img = {int(i.subject_id): i}
+            tl.img = set_batch_item(
+                tl.img.encode(), req.subject.id, dumps_subject_image(new_img)
+            )
+            tl.memo = memo
+            return
 
-        img[req.subject.id] = SubjectImage(
-            subject_id=str(req.subject.id), images=req.subject.image
-        )
+        m = SubjectMemo.from_php(phpseralize.loads(tl.memo.encode()))
+        if int(m.subject_id) == req.subject.id:
+            # save request called twice, just ignore
+            should_update = False
+            if m.collect_comment != escaped:
+                should_update = True
+                m.collect_comment = escaped
 
-        tl.batch = 1
-        tl.memo = php.serialize({key: value.dict() for key, value in memo.items()})
-        tl.img = php.serialize({key: value.dict() for key, value in img.items()})
+            if m.collect_rate != req.rate:
+                should_update = True
+                m.collect_rate = req.rate
 
-        session.add(tl)
+            if should_update:
+                tl.memo = dumps_subject_memo(m)
+            return
+
+        i = SubjectImage.from_php(phpseralize.loads(tl.img.encode()))
+
+        tl.batch = 1
+        tl.memo = dumps_batch(
+            {int(m.subject_id): m, req.subject.id: new_memo}, dumps_subject_memo
+        )
+        tl.img = dumps_batch(
+            {int(i.subject_id): i, req.subject.id: new_img}, dumps_subject_image
+        )
 
     def create_subject_collection_timeline(
         self, session: Session, req: SubjectCollectRequest, type: int
-    ):
+    ) -> LatestTimeline:
+        return self.insert(session, self.new_subject_timeline(req, type))
+
+    @staticmethod
+    def new_subject_timeline(req: SubjectCollectRequest, type: int) -> ChiiTimeline:
         memo = SubjectMemo(
             subject_id=str(req.subject.id),
             subject_type_id=str(req.subject.type),
@@ -139,21 +259,18 @@ class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
 
         img = SubjectImage(subject_id=str(req.subject.id), images=req.subject.image)
 
-        session.add(
-            ChiiTimeline(
-                cat=TimelineCat.Subject,
-                type=type,
-                uid=req.user_id,
-                memo=php.serialize(memo.dict()),
-                img=php.serialize(img.dict()),
-                batch=0,
-                related=str(req.subject.id),
-            )
+        return ChiiTimeline(
+            cat=TimelineCat.Subject,
+            type=type,
+            uid=req.user_id,
+            memo=dumps_subject_memo(memo),
+            img=dumps_subject_image(img),
+            batch=0,
+            related=str(req.subject.id),
         )
 
-    def EpisodeCollect(
-        self, req: EpisodeCollectRequest, context
-    ) -> EpisodeCollectResponse:
+    @staticmethod
+    def episode_memo(req: EpisodeCollectRequest) -> Tuple[ProgressMemo, SubjectImage]:
         """
 
         cat 4 type 2 "看过 ep2 ${subject name}"
@@ -204,8 +321,6 @@ class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
         }
 
         """
-
-        tlType = 2
         memo = ProgressMemo(
             ep_id=req.last.id,
             subject_name=req.subject.name,
@@ -220,47 +335,12 @@ class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
             images=req.subject.image,
         )
 
-        if config.debug:
-            print(req)
+        return memo, img
 
-        with self.SessionMaker.begin() as session:
-            tl: Optional[ChiiTimeline] = session.scalar(
-                sa.get(
-                    ChiiTimeline,
-                    ChiiTimeline.uid == req.user_id,
-                    order=ChiiTimeline.id.desc(),
-                )
-            )
-            if tl and tl.dateline >= int(time.time() - 15 * 60):
-                logger.info("find previous timeline, updating")
-                if (
-                    tl.cat == TimelineCat.Progress
-                    and tl.type == tlType
-                    and tl.batch == 0
-                    and tl.related == str(req.subject.id)
-                ):
-                    tl.memo = php.serialize(memo.dict())
-                    session.add(tl)
-                    return EpisodeCollectResponse(ok=True)
-
-            session.add(
-                ChiiTimeline(
-                    uid=req.user_id,
-                    memo=php.serialize(memo.dict()),
-                    img=php.serialize(img.dict()),
-                    cat=TimelineCat.Progress,
-                    type=tlType,
-                    source=5,
-                    batch=0,
-                    related=str(req.subject.id),
-                )
-            )
-
-        return EpisodeCollectResponse(ok=True)
-
-    def SubjectProgress(
-        self, req: SubjectProgressRequest, context
-    ) -> SubjectProgressResponse:
+    @staticmethod
+    def progress_memo(
+        req: SubjectProgressRequest,
+    ) -> Tuple[ProgressMemo, SubjectImage]:
         memo = ProgressMemo(
             subject_name=req.subject.name,
             subject_id=str(req.subject.id),
@@ -271,46 +351,529 @@ class TimeLineService(timeline_pb2_grpc.TimeLineServiceServicer):
             vols_update=req.vols_update,
         )
 
-        tlType = 0
-
         img = SubjectImage(
             subject_id=str(req.subject.id),
             images=req.subject.image,
         )
 
-        if config.debug:
-            print(req)
+        return memo, img
+
+    def progress_timeline(
+        self,
+        session: Session,
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ) -> LatestTimeline:
+        latest = self.latest_timeline(session, uid)
+        if latest and latest.in_merge_window():
+            logger.info("find previous timeline, updating")
+            if self.progress_mergeable(latest, tlType, subject_id):
+                if self.update_memo(session, latest.id, dumps_progress_memo(memo)):
+                    return latest
+                # cached timeline is deleted by others, write a new one
+                logger.info("previous timeline {} is deleted", latest.id)
+                self.latest_cache.discard(uid)
+
+        return self.insert(
+            session, self.new_progress_timeline(uid, subject_id, tlType, memo, img)
+        )
+
+    @staticmethod
+    def progress_mergeable(
+        tl: Union[LatestTimeline, ChiiTimeline], tlType: int, subject_id: int
+    ) -> bool:
+        return (
+            tl.cat == TimelineCat.Progress
+            and tl.type == tlType
+            and tl.batch == 0
+            and tl.related == str(subject_id)
+        )
+
+    @staticmethod
+    def new_progress_timeline(
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ) -> ChiiTimeline:
+        return ChiiTimeline(
+            uid=uid,
+            memo=dumps_progress_memo(memo),
+            img=dumps_subject_image(img),
+            cat=TimelineCat.Progress,
+            type=tlType,
+            batch=0,
+            related=str(subject_id),
+        )
+
+    def subject_collect_batch(
+        self, session: Session, reqs: Sequence[SubjectCollectRequest]
+    ) -> List[str]:
+        """write collections of many users, with the same result as calling
+        `subject_collect` for each item in order.
+
+        each user's newest timeline is probed once, items are merged in memory
+        and new timelines are written by a single multi-row INSERT.
 
-        with self.SessionMaker.begin() as session:
-            tl: Optional[ChiiTimeline] = session.scalar(
-                sa.get(
-                    ChiiTimeline,
-                    ChiiTimeline.uid == req.user_id,
-                    order=ChiiTimeline.id.desc(),
+        return error message of each item, empty string means ok.
+        """
+        errors = [""] * len(reqs)
+        types: Dict[int, int] = {}
+        for i, req in enumerate(reqs):
+            try:
+                types[i] = SUBJECT_TYPE_MAP[req.subject.type][req.collection]
+            except (KeyError, IndexError):
+                errors[i] = (
+                    f"unknown subject type {req.subject.type}"
+                    f" or collection {req.collection}"
                 )
-            )
-            if tl and tl.dateline >= int(time.time() - 15 * 60):
-                logger.info("find previous timeline, updating")
+
+        pending: List[ChiiTimeline] = []
+        # loaded timelines, items merged into them, and where new timelines of
+        # the user start in `pending`
+        merged: List[Tuple[ChiiTimeline, List[int], int]] = []
+        for uid, items in group_by_user(reqs, types).items():
+            latest = self.latest_timeline(session, uid)
+            if latest is not None and not latest.in_merge_window():
+                latest = None
+
+            current: Optional[ChiiTimeline] = None
+            for i in items:
+                req, tlType = reqs[i], types[i]
+                if (
+                    current is None
+                    and latest is not None
+                    and latest.cat == TimelineCat.Subject
+                    and latest.type == tlType
+                ):
+                    current = self.writer.get(session, latest.id)
+                    if current is not None:
+                        merged.append((current, [], len(pending)))
+
                 if (
-                    tl.cat == TimelineCat.Progress
-                    and tl.type == tlType
-                    and tl.batch == 0
-                    and tl.related == str(req.subject.id)
+                    current is not None
+                    and current.cat == TimelineCat.Subject
+                    and current.type == tlType
+                ):
+                    if merged and merged[-1][0] is current:
+                        # merged into loaded timeline when it's saved
+                        merged[-1][1].append(i)
+                    else:
+                        self.merge_items(current, reqs, [i], errors)
+                    continue
+
+                current = self.new_subject_timeline(req, tlType)
+                pending.append(current)
+                latest = None
+
+        deleted: List[Tuple[int, ChiiTimeline]] = []
+        for tl, merged_items, position in merged:
+            merge = functools.partial(
+                self.merge_items, reqs=reqs, items=merged_items, errors=errors
+            )
+            if self.merge_timeline(session, tl, merge) is None and merged_items:
+                # deleted since it's loaded, create a new timeline of these items
+                # as `subject_collect` does
+                first, *rest = merged_items
+                new = self.new_subject_timeline(reqs[first], types[first])
+                errors[first] = ""
+                self.merge_items(new, reqs, rest, errors)
+                deleted.append((position, new))
+        # from the last one, inserting doesn't move positions of former ones
+        for position, tl in reversed(deleted):
+            pending.insert(position, tl)
+        self.insert_many(session, pending)
+        return errors
+
+    def merge_items(
+        self,
+        tl: ChiiTimeline,
+        reqs: Sequence[SubjectCollectRequest],
+        items: List[int],
+        errors: List[str],
+    ):
+        for i in items:
+            try:
+                self.merge_previous_timeline(tl, reqs[i])
+            except ValueError as e:
+                errors[i] = f"failed to merge previous timeline: {e}"
+            else:
+                errors[i] = ""
+
+    def episode_collect_batch(
+        self, session: Session, reqs: Sequence[EpisodeCollectRequest]
+    ) -> List[str]:
+        """batch version of `episode_collect`, see `subject_collect_batch`."""
+        tlType = 2
+        pending: List[ChiiTimeline] = []
+        for uid, items in group_by_user(reqs, range(len(reqs))).items():
+            latest = self.latest_timeline(session, uid)
+            if latest is not None and not latest.in_merge_window():
+                latest = None
+
+            # only the last item merged into previous timeline is written
+            updated: Optional[int] = None
+            # new timelines of this user start here
+            first = len(pending)
+            current: Optional[ChiiTimeline] = None
+            for i in items:
+                req = reqs[i]
+                memo, img = self.episode_memo(req)
+                if current is not None:
+                    if self.progress_mergeable(current, tlType, req.subject.id):
+                        current.memo = dumps_progress_memo(memo)
+                        continue
+                elif latest is not None and self.progress_mergeable(
+                    latest, tlType, req.subject.id
                 ):
-                    tl.memo = php.serialize(memo.dict())
-                    session.add(tl)
-                    return SubjectProgressResponse(ok=True)
-
-            session.add(
-                ChiiTimeline(
-                    uid=req.user_id,
-                    memo=php.serialize(memo.dict()),
-                    img=php.serialize(img.dict()),
-                    cat=TimelineCat.Progress,
-                    type=tlType,
-                    batch=0,
-                    related=str(req.subject.id),
+                    updated = i
+                    continue
+
+                current = self.new_progress_timeline(
+                    uid, req.subject.id, tlType, memo, img
                 )
+                pending.append(current)
+
+            if latest is not None and updated is not None:
+                req = reqs[updated]
+                memo, img = self.episode_memo(req)
+                if not self.update_memo(session, latest.id, dumps_progress_memo(memo)):
+                    # previous timeline is deleted, the new one goes before
+                    # timelines created by later items
+                    logger.info("previous timeline {} is deleted", latest.id)
+                    pending.insert(
+                        first,
+                        self.new_progress_timeline(
+                            uid, req.subject.id, tlType, memo, img
+                        ),
+                    )
+
+        self.insert_many(session, pending)
+        return [""] * len(reqs)
+
+    @staticmethod
+    def friends_timeline(
+        session: Session, friends: Sequence[int], cat: int, until_id: int, limit: int
+    ) -> Sequence[ChiiTimeline]:
+        """newest first timelines of `friends` with ``tml_id < until_id``"""
+        if config.friends_timeline_merge:
+            return friends_feed(session, friends, cat, until_id, limit)
+        return session.scalars(
+            friends_timeline_query(bool(cat), bool(until_id)),
+            {"uids": friends, "cat": cat, "until_id": until_id, "limit": limit},
+        ).all()
+
+    def timeline_page(
+        self, tls: Sequence[ChiiTimeline], limit: int
+    ) -> GetTimelineResponse:
+        return GetTimelineResponse(
+            items=[self.timeline_pb(tl) for tl in tls],
+            next_until_id=tls[-1].id if len(tls) == limit else 0,
+        )
+
+    def timeline_pb(self, tl: ChiiTimeline) -> Timeline:
+        memo = img = ""
+        try:
+            memo, img = self.decoded_cache.decode(tl)
+        except ValueError as e:
+            # a broken row should not break the whole page
+            logger.warning("failed to decode timeline: {}", e)
+
+        return Timeline(
+            id=tl.id,
+            user_id=tl.uid,
+            cat=tl.cat,
+            type=tl.type,
+            batch=bool(tl.batch),
+            related=tl.related,
+            memo=memo,
+            img=img,
+            source=tl.source,
+            replies=tl.replies,
+            dateline=tl.dateline,
+        )
+
+    @staticmethod
+    def insert_many(session: Session, tls: List[ChiiTimeline]):
+        """insert timelines with one multi-row INSERT statement.
+
+        primary keys are not fetched, `tls` are not added to session.
+        """
+        if not tls:
+            return
+
+        dateline = int(time.time())
+        session.execute(
+            sa.insert(ChiiTimeline).values(
+                [
+                    {
+                        "uid": tl.uid,
+                        "cat": tl.cat,
+                        "type": tl.type,
+                        "related": tl.related,
+                        "memo": tl.memo,
+                        "img": tl.img,
+                        "batch": tl.batch,
+                        "source": 5,
+                        "replies": 0,
+                        "dateline": dateline,
+                    }
+                    for tl in tls
+                ]
+            )
+        )
+
+
+# (uid, subject_id, timeline type) of progress writes to coalesce
+ProgressKey = Tuple[int, int, int]
+ProgressValue = Tuple[ProgressMemo, SubjectImage]
+# arguments of `TimelineWriteLogic.progress_timeline`
+ProgressItem = Tuple[int, int, int, ProgressMemo, SubjectImage]
+
+
+def timeline_json(tl: ChiiTimeline) -> Tuple[str, str]:
+    """memo and img of `Timeline` message, JSON of decoded memo and img"""
+    t = parseTimeLine(tl)
+    memo = json.dumps(t.memo, ensure_ascii=False, default=json_default)
+    if t.img is None:
+        return memo, ""
+    return memo, json.dumps(t.img, ensure_ascii=False, default=json_default)
+
+
+def json_default(o: Any) -> Any:
+    """memo models are dataclasses"""
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def group_by_user(
+    reqs: Sequence[Union[SubjectCollectRequest, EpisodeCollectRequest]],
+    indexes: Iterable[int],
+) -> Dict[int, List[int]]:
+    """group index of requests by `user_id`, keep items order of each user."""
+    users: Dict[int, List[int]] = {}
+    for i in indexes:
+        users.setdefault(reqs[i].user_id, []).append(i)
+    return users
+
+
+class TimeLineService(TimelineWriteLogic, timeline_pb2_grpc.TimeLineServiceServicer):
+    def __init__(self):
+        super().__init__()
+        self.SessionMaker = sa.sync_session_maker()
+        self.progress_coalescer: Optional[Coalescer[ProgressKey, ProgressValue]] = None
+        if config.progress_coalesce_ms:
+            self.progress_coalescer = Coalescer(
+                config.progress_coalesce_ms / 1000, self.flush_progress, "progress"
+            )
+        self.user_locks: Optional[StripedLock] = None
+        if config.user_lock_stripes:
+            self.user_locks = StripedLock("user", config.user_lock_stripes)
+        self.subject_group: Optional[GroupCommitter[SubjectCollectRequest, str]] = None
+        self.progress_group: Optional[GroupCommitter[ProgressItem, None]] = None
+        if config.group_commit_ms:
+            window = config.group_commit_ms / 1000
+            self.subject_group = GroupCommitter(
+                window,
+                config.group_commit_max_items,
+                self.write_subject_collect_group,
+                self.write_subject_collect,
+                "subject_collect",
+            )
+            self.progress_group = GroupCommitter(
+                window,
+                config.group_commit_max_items,
+                self.write_progress_group,
+                self.write_progress_item,
+                "progress",
             )
 
+    def hold_users(self, *uids: int) -> ContextManager[None]:
+        """run writes of these users one by one in this process"""
+        if self.user_locks is None:
+            return contextlib.nullcontext()
+        return self.user_locks.hold(*uids)
+
+    def Hello(self, request: HelloRequest, context) -> HelloResponse:
+        print(f"{config.node_id} rpc hello {request.name}")
+        return HelloResponse(message=f"{config.node_id}: hello {request.name}")
+
+    def SubjectCollect(
+        self, request: SubjectCollectRequest, context: RpcContext
+    ) -> SubjectCollectResponse:
+        # raise for unknown type before the request joins a group
+        SUBJECT_TYPE_MAP[request.subject.type][request.collection]
+        if config.debug:
+            print(request)
+        if self.subject_group is None:
+            self.write_subject_collect(request)
+        else:
+            error = self.subject_group.submit(request)
+            if error:
+                raise ValueError(error)
+        return SubjectCollectResponse(ok=True)
+
+    def write_subject_collect(self, request: SubjectCollectRequest) -> str:
+        """write `request` in its own transaction"""
+        tlType = SUBJECT_TYPE_MAP[request.subject.type][request.collection]
+        with self.hold_users(request.user_id):
+            with self.SessionMaker.begin() as session:
+                latest = self.subject_collect(session, request, tlType)
+
+            # only cache committed timeline
+            self.committed(request.user_id, latest)
+        return ""
+
+    def write_subject_collect_group(
+        self, reqs: List[SubjectCollectRequest]
+    ) -> List[str]:
+        """write requests of concurrent `SubjectCollect` in one transaction,
+        new timelines are inserted by one multi-row INSERT."""
+        with self.hold_users(*(req.user_id for req in reqs)):
+            with self.SessionMaker.begin() as session:
+                errors = self.subject_collect_batch(session, reqs)
+
+            self.forget_latest(reqs)
+        return errors
+
+    def EpisodeCollect(
+        self, req: EpisodeCollectRequest, context
+    ) -> EpisodeCollectResponse:
+        if config.debug:
+            print(req)
+        memo, img = self.episode_memo(req)
+        self.progress(req.user_id, req.subject.id, 2, memo, img)
+        return EpisodeCollectResponse(ok=True)
+
+    def SubjectCollectBatch(
+        self, req: SubjectCollectBatchRequest, context
+    ) -> SubjectCollectBatchResponse:
+        with self.hold_users(*(item.user_id for item in req.items)):
+            with self.SessionMaker.begin() as session:
+                errors = self.subject_collect_batch(session, req.items)
+
+            self.forget_latest(req.items)
+        return SubjectCollectBatchResponse(results=batch_results(errors))
+
+    def EpisodeCollectBatch(
+        self, req: EpisodeCollectBatchRequest, context
+    ) -> EpisodeCollectBatchResponse:
+        with self.hold_users(*(item.user_id for item in req.items)):
+            with self.SessionMaker.begin() as session:
+                errors = self.episode_collect_batch(session, req.items)
+
+            self.forget_latest(req.items)
+        return EpisodeCollectBatchResponse(results=batch_results(errors))
+
+    def GetUserTimeline(
+        self, req: GetUserTimelineRequest, context
+    ) -> GetTimelineResponse:
+        limit = page_limit(req.limit)
+        # read from primary if this user just wrote, replica may lag behind
+        replica = req.user_id not in self.recent_writes
+        with self.SessionMaker(replica=replica) as session:
+            tls = session.scalars(
+                user_timeline_query(bool(req.cat), bool(req.until_id)),
+                page_params(req.user_id, req.cat, req.until_id, limit),
+            ).all()
+
+        return self.timeline_page(tls, limit)
+
+    def GetFriendsTimeline(
+        self, req: GetFriendsTimelineRequest, context
+    ) -> GetTimelineResponse:
+        limit = page_limit(req.limit)
+        with self.SessionMaker(replica=True) as session:
+            friends = (
+                sa.execute_core(session, friend_ids_query(), {"uid": req.user_id})
+                .scalars()
+                .all()
+            )
+            if not friends:
+                return GetTimelineResponse()
+
+            tls = self.friends_timeline(session, friends, req.cat, req.until_id, limit)
+
+        return self.timeline_page(tls, limit)
+
+    def SubjectProgress(
+        self, req: SubjectProgressRequest, context
+    ) -> SubjectProgressResponse:
+        if config.debug:
+            print(req)
+        memo, img = self.progress_memo(req)
+        self.progress(req.user_id, req.subject.id, 0, memo, img)
         return SubjectProgressResponse(ok=True)
+
+    def progress(
+        self,
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ):
+        if self.progress_coalescer is None:
+            self.write_progress(uid, subject_id, tlType, memo, img)
+        else:
+            self.progress_coalescer.submit((uid, subject_id, tlType), (memo, img))
+
+    def flush_progress(self, key: ProgressKey, value: ProgressValue):
+        self.write_progress(*key, *value)
+
+    def write_progress(
+        self,
+        uid: int,
+        subject_id: int,
+        tlType: int,
+        memo: ProgressMemo,
+        img: SubjectImage,
+    ):
+        item = (uid, subject_id, tlType, memo, img)
+        if self.progress_group is None:
+            self.write_progress_item(item)
+        else:
+            self.progress_group.submit(item)
+
+    def write_progress_item(self, item: ProgressItem):
+        uid = item[0]
+        with self.hold_users(uid):
+            with self.SessionMaker.begin() as session:
+                latest = self.progress_timeline(session, *item)
+
+            self.committed(uid, latest)
+
+    def write_progress_group(self, items: List[ProgressItem]) -> List[None]:
+        """write progress of concurrent rpc in one transaction, in order"""
+        written: Dict[int, LatestTimeline] = {}
+        with self.hold_users(*(item[0] for item in items)):
+            with self.SessionMaker.begin() as session:
+                for item in items:
+                    uid = item[0]
+                    if uid in written:
+                        # cached timeline is older than the one written by this
+                        # group, probe again in this transaction
+                        self.latest_cache.discard(uid)
+                    written[uid] = self.progress_timeline(session, *item)
+
+            for uid, latest in written.items():
+                self.committed(uid, latest)
+        return [None] * len(items)
+
+
+def batch_results(errors: List[str]) -> List[BatchResult]:
+    return [BatchResult(ok=not e, error=e) for e in errors]
+
+
+def page_limit(limit: int) -> int:
+    return min(limit or TIMELINE_PAGE_SIZE, TIMELINE_PAGE_MAX_SIZE)
+
+
+def page_params(uid: int, cat: int, until_id: int, limit: int) -> Dict[str, int]:
+    """parameters of `user_timeline_query`"""
+    return {"uid": uid, "cat": cat, "until_id": until_id, "limit": limit}
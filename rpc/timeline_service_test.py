@@ -0,0 +1,311 @@
+import json
+import time
+from typing import Optional
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from chii.db import sa
+from chii.config import config
+from chii.timeline import SUBJECT_TYPE_MAP, TimelineCat
+from chii.db.tables import ChiiTimeline
+from api.v1.timeline_pb2 import (
+    Episode,
+    Subject,
+    EpisodeCollectRequest,
+    SubjectCollectRequest,
+    SubjectProgressRequest,
+)
+from chii.timeline.cache import LatestTimelineCache
+from chii.timeline.writer import CoreTimelineWriter
+from rpc.timeline_service import TimelineWriteLogic
+from chii.timeline.writer_test import engine
+
+
+def service() -> TimelineWriteLogic:
+    s = TimelineWriteLogic()
+    s.latest_cache = LatestTimelineCache(100)
+    return s
+
+
+def timelines(e: Engine):
+    with e.connect() as conn:
+        return conn.execute(
+            sa.select(ChiiTimeline.id, ChiiTimeline.cat, ChiiTimeline.memo).order_by(
+                ChiiTimeline.id
+            )
+        ).all()
+
+
+def delete_timelines(e: Engine):
+    """deleted by the PHP site, not seen by the cache"""
+    with e.begin() as conn:
+        conn.execute(sa.delete(ChiiTimeline))
+
+
+def test_progress_cached_timeline_deleted():
+    e = engine()
+    s = service()
+    SessionMaker = sessionmaker(e)
+
+    def progress(eps: int):
+        memo, img = s.progress_memo(
+            SubjectProgressRequest(
+                user_id=1, subject=Subject(id=8, type=2, name="s"), eps_update=eps
+            )
+        )
+        with SessionMaker.begin() as session:
+            latest = s.progress_timeline(session, 1, 8, 0, memo, img)
+        s.committed(1, latest)
+        return latest
+
+    first = progress(1)
+    delete_timelines(e)
+    assert s.latest_cache.get(1) == first
+
+    latest = progress(2)
+    assert latest.id != first.id
+    assert s.latest_cache.get(1) == latest
+    ((tl_id, _, memo),) = timelines(e)
+    assert tl_id == latest.id
+    assert 's:10:"eps_update";i:2;' in memo
+
+    # merged into the new timeline
+    assert progress(3) == latest
+    ((_, _, memo),) = timelines(e)
+    assert 's:10:"eps_update";i:3;' in memo
+
+
+def test_episode_collect_batch_cached_timeline_deleted():
+    e = engine()
+    s = service()
+    SessionMaker = sessionmaker(e)
+
+    def req(subject_id: int, sort: int) -> EpisodeCollectRequest:
+        return EpisodeCollectRequest(
+            user_id=1,
+            subject=Subject(id=subject_id, type=2, name="s"),
+            last=Episode(id=sort, sort=sort),
+        )
+
+    with SessionMaker.begin() as session:
+        memo, img = s.episode_memo(req(8, 1))
+        latest = s.progress_timeline(session, 1, 8, 2, memo, img)
+    s.committed(1, latest)
+    delete_timelines(e)
+
+    with SessionMaker.begin() as session:
+        assert s.episode_collect_batch(session, [req(8, 2), req(9, 1)]) == ["", ""]
+
+    (_, cat1, memo1), (_, cat2, memo2) = timelines(e)
+    assert cat1 == cat2 == TimelineCat.Progress
+    # in order of items
+    assert 's:10:"subject_id";s:1:"8";' in memo1
+    assert 's:5:"ep_id";i:2;' in memo1
+    assert 's:10:"subject_id";s:1:"9";' in memo2
+
+
+def test_timeline_pb_cached_json():
+    s = service()
+    memo, img = s.progress_memo(
+        SubjectProgressRequest(
+            user_id=1, subject=Subject(id=8, type=2, name="s"), eps_update=1
+        )
+    )
+    tl = s.new_progress_timeline(1, 8, 0, memo, img)
+    tl.id, tl.source, tl.replies, tl.dateline = 1, 5, 0, 1000
+
+    first = s.timeline_pb(tl)
+    assert json.loads(first.memo)["eps_update"] == 1
+    assert json.loads(first.img)["subject_id"] == "8"
+    assert s.timeline_pb(tl) == first
+    assert s.decoded_cache.stats().hits == 1
+    assert s.decoded_cache.decode(tl) == (first.memo, first.img)
+
+
+class DeletedAfterGet(CoreTimelineWriter):
+    """timeline is deleted by others after it's read to merge"""
+
+    def get(
+        self, session: Session, tl_id: int, lock: bool = False
+    ) -> Optional[ChiiTimeline]:
+        tl = super().get(session, tl_id, lock)
+        session.connection().execute(sa.delete(ChiiTimeline))
+        return tl
+
+
+def test_subject_collect_batch_timeline_deleted():
+    e = engine()
+    s = service()
+    SessionMaker = sessionmaker(e)
+
+    def req(uid: int, subject_id: int) -> SubjectCollectRequest:
+        return SubjectCollectRequest(
+            user_id=uid, subject=Subject(id=subject_id, type=2, name="s"), collection=2
+        )
+
+    with SessionMaker.begin() as session:
+        s.subject_collect(session, req(1, 8), SUBJECT_TYPE_MAP[2][2])
+
+    s.writer = DeletedAfterGet()
+    with SessionMaker.begin() as session:
+        errors = s.subject_collect_batch(session, [req(1, 9), req(2, 7), req(1, 10)])
+    assert errors == ["", "", ""]
+
+    (_, cat1, memo1), (_, cat2, memo2) = timelines(e)
+    assert cat1 == cat2 == TimelineCat.Subject
+    # same as merging into a new timeline of the first item
+    assert "i:9;a:7:{" in memo1
+    assert "i:10;a:7:{" in memo1
+    assert 's:10:"subject_id";s:1:"7";' in memo2
+
+
+def test_friends_timeline(monkeypatch):
+    e = engine()
+    s = service()
+    SessionMaker = sessionmaker(e)
+
+    with SessionMaker.begin() as session:
+        for uid in [1, 2, 3, 1, 2, 1]:
+            memo, img = s.progress_memo(
+                SubjectProgressRequest(
+                    user_id=uid, subject=Subject(id=8, type=2, name="s"), eps_update=1
+                )
+            )
+            session.add(s.new_progress_timeline(uid, 8, 0, memo, img))
+    ids = [tl_id for tl_id, _, _ in timelines(e)]
+
+    for merge in [False, True]:
+        monkeypatch.setattr(config, "friends_timeline_merge", merge)
+        with SessionMaker() as session:
+
+            def page(cat: int, until_id: int, limit: int):
+                tls = s.friends_timeline(session, [1, 3], cat, until_id, limit)
+                return [tl.id for tl in tls]
+
+            assert page(0, 0, 20) == [ids[5], ids[3], ids[2], ids[0]]
+            assert page(TimelineCat.Progress, ids[3], 2) == [ids[2], ids[0]]
+            assert page(TimelineCat.Subject, 0, 20) == []
+
+
+def seed(e: Engine, s: TimelineWriteLogic) -> Engine:
+    """previous timelines of users, in and out of merge window"""
+    now = int(time.time())
+    subject = SubjectCollectRequest(
+        user_id=2, subject=Subject(id=8, type=2, name="s"), collection=2
+    )
+    episode = EpisodeCollectRequest(
+        user_id=5, subject=Subject(id=8, type=2, name="s"), last=Episode(id=1, sort=1)
+    )
+    tls = [
+        # merged into
+        (s.new_subject_timeline(subject, SUBJECT_TYPE_MAP[2][2]), 2, now - 60),
+        (s.new_progress_timeline(5, 8, 2, *s.episode_memo(episode)), 5, now - 60),
+        # too old to merge
+        (s.new_subject_timeline(subject, SUBJECT_TYPE_MAP[2][2]), 3, now - 3600),
+        (s.new_progress_timeline(6, 8, 2, *s.episode_memo(episode)), 6, now - 3600),
+        # other cat
+        (s.new_progress_timeline(4, 8, 2, *s.episode_memo(episode)), 4, now - 60),
+    ]
+    with sessionmaker(e).begin() as session:
+        for tl, uid, dateline in tls:
+            tl.uid, tl.dateline = uid, dateline
+            session.add(tl)
+    return e
+
+
+def rows(e: Engine):
+    """columns written by both `insert` and `insert_many`, ordered by user,
+    ids of different users are not comparable"""
+    with e.connect() as conn:
+        return conn.execute(
+            sa.select(
+                ChiiTimeline.uid,
+                ChiiTimeline.cat,
+                ChiiTimeline.type,
+                ChiiTimeline.related,
+                ChiiTimeline.memo,
+                ChiiTimeline.img,
+                ChiiTimeline.batch,
+            ).order_by(ChiiTimeline.uid, ChiiTimeline.id)
+        ).all()
+
+
+def test_subject_collect_batch_same_as_sequential():
+    def req(uid: int, subject_id: int, collection: int = 2) -> SubjectCollectRequest:
+        return SubjectCollectRequest(
+            user_id=uid,
+            subject=Subject(id=subject_id, type=2, name="s"),
+            collection=collection,
+            comment=f"<{uid}>",
+            rate=subject_id % 10,
+        )
+
+    reqs = [
+        # new timeline, then merged into it
+        req(1, 9),
+        req(2, 9),  # merged into previous timeline
+        req(1, 10),
+        req(3, 9),  # previous one is out of merge window
+        req(4, 9),  # previous one is a progress timeline
+        req(2, 10, collection=3),  # other type, new timeline
+        req(1, 9),  # same subject again
+        req(2, 11, collection=3),
+        req(3, 10),
+    ]
+
+    s = service()
+    sequential = seed(engine(), s)
+    for r in reqs:
+        with sessionmaker(sequential).begin() as session:
+            latest = s.subject_collect(
+                session, r, SUBJECT_TYPE_MAP[r.subject.type][r.collection]
+            )
+        s.committed(r.user_id, latest)
+
+    s = service()
+    batch = seed(engine(), s)
+    with sessionmaker(batch).begin() as session:
+        assert s.subject_collect_batch(session, reqs) == [""] * len(reqs)
+
+    assert len(rows(batch)) == 9
+    assert rows(batch) == rows(sequential)
+
+
+def test_episode_collect_batch_same_as_sequential():
+    def req(uid: int, subject_id: int, sort: int) -> EpisodeCollectRequest:
+        return EpisodeCollectRequest(
+            user_id=uid,
+            subject=Subject(id=subject_id, type=2, name="s"),
+            last=Episode(id=subject_id * 100 + sort, sort=sort),
+        )
+
+    reqs = [
+        # new timeline, then merged into it
+        req(1, 8, 1),
+        req(5, 8, 2),  # merged into previous timeline
+        req(1, 8, 2),
+        req(6, 8, 2),  # previous one is out of merge window
+        req(4, 9, 1),  # previous one is another subject
+        req(5, 9, 1),  # other subject, new timeline
+        req(5, 9, 2),
+        req(5, 8, 3),  # not the newest timeline, new timeline
+        req(6, 8, 3),
+    ]
+
+    s = service()
+    sequential = seed(engine(), s)
+    for r in reqs:
+        with sessionmaker(sequential).begin() as session:
+            latest = s.progress_timeline(
+                session, r.user_id, r.subject.id, 2, *s.episode_memo(r)
+            )
+        s.committed(r.user_id, latest)
+
+    s = service()
+    batch = seed(engine(), s)
+    with sessionmaker(batch).begin() as session:
+        assert s.episode_collect_batch(session, reqs) == [""] * len(reqs)
+
+    assert len(rows(batch)) == 10
+    assert rows(batch) == rows(sequential)
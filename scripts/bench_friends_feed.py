@@ -0,0 +1,76 @@
+"""
+friends timeline page, single ``tml_uid IN (...)`` query vs
+`chii.timeline.feed.friends_feed` k-way merge, at 100, 1 000 and 5 000 followees.
+
+read only, runs against the database configured by env (a copy of production
+data is needed for meaningful numbers). followees are the users with the most
+recent timelines, the first page and a deep page (``until_id`` at the 100th
+newest timeline of these users) are measured.
+
+python -m scripts.bench_friends_feed
+"""
+import timeit
+from typing import List, Callable, Sequence
+from functools import partial
+
+from sqlalchemy.orm import Session
+
+from chii.db import sa
+from chii.timeline import friends_timeline_query
+from chii.db.tables import ChiiTimeline
+from chii.timeline.feed import friends_feed
+
+
+def active_users(session: Session, n: int) -> List[int]:
+    # scan the newest timelines backward by primary key until n distinct users
+    users: dict = {}
+    for uid in session.scalars(
+        sa.select(ChiiTimeline.uid).order_by(ChiiTimeline.id.desc()).limit(n * 50)
+    ):
+        users.setdefault(uid, None)
+        if len(users) >= n:
+            break
+    return list(users)
+
+
+def single_query(
+    session: Session, uids: Sequence[int], until_id: int, limit: int
+) -> List[int]:
+    return [
+        tl.id
+        for tl in session.scalars(
+            friends_timeline_query(False, bool(until_id)),
+            {"uids": uids, "until_id": until_id, "limit": limit},
+        )
+    ]
+
+
+def feed(session: Session, uids: Sequence[int], until_id: int, limit: int) -> List[int]:
+    return [tl.id for tl in friends_feed(session, uids, 0, until_id, limit)]
+
+
+def bench(fn: Callable, number: int) -> float:
+    """best per-call time in milliseconds"""
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e3
+
+
+def main(limit: int = 20, number: int = 3):
+    SessionMaker = sa.sync_session_maker()
+    with SessionMaker() as session:
+        print(f"{'followees':>10}{'page':>8}{'IN query (ms)':>16}{'feed (ms)':>12}")
+        for n in [100, 1000, 5000]:
+            uids = active_users(session, n)
+            deep = single_query(session, uids, 0, 100)[-1]
+            for page, until_id in [("first", 0), ("deep", deep)]:
+                assert single_query(session, uids, until_id, limit) == feed(
+                    session, uids, until_id, limit
+                )
+                before = bench(
+                    partial(single_query, session, uids, until_id, limit), number
+                )
+                after = bench(partial(feed, session, uids, until_id, limit), number)
+                print(f"{len(uids):>10}{page:>8}{before:>16.2f}{after:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+compare `phpseralize.loads` with the stream based `phpseralize.load`
+on real `tml_memo` / `tml_img` payloads, and `phpseralize.loads_keys`
+with a full `phpseralize.loads`.
+
+python -m scripts.bench_phpseralize
+"""
+import timeit
+from io import BytesIO
+from pathlib import Path
+from functools import partial
+
+from chii.compat import phpseralize
+
+fixtures_path = Path(phpseralize.__file__).parent.joinpath("fixtures")
+
+payloads = [
+    "tml_memo_subject.txt",
+    "tml_img_subject.txt",
+    "tml_memo_subject_batch.txt",
+    "tml_img_subject_batch.txt",
+    "tml_memo_progress.txt",
+    "tml_memo_episode.txt",
+]
+
+
+def load_stream(data: bytes):
+    with BytesIO(data) as fp:
+        return phpseralize.load(fp, decode_strings=True)
+
+
+def bench(fn, number: int) -> float:
+    """best per-call time in microseconds"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 5000):
+    print(f"{'payload':<30}{'bytes':>8}{'load (us)':>12}{'loads (us)':>12}{'x':>8}")
+    for name in payloads:
+        data = fixtures_path.joinpath(name).read_bytes().strip()
+        assert load_stream(data) == phpseralize.loads(data)
+
+        before = bench(partial(load_stream, data), number)
+        after = bench(partial(phpseralize.loads, data), number)
+        print(
+            f"{name:<30}{len(data):>8}"
+            f"{before:>12.2f}{after:>12.2f}{before / after:>8.2f}"
+        )
+
+    print()
+    print(
+        f"{'one key of batch payload':<30}{'bytes':>8}{'loads':>12}{'keys':>12}{'x':>8}"
+    )
+    for name in ["tml_memo_subject_batch.txt", "tml_img_subject_batch.txt"]:
+        data = fixtures_path.joinpath(name).read_bytes().strip()
+        key = list(phpseralize.loads(data))[-1]
+
+        before = bench(partial(phpseralize.loads, data), number)
+        after = bench(partial(phpseralize.loads_keys, data, {key}), number)
+        print(
+            f"{name:<30}{len(data):>8}"
+            f"{before:>12.2f}{after:>12.2f}{before / after:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
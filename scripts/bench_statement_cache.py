@@ -0,0 +1,148 @@
+"""
+Python time of executing the statements of timeline rpc, in microseconds per
+execution, which is also CPU milliseconds per second at 1000 executions/s.
+
+compares building the statement with values on each call and executing it by
+`Session.execute` (what rpc did), with statements built once by
+`sa.cached_statement` and executed by `sa.execute_core` with parameters.
+
+tables are in an in-memory sqlite database, a query costs a few microseconds in
+sqlite, what is measured is almost all SQLAlchemy.
+
+python -m scripts.bench_statement_cache
+"""
+import timeit
+from typing import Any, Dict, Callable
+
+from sqlalchemy import text, create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from chii.db import sa
+from chii.timeline import (
+    friend_ids_query,
+    update_memo_query,
+    user_timeline_query,
+    latest_timeline_query,
+)
+from chii.db.tables import ChiiFriend, ChiiTimeline
+
+# chii_timeline and chii_friends with sqlite types
+DDL = [
+    """
+    CREATE TABLE chii_timeline (
+      tml_id INTEGER PRIMARY KEY AUTOINCREMENT,
+      tml_uid INTEGER NOT NULL DEFAULT 0,
+      tml_cat INTEGER NOT NULL,
+      tml_type INTEGER NOT NULL DEFAULT 0,
+      tml_related CHAR(255) NOT NULL DEFAULT '0',
+      tml_memo TEXT NOT NULL,
+      tml_img TEXT NOT NULL,
+      tml_batch INTEGER NOT NULL,
+      tml_source INTEGER NOT NULL DEFAULT 0,
+      tml_replies INTEGER NOT NULL,
+      tml_dateline INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX tml_uid ON chii_timeline (tml_uid)",
+    """
+    CREATE TABLE chii_friends (
+      frd_uid INTEGER NOT NULL,
+      frd_fid INTEGER NOT NULL,
+      frd_grade INTEGER NOT NULL DEFAULT 1,
+      frd_dateline INTEGER NOT NULL DEFAULT 0,
+      frd_description CHAR(255) NOT NULL DEFAULT '',
+      PRIMARY KEY (frd_uid, frd_fid)
+    )
+    """,
+]
+
+
+def session() -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        for ddl in DDL:
+            conn.execute(text(ddl))
+        conn.execute(
+            text(
+                "INSERT INTO chii_timeline (tml_uid, tml_cat, tml_type, tml_memo,"
+                " tml_img, tml_batch, tml_replies) VALUES (:uid, 3, 2, 'm', '', 0, 0)"
+            ),
+            [{"uid": i % 100} for i in range(2000)],
+        )
+        conn.execute(
+            text("INSERT INTO chii_friends (frd_uid, frd_fid) VALUES (1, :fid)"),
+            [{"fid": i} for i in range(50)],
+        )
+    return Session(engine)
+
+
+def built(s: Session) -> Dict[str, Callable[[], Any]]:
+    columns = (
+        ChiiTimeline.id,
+        ChiiTimeline.dateline,
+        ChiiTimeline.cat,
+        ChiiTimeline.type,
+        ChiiTimeline.batch,
+        ChiiTimeline.related,
+    )
+    return {
+        "latest timeline": lambda: s.execute(
+            sa.select(*columns)
+            .where(ChiiTimeline.uid == 7)
+            .order_by(ChiiTimeline.id.desc())
+            .limit(1)
+        ).first(),
+        "update memo": lambda: s.execute(
+            sa.update(ChiiTimeline)
+            .where(ChiiTimeline.id == 7)
+            .values(memo="m")
+            .execution_options(synchronize_session=False)
+        ),
+        "friend ids": lambda: s.scalars(
+            sa.select(ChiiFriend.fid).where(ChiiFriend.uid == 1)
+        ).all(),
+        "user timeline": lambda: s.scalars(
+            sa.select(ChiiTimeline)
+            .where(ChiiTimeline.uid == 7, ChiiTimeline.cat == 3)
+            .order_by(ChiiTimeline.id.desc())
+            .limit(20)
+        ).all(),
+    }
+
+
+def cached(s: Session) -> Dict[str, Callable[[], Any]]:
+    page = {"uid": 7, "cat": 3, "until_id": 0, "limit": 20}
+    return {
+        "latest timeline": lambda: sa.execute_core(
+            s, latest_timeline_query(), {"uid": 7}
+        ).first(),
+        "update memo": lambda: sa.execute_core(
+            s, update_memo_query(), {"tl_id": 7, "memo": "m"}
+        ),
+        "friend ids": lambda: sa.execute_core(s, friend_ids_query(), {"uid": 1})
+        .scalars()
+        .all(),
+        "user timeline": lambda: s.scalars(
+            user_timeline_query(True, False), page
+        ).all(),
+    }
+
+
+def us_per_call(fn: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 5000):
+    s = session()
+    before = built(s)
+    after = cached(s)
+    print(f"{'statement':<16}{'built (us)':>12}{'cached (us)':>13}")
+    for name in before:
+        b = us_per_call(before[name], number)
+        a = us_per_call(after[name], number)
+        print(f"{name:<16}{b:>12.1f}{a:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
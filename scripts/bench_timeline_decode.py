@@ -0,0 +1,100 @@
+"""
+throughput of decoding timeline rows, in rows per second.
+
+corpus is the timeline fixtures of `chii.compat` plus one generated memo of each
+other category. compares plain `phpseralize.loads` of memo and img (untyped,
+what parseTimeLine did for the categories it supported) with `parseTimeLine`,
+dispatching on (cat, type, batch) to the typed memo models.
+
+python -m scripts.bench_timeline_decode
+"""
+import time
+import timeit
+from typing import Any, List
+from pathlib import Path
+
+from chii.compat import phpseralize
+from chii.timeline import TimelineCat, parseTimeLine
+from chii.db.tables import ChiiTimeline
+
+fixtures_path = Path(phpseralize.__file__).parent.joinpath("fixtures")
+
+
+def fixture(name: str) -> str:
+    return fixtures_path.joinpath(name).read_text().strip()
+
+
+def row(cat: int, type: int, memo: Any, img: str = "", batch: int = 0) -> ChiiTimeline:
+    if not isinstance(memo, str):
+        memo = phpseralize.dumps(memo)
+    return ChiiTimeline(
+        id=1,
+        uid=1,
+        cat=cat,
+        type=type,
+        related="0",
+        memo=memo,
+        img=img,
+        batch=batch,
+        dateline=int(time.time()),
+    )
+
+
+corpus: List[ChiiTimeline] = [
+    row(
+        TimelineCat.Subject,
+        2,
+        fixture("tml_memo_subject.txt"),
+        fixture("tml_img_subject.txt"),
+    ),
+    row(
+        TimelineCat.Subject,
+        2,
+        fixture("tml_memo_subject_batch.txt"),
+        fixture("tml_img_subject_batch.txt"),
+        batch=1,
+    ),
+    row(TimelineCat.Progress, 0, fixture("tml_memo_progress.txt")),
+    row(TimelineCat.Progress, 2, fixture("tml_memo_episode.txt")),
+    row(TimelineCat.Relation, 2, {"uid": "1", "username": "sai", "nickname": "Sai"}),
+    row(
+        TimelineCat.Relation,
+        3,
+        {"grp_id": "1", "grp_name": "a", "grp_title": "小组", "grp_desc": ""},
+    ),
+    row(TimelineCat.Wiki, 1, {"subject_id": "8", "subject_name": "コードギアス"}),
+    row(TimelineCat.Say, 1, "今天也是好天气"),
+    row(TimelineCat.Say, 2, {"before": "a", "after": "b"}),
+    row(TimelineCat.Blog, 1, {"entry_id": "1", "entry_title": "t", "entry_desc": ""}),
+    row(TimelineCat.Index, 1, {"idx_id": "1", "idx_title": "t", "idx_desc": ""}),
+    row(TimelineCat.Mono, 1, {"id": "1", "name": "name", "cat": "1"}),
+    row(TimelineCat.Doujin, 1, {"id": "1", "name": "name", "title": "t"}),
+]
+
+
+def untyped():
+    for tl in corpus:
+        if tl.cat != TimelineCat.Say or tl.type == 2:
+            phpseralize.loads(tl.memo.encode())
+        if tl.img:
+            phpseralize.loads(tl.img.encode())
+
+
+def typed():
+    for tl in corpus:
+        parseTimeLine(tl)
+
+
+def rows_per_second(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return len(corpus) * number / best
+
+
+def main(number: int = 500):
+    print(f"{'decoder':<12}{'rows/s':>12}")
+    for name, fn in [("untyped", untyped), ("typed", typed)]:
+        print(f"{name:<12}{rows_per_second(fn, number):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+serialization cost of the `SubjectCollect` write path,
+`phpserialize.serialize(asdict(memo))` vs `chii.timeline.dumps_*`.
+
+python -m scripts.bench_timeline_memo
+"""
+import timeit
+from dataclasses import asdict
+
+import phpserialize as php
+
+from chii.timeline import (
+    SubjectMemo,
+    ProgressMemo,
+    SubjectImage,
+    dumps_batch,
+    dumps_subject_memo,
+    dumps_progress_memo,
+    dumps_subject_image,
+)
+
+memo = SubjectMemo(
+    subject_id="363612",
+    subject_type_id="2",
+    subject_name_cn="",
+    subject_series=False,
+    subject_name="沙盒",
+    collect_comment="看了两集，感觉还行",
+    collect_rate=7,
+)
+img = SubjectImage(subject_id="363612", images="82/15/363612_On6wg.jpg")
+progress = ProgressMemo(
+    ep_id=1075441,
+    subject_name="沙盒",
+    ep_name="",
+    subject_id="363612",
+    subject_type_id="2",
+    ep_sort=2.0,
+)
+
+batch_memo = {i: memo for i in range(1, 11)}
+batch_img = {i: img for i in range(1, 11)}
+
+
+def old_subject_collect():
+    return php.serialize(asdict(memo)), php.serialize(asdict(img))
+
+
+def new_subject_collect():
+    return dumps_subject_memo(memo), dumps_subject_image(img)
+
+
+def old_subject_collect_batch():
+    return (
+        php.serialize({key: asdict(value) for key, value in batch_memo.items()}),
+        php.serialize({key: asdict(value) for key, value in batch_img.items()}),
+    )
+
+
+def new_subject_collect_batch():
+    return (
+        dumps_batch(batch_memo, dumps_subject_memo),
+        dumps_batch(batch_img, dumps_subject_image),
+    )
+
+
+def old_progress():
+    return php.serialize(asdict(progress))
+
+
+def new_progress():
+    return dumps_progress_memo(progress)
+
+
+def bench(fn, number: int) -> float:
+    """best per-call time in microseconds"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 10000):
+    print(f"{'case':<24}{'before (us)':>14}{'after (us)':>14}{'x':>8}")
+    for name, before, after in [
+        ("SubjectCollect", old_subject_collect, new_subject_collect),
+        ("SubjectCollect batch", old_subject_collect_batch, new_subject_collect_batch),
+        ("EpisodeCollect", old_progress, new_progress),
+    ]:
+        assert before() == after()
+        b = bench(before, number)
+        a = bench(after, number)
+        print(f"{name:<24}{b:>14.2f}{a:>14.2f}{b / a:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+cost of decoding the previous timeline on the `SubjectCollect` merge path,
+pydantic ``parse_obj_as`` (the previous implementation) vs `chii.timeline`
+slotted memo classes.
+
+reports time per call and peak memory allocated during one call.
+
+python -m scripts.bench_timeline_merge
+"""
+import timeit
+import tracemalloc
+from typing import Dict, Callable
+from pathlib import Path
+from dataclasses import asdict
+
+import pydantic
+import phpserialize as php
+
+from chii.compat import phpseralize
+from chii.timeline import SubjectMemo, SubjectImage, set_batch_item, dumps_subject_memo
+
+fixtures_path = Path(phpseralize.__file__).parent.joinpath("fixtures")
+memo_raw = fixtures_path.joinpath("tml_memo_subject.txt").read_bytes().strip()
+img_raw = fixtures_path.joinpath("tml_img_subject.txt").read_bytes().strip()
+batch_raw = fixtures_path.joinpath("tml_memo_subject_batch.txt").read_bytes().strip()
+
+
+class PydanticSubjectMemo(pydantic.BaseModel):
+    collect_comment: str
+    collect_rate: int
+    subject_id: str
+    subject_name: str
+    subject_name_cn: str
+    subject_series: bool = False
+    subject_type_id: str
+
+
+class PydanticSubjectImage(pydantic.BaseModel):
+    subject_id: str
+    images: str
+
+
+new_memo = SubjectMemo(
+    subject_id="1",
+    subject_type_id="2",
+    subject_name_cn="",
+    subject_series=False,
+    subject_name="name",
+    collect_comment="",
+    collect_rate=7,
+)
+
+
+def old_single():
+    m = pydantic.parse_obj_as(PydanticSubjectMemo, phpseralize.loads(memo_raw))
+    i = pydantic.parse_obj_as(PydanticSubjectImage, phpseralize.loads(img_raw))
+    return m, i
+
+
+def new_single():
+    m = SubjectMemo.from_php(phpseralize.loads(memo_raw))
+    i = SubjectImage.from_php(phpseralize.loads(img_raw))
+    return m, i
+
+
+def old_batch():
+    memo = pydantic.parse_obj_as(
+        Dict[int, PydanticSubjectMemo], phpseralize.loads(batch_raw)
+    )
+    memo[1] = PydanticSubjectMemo(**asdict(new_memo))
+    return php.serialize({key: value.dict() for key, value in memo.items()})
+
+
+def new_batch():
+    return set_batch_item(batch_raw, 1, dumps_subject_memo(new_memo))
+
+
+def peak_alloc(fn: Callable) -> int:
+    fn()  # warm up caches
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        return peak - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench(fn, number: int) -> float:
+    """best per-call time in microseconds"""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 2000):
+    assert old_batch() == new_batch()
+
+    print(
+        f"{'case':<16}{'before (us)':>14}{'after (us)':>14}"
+        f"{'before (B)':>14}{'after (B)':>14}"
+    )
+    for name, before, after in [
+        ("single memo", old_single, new_single),
+        ("batch memo", old_batch, new_batch),
+    ]:
+        print(
+            f"{name:<16}{bench(before, number):>14.2f}{bench(after, number):>14.2f}"
+            f"{peak_alloc(before):>14}{peak_alloc(after):>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Python time of a timeline write rpc with each `chii.timeline.writer`, in
+microseconds per rpc, which is also CPU milliseconds per second at 1000 rpc/s.
+
+each rpc is a transaction of `TimelineWriteLogic.subject_collect`: probe the newest
+timeline of the user, then insert a new one or merge into it. tables are in an
+in-memory sqlite database, what is measured is almost all SQLAlchemy.
+
+python -m scripts.bench_timeline_writer
+"""
+import timeit
+import itertools
+from typing import Callable
+
+from loguru import logger
+from sqlalchemy import text, event, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.v1.timeline_pb2 import Subject, SubjectCollectRequest
+from chii.timeline.writer import WRITERS, memo_md5
+from rpc.timeline_service import TimelineWriteLogic
+from scripts.bench_statement_cache import DDL
+
+
+def subject(i: int) -> Subject:
+    return Subject(id=i, type=2, name=f"s{i}", name_cn="条目", image="a/b/c.jpg")
+
+
+def rpc(writer: str) -> Callable[[SubjectCollectRequest], None]:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    # MD5() of MySQL, used by merging
+    event.listen(
+        engine,
+        "connect",
+        lambda conn, record: conn.create_function("md5", 1, memo_md5),
+    )
+    with engine.begin() as conn:
+        for ddl in DDL:
+            conn.execute(text(ddl))
+    SessionMaker = sessionmaker(engine)
+
+    service = TimelineWriteLogic()
+    service.writer = WRITERS[writer]()
+
+    def call(req: SubjectCollectRequest):
+        with SessionMaker.begin() as session:
+            latest = service.subject_collect(session, req, 2)
+        service.committed(req.user_id, latest)
+
+    return call
+
+
+def us_per_rpc(call: Callable[[], None], number: int) -> float:
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 2000):
+    # rpc log lines cost the same with both writers
+    logger.remove()
+    print(f"{'rpc':<10}" + "".join(f"{name + ' (us)':>12}" for name in WRITERS))
+    uids = itertools.count(1)
+    rates = itertools.cycle(range(1, 11))
+    cases = {
+        # a new user each time, always inserts
+        "insert": lambda: SubjectCollectRequest(
+            user_id=next(uids), subject=subject(1), collection=2
+        ),
+        # the same user and subject with a new rate, merges into one timeline
+        "merge": lambda: SubjectCollectRequest(
+            user_id=1, subject=subject(1), collection=2, rate=next(rates)
+        ),
+    }
+    for case, request in cases.items():
+        times = []
+        for name in WRITERS:
+            call = rpc(name)
+            times.append(us_per_rpc(lambda: call(request()), number))  # noqa: B023
+        print(f"{case:<10}" + "".join(f"{t:>12.1f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+export chii_timeline to columnar files for offline analytics, see
+`chii.timeline.export` for columns.
+
+    python -m scripts.export_timeline OUTPUT_DIR [--format parquet|csv]
+        [--workers N] [--range-size N] [--batch-size N]
+
+one file for each id range, ``timeline-{start}-{end}.{format}``, exported in
+parallel processes. finished ranges are saved in ``OUTPUT_DIR/checkpoint.json``,
+run again to resume. point MYSQL_HOST to a replica.
+"""
+import os
+import argparse
+import functools
+from pathlib import Path
+
+from loguru import logger
+
+from chii.db import sa
+from chii.timeline import export, backfill
+from chii.db.tables import ChiiTimeline
+
+
+def export_range(
+    start: int, end: int, output: Path, fmt: str, batch_size: int
+) -> backfill.RangeResult:
+    with backfill.session_maker()() as session:
+        return export.write_range(
+            output.joinpath(f"timeline-{start:010d}-{end:010d}.{fmt}"),
+            fmt,
+            sa.scan(
+                session,
+                sa.select(
+                    ChiiTimeline.id,
+                    ChiiTimeline.uid,
+                    ChiiTimeline.cat,
+                    ChiiTimeline.type,
+                    ChiiTimeline.batch,
+                    ChiiTimeline.related,
+                    ChiiTimeline.dateline,
+                    ChiiTimeline.memo,
+                )
+                .where(ChiiTimeline.id.between(start, end))
+                .order_by(ChiiTimeline.id.asc()),
+                batch_size,
+            ),
+            batch_size,
+        )
+
+
+@logger.catch()
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--format", choices=list(export.WRITERS), default="parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--range-size", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    if args.format == "parquet" and export.pa is None:
+        parser.error("pyarrow is not installed, install it or use --format csv")
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    result = backfill.run(
+        functools.partial(
+            export_range,
+            output=args.output,
+            fmt=args.format,
+            batch_size=args.batch_size,
+        ),
+        backfill.timeline_id_bounds,
+        backfill.Checkpoint(args.output.joinpath("checkpoint.json")),
+        range_size=args.range_size,
+        workers=args.workers,
+        initializer=backfill.session_maker,
+    )
+
+    print(f"{result.rows} timelines")
+    for (cat, type), count in result.errors.most_common():
+        print(f"cat {cat} type {type}: {count} timelines failed to decode")
+
+
+if __name__ == "__main__":
+    main()
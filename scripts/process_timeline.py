@@ -1,56 +1,98 @@
-from typing import Dict, List, Union
+"""
+decode every row of chii_timeline, report timelines failed to decode.
+
+    python -m scripts.process_timeline [--workers N] [--range-size N]
+        [--batch-size N] [--checkpoint PATH] [--restart]
+
+id ranges are decoded in parallel processes, each streams only the columns to
+decode from a server side cursor. finished ranges are saved in the
+checkpoint file, run again to resume after a crash.
+"""
+import os
+import argparse
+import functools
+from typing import Dict, Union
+from pathlib import Path
 
 from loguru import logger
-from pydantic import parse_obj_as
-from sqlalchemy.orm import Session
+from pydantic import ValidationError, parse_obj_as
 
 from chii import timeline
 from chii.db import sa
-from chii.compat import phpseralize
+from chii.timeline import backfill
 from chii.db.tables import ChiiTimeline
 
-step = 100
-
 
-@logger.catch()
-def main():
-    SessionMaker = sa.sync_session_maker()
-    with SessionMaker() as session:
-        max_tml_id = get_max_timeline_id(session)
-        last_id = 0
-
-        while True:
-            tls: List[ChiiTimeline] = session.scalars(
-                sa.select(ChiiTimeline)
-                .where(ChiiTimeline.tml_id >= last_id)
-                .limit(step)
-                .order_by(ChiiTimeline.tml_id.asc())
+def process_range(start: int, end: int, batch_size: int) -> backfill.RangeResult:
+    result = backfill.RangeResult()
+    with backfill.session_maker()() as session:
+        for tl_id, cat, type, batch, memo, img in sa.scan(
+            session,
+            sa.select(
+                ChiiTimeline.id,
+                ChiiTimeline.cat,
+                ChiiTimeline.type,
+                ChiiTimeline.batch,
+                ChiiTimeline.memo,
+                ChiiTimeline.img,
             )
+            .where(ChiiTimeline.id.between(start, end))
+            .order_by(ChiiTimeline.id.asc()),
+            batch_size,
+        ):
+            result.rows += 1
+            try:
+                timeline.parseMemo(cat, type, bool(batch), memo)
+                images = timeline.parseImg(img)
+            except ValueError as e:
+                result.errors[(cat, type)] += 1
+                logger.error(
+                    "unexpected timeline<id={}> cat {} type {}: {}", tl_id, cat, type, e
+                )
+                continue
 
-            for tl in tls:
-                last_id = tl.tml_id
-                timeline.parseTimeLine(tl)
-                # if tl.tml_memo:
+            if images is not None:
+                try:
+                    parse_obj_as(
+                        Union[Dict[int, timeline.Image], timeline.Image], images
+                    )
+                except ValidationError as e:
+                    result.errors[(cat, type)] += 1
+                    logger.error("unexpected image of timeline<id={}>: {}", tl_id, e)
 
-                if tl.tml_img:
-                    try:
-                        img = phpseralize.loads(tl.img.encode())
-                    except Exception as e:
-                        print("image", e)
-                        continue
+    return result
 
-                    parse_obj_as(Union[Dict[int, timeline.Image], timeline.Image], img)
 
-            if last_id >= max_tml_id:
-                break
+@logger.catch()
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--range-size", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument(
+        "--checkpoint", type=Path, default=Path(".process_timeline.checkpoint")
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore and overwrite checkpoint"
+    )
+    args = parser.parse_args()
 
+    if args.restart:
+        args.checkpoint.unlink(missing_ok=True)
 
-def get_max_timeline_id(session: Session):
-    return session.scalar(
-        sa.select(ChiiTimeline.tml_id).order_by(ChiiTimeline.tml_id.desc()).limit(1)
+    result = backfill.run(
+        functools.partial(process_range, batch_size=args.batch_size),
+        backfill.timeline_id_bounds,
+        backfill.Checkpoint(args.checkpoint),
+        range_size=args.range_size,
+        workers=args.workers,
+        initializer=backfill.session_maker,
     )
 
+    print(f"{result.rows} timelines")
+    for (cat, type), count in result.errors.most_common():
+        print(f"cat {cat} type {type}: {count} timelines failed to decode")
+
 
 if __name__ == "__main__":
-    print("start")
     main()
@@ -1,6 +1,7 @@
 import sys
 import json
 import time
+import asyncio
 import logging
 import threading
 from typing import Optional
@@ -14,7 +15,9 @@ from etcd3.utils import retry
 
 from api.v1 import timeline_pb2_grpc
 from chii.config import config
+from rpc.debug_http import start_debug_server
 from rpc.timeline_service import TimeLineService
+from rpc.async_timeline_service import AsyncTimeLineService
 
 
 class Register(threading.Thread):
@@ -99,12 +102,55 @@ def start_server():
             time.sleep(3)
 
 
+async def start_aio_server():
+    server = grpc.aio.server(
+        maximum_concurrent_rpcs=config.grpc_aio_max_concurrent_rpcs
+    )
+    timeline_pb2_grpc.add_TimeLineServiceServicer_to_server(
+        AsyncTimeLineService(), server
+    )
+    server.add_insecure_port(f"0.0.0.0:{config.grpc_port}")
+    logger.info("aio server started, listening on {}", config.grpc_port)
+    await server.start()
+
+    r: Optional[Register] = None
+    if not config.etcd_addr:
+        logger.info("etcd not configured")
+    else:
+        logger.info(
+            "announce with etcd, announced addr: {}:{}",
+            config.external_address,
+            config.grpc_port,
+        )
+        r = Register()
+        r.start()
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        if r is not None:
+            r.stop = 1
+        await server.stop(3)
+
+
 def main():
     if "-h" in sys.argv or "--help" in sys.argv:
         print("timeline micro service")
+        print("  --aio  serve with grpc.aio, same as env GRPC_AIO=true")
         sys.exit(0)
-    logger.info("starting grpc server")
     logging.basicConfig()
+    if config.debug_http_port:
+        start_debug_server(config.debug_http_host, config.debug_http_port)
+        logger.info(
+            "debug http listening on {}:{}",
+            config.debug_http_host,
+            config.debug_http_port,
+        )
+    if config.grpc_aio or "--aio" in sys.argv:
+        logger.info("starting grpc aio server")
+        asyncio.run(start_aio_server())
+        return
+    logger.info("starting grpc server")
     start_server()
 
 